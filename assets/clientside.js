@@ -0,0 +1,280 @@
+/*
+assets/clientside.js
+
+Clientside callbacks for the home page. Filter the datasets sent once in dcc.Store
+components (src/stores.py) and build the figures in the browser, so dropdown changes
+don't need a server round trip. The indicator cards total any date range from cumulative daily
+counts. The flight count line graph fetches full resolution date ranges and zoomed windows
+from the server (update_flight_count_window).
+
+created: 19/10/26
+modified: 19/10/26
+*/
+
+// decode a columnar store column, expanding dictionary encoded columns
+function storeColumn(store, name) {
+    const column = store[name];
+    if (column && column.codes) {
+        return column.codes.map(code => code < 0 ? null : column.values[code]);
+    }
+    return column;
+}
+
+// row indices where the predicate is true for the column value
+function rowsWhere(values, predicate) {
+    const rows = [];
+    values.forEach((value, i) => { if (predicate(value)) rows.push(i); });
+    return rows;
+}
+
+const MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+];
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// days from the first day of the cumulative sums store to a 'YYYY-MM-DD' date
+function dayOffset(sums, date) {
+    return Math.round((Date.parse(date.slice(0, 10)) - Date.parse(sums.start)) / DAY_MS);
+}
+
+// 'YYYY-MM-DD' date a number of years earlier
+function yearsEarlier(date, years) {
+    const d = new Date(date.slice(0, 10) + 'T00:00:00Z');
+    d.setUTCFullYear(d.getUTCFullYear() - years);
+    return d.toISOString().slice(0, 10);
+}
+
+// total of a category between two dates (inclusive) from cumulative sums: two lookups, any range.
+// null if the range isn't fully covered by the data
+function rangeTotal(sums, category, start, end) {
+    const cumsum = sums.cumsum[category];
+    if (!cumsum) return null;
+    const first = dayOffset(sums, start);
+    const last = Math.min(dayOffset(sums, end), cumsum.length - 2);
+    if (first < 0 || last < first) return null;
+    return cumsum[last + 1] - cumsum[first];
+}
+
+// card title: flight count category
+const CARD_CATEGORIES = {
+    'Intra Eu': 'intra-eu',
+    'Departures To Outside': 'departures_to_outside',
+    'Arrivals From Outside': 'arrivals_from_outside',
+    'Overflights': 'overflights'
+};
+
+const FLIGHT_COUNT_COLORS = {
+    'total': '#000000',
+    'intra-eu': '#12436D',
+    'arrivals_from_outside': '#28A197',
+    'departures_to_outside': '#801650',
+    'overflights': '#F46A25'
+};
+
+const FLIGHT_COUNT_LABELS = {
+    'total': 'Total',
+    'intra-eu': 'Intra Europe',
+    'arrivals_from_outside': 'Arrivals',
+    'departures_to_outside': 'Departures',
+    'overflights': 'Overflights'
+};
+
+const MANUFACTURER_COLORS = {
+    'Airbus': '#12436D',
+    'Bombardier': '#FFC000',
+    'Cessna': '#3D3D3D',
+    'ATR': '#A285D1',
+    'Embraer': '#801650',
+    'Boeing': '#28A197',
+    'Other': '#F46A25',
+    'Piper': '#2073BC'
+};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    flights: {
+        // set the date range to a month from the dropdown, or all data
+        monthRange: function(monthString, sums) {
+            if (!monthString || monthString === 'all') {
+                return [sums.start, sums.end];
+            }
+            const [month, year] = monthString.split(' ');
+            const index = MONTH_NAMES.indexOf(month);
+            const first = new Date(Date.UTC(Number(year), index, 1));
+            const last = new Date(Date.UTC(Number(year), index + 1, 0)); // day 0 of the next month
+            return [first.toISOString().slice(0, 10), last.toISOString().slice(0, 10)];
+        },
+
+        // indicator cards for a date range, with change from the same range a year earlier
+        indicatorCards: function(startDate, endDate, sums, templates) {
+            const start = startDate || sums.start;
+            const end = endDate || sums.end;
+            const titles = Object.keys(CARD_CATEGORIES);
+
+            const values = {};
+            titles.forEach(title => {
+                const category = CARD_CATEGORIES[title];
+                values[title] = [
+                    rangeTotal(sums, category, start, end),
+                    rangeTotal(sums, category, yearsEarlier(start, 1), yearsEarlier(end, 1))
+                ];
+            });
+
+            // same domains as make_subplots(rows=1, cols=4) with default spacing
+            const spacing = 0.2 / titles.length;
+            const width = (1 - spacing * (titles.length - 1)) / titles.length;
+
+            const data = titles.map((title, i) => ({
+                type: 'indicator',
+                mode: 'number+delta',
+                value: values[title][0],
+                delta: values[title][1] ? {reference: values[title][1], relative: true, valueformat: '.1%'} : undefined,
+                title: {text: title},
+                number: {font: {size: 60}},
+                domain: {x: [i * (width + spacing), i * (width + spacing) + width], y: [0, 1]}
+            }));
+
+            return {
+                data: data,
+                layout: {
+                    template: templates.plotly,
+                    height: 200,
+                    margin: {t: 30, b: 10, l: 10, r: 10}
+                }
+            };
+        },
+
+        // daily flight counts per category. Draws the downsampled overview in the store, or the
+        // full resolution date range / zoomed window fetched by update_flight_count_window
+        flightCountLine: function(startDate, endDate, windowData, store, sums, templates) {
+            const start = (startDate || sums.start).slice(0, 10);
+            const end = (endDate || sums.end).slice(0, 10);
+            const rangeKey = `${start}/${end}`;
+            const allData = start <= sums.start && end >= sums.end;
+            const windowMatches = windowData && (
+                windowData.key === rangeKey || (windowData.key === 'zoom' && windowData.range_key === rangeKey)
+            );
+
+            if (!allData && !windowMatches) {
+                return window.dash_clientside.no_update; // date range window still loading
+            }
+
+            const source = windowMatches ? windowData : store;
+            const dof = source.dof;
+            const counts = source.count;
+            const categories = storeColumn(source, 'category');
+
+            const traces = {};
+            dof.forEach((_, i) => {
+                const category = categories[i];
+                if (!traces[category]) {
+                    traces[category] = {
+                        type: 'scatter',
+                        x: [],
+                        y: [],
+                        mode: 'lines',
+                        name: FLIGHT_COUNT_LABELS[category] || category,
+                        line: {color: FLIGHT_COUNT_COLORS[category]},
+                        showlegend: true
+                    };
+                }
+                traces[category].x.push(dof[i]);
+                traces[category].y.push(counts[i]);
+            });
+
+            return {
+                data: Object.values(traces),
+                layout: {
+                    template: templates.plotly_white,
+                    title: {text: 'Number of flights Over Time'},
+                    xaxis: {
+                        title: {text: 'Time'},
+                        range: windowMatches && windowData.range ? windowData.range : undefined,
+                        showgrid: false,
+                        showline: true,
+                        linecolor: 'rgb(204, 204, 204)',
+                        linewidth: 2,
+                        ticklen: 5,
+                        ticks: 'outside',
+                        tickwidth: 2,
+                        tickcolor: 'rgb(204, 204, 204)'
+                    },
+                    yaxis: {
+                        title: {text: 'Number of flights'},
+                        showgrid: true,
+                        griddash: 'dot',
+                        showline: false,
+                        linecolor: 'rgb(204, 204, 204)',
+                        linewidth: 2
+                    },
+                    legend: {orientation: 'h', yanchor: 'bottom', y: -0.3, xanchor: 'center', x: 0.5},
+                    plot_bgcolor: 'white',
+                    height: 500,
+                    margin: {t: 40}
+                }
+            };
+        },
+
+        // monthly manufacturer share for all years or a year
+        manufacturerPercentLine: function(year, store, templates) {
+            const years = store.year;
+            const manufacturers = storeColumn(store, 'manufacturer');
+
+            const rows = year !== 'all'
+                ? rowsWhere(years, y => y == year)
+                : years.map((_, i) => i);
+
+            const traces = {};
+            rows.forEach(i => {
+                const manufacturer = manufacturers[i];
+                if (!traces[manufacturer]) {
+                    traces[manufacturer] = {
+                        type: 'scatter',
+                        x: [],
+                        y: [],
+                        mode: 'lines',
+                        name: manufacturer,
+                        marker: {color: MANUFACTURER_COLORS[manufacturer] || 'rgb(204, 204, 204)'}
+                    };
+                }
+                traces[manufacturer].x.push(store.date[i]);
+                traces[manufacturer].y.push(store.percentage[i]);
+            });
+
+            return {
+                data: Object.values(traces),
+                layout: {
+                    template: templates.plotly_white,
+                    title: {text: 'Percentage Share'},
+                    xaxis: {
+                        title: {text: 'Year'},
+                        showgrid: false,
+                        showline: true,
+                        linecolor: 'rgb(204, 204, 204)',
+                        linewidth: 2,
+                        tickmode: 'linear',
+                        dtick: 'M6', // show every 6 months
+                        tickformat: '%b %Y',
+                        ticklen: 5,
+                        ticks: 'outside',
+                        tickwidth: 2,
+                        tickcolor: 'rgb(204, 204, 204)'
+                    },
+                    yaxis: {
+                        title: {text: 'Percent'},
+                        showgrid: true,
+                        showline: false,
+                        linecolor: 'rgb(204, 204, 204)',
+                        linewidth: 2,
+                        griddash: 'dot',
+                        gridcolor: 'rgb(204, 204, 204)'
+                    },
+                    legend: {orientation: 'h', yanchor: 'bottom', y: -0.25, xanchor: 'center', x: 0.5},
+                    plot_bgcolor: 'white',
+                    height: 500
+                }
+            };
+        }
+    }
+});
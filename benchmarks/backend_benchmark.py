@@ -0,0 +1,58 @@
+"""
+benchmarks/backend_benchmark.py
+
+Times the ``flight_list`` analytics queries on the PostgreSQL and DuckDB query backends side by side.
+
+Both backends must hold the same data: the DuckDB backend reads the parquet files in 
+``setup/data/flight_list`` (download with ``KEEP_PARQUET=true``), so PostgreSQL should have 
+ingested the same files with the ``full`` ingestion profile.
+
+Usage: python -m benchmarks.backend_benchmark [repeat]
+
+created: 19/10/26
+"""
+
+import sys
+import time
+import pandas as pd
+from src.backends import PostgresBackend, DuckDBBackend
+from src.queries import get_top_airlines, get_top_models, get_top_departures, get_top_destinations
+from src.classification import build_manufacturer_counts
+
+QUERIES = {
+    'get_top_airlines': get_top_airlines,
+    'get_top_models': get_top_models,
+    'get_top_departures': get_top_departures,
+    'get_top_destinations': get_top_destinations,
+    'build_manufacturer_counts': build_manufacturer_counts
+}
+
+def time_query(func, backend, repeat: int) -> tuple:
+    """
+    Runs a query function ``repeat`` times on a backend.
+
+    Returns:
+        tuple: Fastest run time in seconds and number of result rows.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(backend)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(result)
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    backends = [PostgresBackend(), DuckDBBackend()]
+
+    results = []
+    for name, func in QUERIES.items():
+        row = {'query': name}
+        for backend in backends:
+            seconds, rows = time_query(func, backend, repeat)
+            row[f'{backend.name}_s'] = round(seconds, 3)
+            row[f'{backend.name}_rows'] = rows
+        row['speedup'] = round(row['postgres_s'] / row['duckdb_s'], 1)
+        results.append(row)
+
+    print(pd.DataFrame(results).to_string(index=False))
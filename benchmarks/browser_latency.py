@@ -0,0 +1,80 @@
+"""
+benchmarks/browser_latency.py
+
+Measures dropdown interaction latency on the home page in a headless browser: the time from 
+selecting a dropdown option to the graph finishing its redraw, and the number of server 
+callback requests the interaction made.
+
+Start the app first (python -m src.app), then run: 
+python -m benchmarks.browser_latency [url] [interactions]
+
+Requires playwright (dev dependency) with a browser installed: playwright install chromium
+
+created: 19/10/26
+"""
+
+import sys
+import statistics
+from playwright.sync_api import sync_playwright
+
+# dropdown id: graph redrawn by it
+INTERACTIONS = {
+    'flight-count-dropdown': 'flight-count-graph',
+    'airlines-dropdown': 'manufacturer-percent-graph'
+}
+
+def dropdown_options(page, dropdown_id: str) -> list:
+    """
+    Returns the option labels of a dropdown.
+    """
+    page.click(f'#{dropdown_id}')
+    labels = page.locator(f'#{dropdown_id} .Select-option, #{dropdown_id} [role="option"]').all_inner_texts()
+    page.keyboard.press('Escape')
+    return labels
+
+def select_and_time(page, dropdown_id: str, graph_id: str, label: str) -> float:
+    """
+    Selects a dropdown option and waits for the graph to redraw.
+
+    Returns:
+        float: Milliseconds from selection to the end of the redraw.
+    """
+    page.evaluate("""(graphId) => {
+        const gd = document.querySelector(`#${graphId} .js-plotly-plot`);
+        window.__plotted = new Promise(resolve => gd.once('plotly_afterplot', () => resolve(performance.now())));
+    }""", graph_id)
+
+    page.click(f'#{dropdown_id}')
+    page.keyboard.type(label)
+    start = page.evaluate('performance.now()')
+    page.keyboard.press('Enter')
+
+    return page.evaluate('window.__plotted') - start
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8050/'
+    interactions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+
+        server_requests = []
+        page.on('request', lambda request: server_requests.append(request.url) if '_dash-update-component' in request.url else None)
+
+        page.goto(url)
+        page.wait_for_load_state('networkidle')
+
+        for dropdown_id, graph_id in INTERACTIONS.items():
+            labels = dropdown_options(page, dropdown_id)[1:interactions + 1] # skip 'All'
+            server_requests.clear()
+
+            timings = [select_and_time(page, dropdown_id, graph_id, label) for label in labels]
+            page.wait_for_load_state('networkidle')
+
+            print(f"{dropdown_id} -> {graph_id}")
+            print(f"  interactions: {len(timings)}")
+            print(f"  median: {statistics.median(timings):.1f} ms, max: {max(timings):.1f} ms")
+            print(f"  server callback requests: {len(server_requests)}")
+
+        browser.close()
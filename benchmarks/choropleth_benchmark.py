@@ -0,0 +1,78 @@
+"""
+benchmarks/choropleth_benchmark.py
+
+Compares the emissions choropleth drawn on plotly's world map with the bundled Europe geometry
+(``assets/europe.geojson``, referenced by URL or embedded in the figure):
+    - Figure payload: bytes of figure JSON sent by the callback.
+    - Geometry: bytes of the geometry file, raw and gzipped.
+    - First render (with a page url): milliseconds from navigation to the first drawn country and
+      the geometry bytes the browser downloaded. Run once with the app started normally and once
+      with CHOROPLETH_GEOMETRY=world to compare.
+
+Usage: python -m benchmarks.choropleth_benchmark [url]
+
+Browser timings require playwright (dev dependency) with a browser installed: playwright install chromium
+
+created: 19/10/26
+"""
+
+import sys
+import gzip
+import json
+import pandas as pd
+from src.queries import STARTUP_QUERIES, get_emissions_slice
+from src.choropleth import emissions_choropleth, get_europe_geometry, GEOJSON_PATH
+
+def figure_payloads() -> pd.DataFrame:
+    """
+    Figure JSON size for each way of drawing the all-years emissions choropleth.
+    """
+    df = get_emissions_slice(STARTUP_QUERIES.EMISSIONS_CUBE, 'all', 'all')
+    geometry = get_europe_geometry()
+
+    figures = {'world map': emissions_choropleth(df)}
+    if geometry:
+        figures['europe geojson (url)'] = emissions_choropleth(df, geometry)
+        inline = dict(geometry, url=json.loads(GEOJSON_PATH.read_text()))
+        figures['europe geojson (inline)'] = emissions_choropleth(df, inline)
+
+    return pd.DataFrame([
+        {'figure': name, 'payload_kb': round(len(fig.to_json().encode()) / 1024, 1)}
+        for name, fig in figures.items()
+    ])
+
+def first_render(url: str) -> dict:
+    """
+    Loads the home page and waits for the choropleth to draw its first country.
+
+    Returns:
+        dict: ``render_ms`` from navigation start and ``geometry_kb`` downloaded (geojson or topojson).
+    """
+    from playwright.sync_api import sync_playwright
+
+    geometry_bytes = []
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.on('response', lambda response: geometry_bytes.append(len(response.body()))
+                if response.ok and ('geojson' in response.url or 'topojson' in response.url or response.url.endswith('.json')) else None)
+
+        page.goto(url)
+        page.wait_for_selector('#emissions-choropleth .choroplethlayer path', timeout=60000)
+        render_ms = page.evaluate('performance.now()')
+        browser.close()
+
+    return {'render_ms': round(render_ms), 'geometry_kb': round(sum(geometry_bytes) / 1024, 1)}
+
+if __name__ == "__main__":
+    print(figure_payloads().to_string(index=False))
+
+    if GEOJSON_PATH.exists():
+        raw = GEOJSON_PATH.read_bytes()
+        print(f"\n{GEOJSON_PATH.name}: {len(raw) / 1024:.0f} KB, {len(gzip.compress(raw)) / 1024:.0f} KB gzipped")
+    else:
+        print(f"\n{GEOJSON_PATH} not built, run python -m setup.europe_geometry")
+
+    if len(sys.argv) > 1:
+        print(f"\nfirst render: {first_render(sys.argv[1])}")
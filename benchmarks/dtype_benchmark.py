@@ -0,0 +1,79 @@
+"""
+benchmarks/dtype_benchmark.py
+
+Compares memory use and filter times of the ``STARTUP_QUERIES`` frames with the column types in
+``src/schemas.py`` against the types the queries returned before: object strings, float64 years
+and months, int64 counts and datetime64[ns] dates.
+
+Usage: python -m benchmarks.dtype_benchmark [repeat]
+
+created: 19/10/26
+"""
+
+import sys
+import time
+import pandas as pd
+from src.queries import STARTUP_QUERIES
+from src.schemas import DATE
+
+# filters and aggregations run by the callbacks: frame name, description, function
+FILTERS = [
+    ('TOP_AIRLINES_DF', 'year == 2024', lambda df: df[df['year'] == 2024]),
+    ('TOP_AIRLINES_DF', 'sum by airline', lambda df: df.groupby('airline', observed=True)['count'].sum()),
+    ('TOP_MODEL_DF', 'sum by model', lambda df: df.groupby('normalized_model', observed=True)['count'].sum()),
+    ('MANUFACTURER_COUNTS_DF', 'year == 2024, sum by manufacturer',
+     lambda df: df[df['year'] == 2024].groupby('manufacturer', observed=True)['count'].sum()),
+    ('COUNTRY_EMISSIONS_DF', "month_string == 'March'", lambda df: df[df['month_string'] == 'March']),
+    ('FL_COUNT_BY_DAY_DF', "category == 'total'", lambda df: df[df['category'] == 'total'])
+]
+
+def legacy_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts a typed frame back to the types the queries returned before ``src/schemas.py``.
+    """
+    types = {}
+    for col, dtype in df.dtypes.items():
+        if dtype == DATE:
+            types[col] = 'datetime64[ns]'
+        elif isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype):
+            types[col] = object
+        elif col in ('year', 'month'):
+            types[col] = 'float64' # DATE_PART results
+        elif pd.api.types.is_integer_dtype(dtype):
+            types[col] = 'int64'
+    return df.astype(types)
+
+def best_time(func, df: pd.DataFrame, repeat: int) -> float:
+    """
+    Fastest of ``repeat`` runs of a filter, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    frames = {name: getattr(STARTUP_QUERIES, name) for name in dict.fromkeys(name for name, _, _ in FILTERS)}
+    legacy = {name: legacy_types(df) for name, df in frames.items()}
+
+    memory = pd.DataFrame([{
+        'frame': name,
+        'rows': len(df),
+        'before_mb': round(legacy[name].memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        'after_mb': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 2)
+    } for name, df in frames.items()])
+    print(memory.to_string(index=False))
+    print()
+
+    timings = pd.DataFrame([{
+        'frame': name,
+        'filter': description,
+        'before_ms': round(best_time(func, legacy[name], repeat), 3),
+        'after_ms': round(best_time(func, frames[name], repeat), 3)
+    } for name, description, func in FILTERS])
+    timings['speedup'] = (timings['before_ms'] / timings['after_ms']).round(1)
+    print(timings.to_string(index=False))
@@ -0,0 +1,105 @@
+"""
+benchmarks/encoding_benchmark.py
+
+Compares on-disk size and scan time of plain ``flight_list`` storage against dictionary encoded 
+``flight_list_encoded`` storage.
+
+Copies the decoded ``flight_list`` view into a plain ``flight_list_plain`` table (if it doesn't exist) 
+so both storage layouts hold the same rows.
+
+Usage: python -m benchmarks.encoding_benchmark
+
+created: 19/10/26
+"""
+
+import time
+import pandas as pd
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+
+SCAN_QUERIES = {
+    'plain: count by adep': """
+        SELECT adep, COUNT(*) FROM flight_list_plain GROUP BY adep;
+    """,
+    'encoded: count by adep_key': """
+        SELECT adep_key, COUNT(*) FROM flight_list_encoded GROUP BY adep_key;
+    """,
+    'view: count by adep': """
+        SELECT adep, COUNT(*) FROM flight_list GROUP BY adep;
+    """,
+    'plain: count by operator, year': """
+        SELECT icao_operator, DATE_PART('year', dof), COUNT(*) FROM flight_list_plain GROUP BY 1, 2;
+    """,
+    'encoded: count by operator_key, year': """
+        SELECT operator_key, DATE_PART('year', dof), COUNT(*) FROM flight_list_encoded GROUP BY 1, 2;
+    """,
+    'view: count by operator, year': """
+        SELECT icao_operator, DATE_PART('year', dof), COUNT(*) FROM flight_list GROUP BY 1, 2;
+    """
+}
+
+def create_plain_copy():
+    """
+    Creates ``flight_list_plain`` from the ``flight_list`` view with the same index as ``flight_list``.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT to_regclass('public.flight_list_plain') IS NOT NULL")).scalar()
+        if exists:
+            return
+
+        logger.info('Creating flight_list_plain from flight_list view')
+        conn.execute(text("CREATE TABLE flight_list_plain AS SELECT * FROM flight_list"))
+        conn.execute(text("ALTER TABLE flight_list_plain ADD PRIMARY KEY (id)"))
+
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE flight_list_plain"))
+        conn.execute(text("VACUUM ANALYZE flight_list_encoded"))
+
+def table_sizes() -> pd.DataFrame:
+    """
+    Returns the table, index and total on-disk size of each storage layout.
+
+    Returns:
+        pd.DataFrame: Size in MB per table. Encoded size includes the dimension tables.
+    """
+    query = text("""
+        SELECT 
+            relname AS table,
+            pg_relation_size(oid) / 1e6 AS table_mb,
+            pg_indexes_size(oid) / 1e6 AS index_mb,
+            pg_total_relation_size(oid) / 1e6 AS total_mb
+        FROM pg_class
+        WHERE relname IN ('flight_list_plain', 'flight_list_encoded', 'airport_key', 'operator_key', 'aircraft_type_key', 'version_key')
+        AND relkind = 'r';
+    """)
+    return pd.read_sql(query, engine)
+
+def scan_times(repeat: int = 3) -> pd.DataFrame:
+    """
+    Times each scan query, keeping the fastest of ``repeat`` runs so the result reflects a warm cache.
+
+    Args:
+        repeat (int): Number of runs per query. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: Fastest run time in seconds per query.
+    """
+    results = []
+
+    with engine.connect() as conn:
+        for name, query in SCAN_QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(query)).fetchall()
+                timings.append(time.perf_counter() - start)
+            results.append({'query': name, 'seconds': min(timings)})
+
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    create_plain_copy()
+    print(table_sizes().to_string(index=False))
+    print(scan_times().to_string(index=False))
@@ -0,0 +1,365 @@
+"""
+benchmarks/load_test.py
+
+Load test of the dashboard's server callbacks with simulated concurrent users.
+
+Each user replays a browsing session against ``_dash-update-component``, the way the browser would:
+    1. Opens the home page (the pages callback returns the layout) and fires the callbacks that run on load.
+    2. Picks a random dropdown and option, waiting a think time between interactions. The airport and
+       airline search types a query first and picks from the returned options.
+    3. Fires every server callback triggered by the change, then the callbacks triggered by their outputs.
+Clientside callbacks aren't requested, as they run in the browser. Callbacks, dropdowns and options are
+read from the running app (``_dash-dependencies`` and the returned layout), so new callbacks are covered.
+
+Reports requests, errors, throughput and p50/p95/p99 latency for each callback. Requests made during
+the warm-up aren't counted. Save results with ``--json`` to compare cache, serialization and worker
+model changes.
+
+Usage:
+    python -m benchmarks.load_test --users 20 --duration 60                  # app already running
+    python -m benchmarks.load_test --start --workers 4 --threads 2 --users 50 # start the app with gunicorn
+
+``--start`` with one worker runs the app's own server (``python -m src.app``). More workers need
+gunicorn (a dev dependency, ``poetry install --with dev``), serving ``src.app:server``.
+
+created: 19/10/26
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import requests
+
+here = Path(__file__).resolve().parent
+
+UPDATE_PATH = '_dash-update-component'
+
+# typed in search dropdowns (inputs with a search_value property)
+SEARCH_QUERIES = ['lon', 'heathrow', 'EGLL', 'ryan', 'EZY', 'par', 'munich', 'klm', 'LEMD', 'frank']
+
+# callbacks triggered by another callback's output are followed up to this depth
+MAX_CHAIN = 3
+
+def split_outputs(output: str) -> list:
+    """
+    ``(id, property)`` of each output of a callback, from its output string (``id.prop`` or ``..a.x...b.y..``).
+    """
+    outputs = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [tuple(o.rsplit('.', 1)) for o in outputs]
+
+def callback_name(dep: dict) -> str:
+    """
+    Short name of a callback for the report: its output ids and properties.
+    """
+    return ', '.join(f'{id_}.{prop}' for id_, prop in split_outputs(dep['output']))
+
+def is_search(dep: dict) -> bool:
+    """
+    Whether a callback answers typing in a dropdown (fired by ``User.interact`` only).
+    """
+    return any(i['property'] == 'search_value' for i in dep['inputs'])
+
+def get_callbacks(url: str) -> list:
+    """
+    Server callbacks of the running app (``_dash-dependencies``). Clientside and pattern-matching
+    callbacks are left out.
+    """
+    deps = requests.get(f'{url}/_dash-dependencies', timeout=30).json()
+    return [
+        dep for dep in deps
+        if not dep.get('clientside_function') and '{' not in dep['output']
+    ]
+
+def input_keys(dep: dict) -> set:
+    """
+    ``id.prop`` of each input of a callback.
+    """
+    return {f"{i['id']}.{i['property']}" for i in dep['inputs']}
+
+def walk_layout(node, state: dict, components: dict):
+    """
+    Records the properties of each component with an id in the layout returned by the pages callback,
+    and the component types.
+    """
+    if isinstance(node, list):
+        for child in node:
+            walk_layout(child, state, components)
+        return
+    if not isinstance(node, dict) or 'props' not in node:
+        return
+
+    props = node['props']
+    if isinstance(props.get('id'), str):
+        components[props['id']] = node.get('type')
+        for prop, value in props.items():
+            if prop != 'children':
+                state[f"{props['id']}.{prop}"] = value
+    walk_layout(props.get('children'), state, components)
+
+class Recorder():
+    """
+    Latency of each request, shared by the user threads.
+    """
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+        self.counting = False
+
+    def add(self, name: str, seconds: float, ok: bool):
+        if self.counting:
+            with self.lock:
+                self.records.append((name, seconds, ok))
+
+class User():
+    """
+    One simulated browser session.
+
+    Args:
+        url (str): App url.
+        path (str): Page opened by the user.
+        callbacks (list): Server callbacks from ``get_callbacks``.
+        recorder (Recorder): Shared latency records.
+        think_s (float): Mean seconds between interactions.
+        rng (random.Random): Random choices of this user.
+    """
+    def __init__(self, url: str, path: str, callbacks: list, recorder: Recorder, think_s: float, rng: random.Random):
+        self.url = url
+        self.path = path
+        self.callbacks = callbacks
+        self.recorder = recorder
+        self.think_s = think_s
+        self.rng = rng
+        self.session = requests.Session()
+        self.state = {}
+        self.components = {}
+
+    def request(self, dep: dict, changed: list) -> dict:
+        """
+        Requests one callback with the inputs and state of this session, and applies its response.
+
+        Returns:
+            dict: ``id.prop``: new value for each changed output.
+        """
+        outputs = [{'id': id_, 'property': prop} for id_, prop in split_outputs(dep['output'])]
+        payload = {
+            'output': dep['output'],
+            'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+            'inputs': [dict(i, value=self.state.get(f"{i['id']}.{i['property']}")) for i in dep['inputs']],
+            'state': [dict(s, value=self.state.get(f"{s['id']}.{s['property']}")) for s in dep['state']],
+            'changedPropIds': changed
+        }
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f'{self.url}/{UPDATE_PATH}', json=payload, timeout=120)
+            ok = response.status_code in (200, 204) # 204: PreventUpdate or no_update for every output
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.add(callback_name(dep), time.perf_counter() - start, ok)
+
+        if not ok or response.status_code == 204:
+            return {}
+
+        updates = {}
+        for id_, props in response.json().get('response', {}).items():
+            for prop, value in props.items():
+                updates[f'{id_}.{prop}'] = value
+        self.state.update(updates)
+        return updates
+
+    def trigger(self, changed: list):
+        """
+        Fires the server callbacks with a changed input, then the callbacks triggered by their outputs.
+        """
+        for _ in range(MAX_CHAIN):
+            triggered, changed = set(changed), []
+            for dep in self.callbacks:
+                if input_keys(dep) & triggered and not is_search(dep):
+                    changed += list(self.request(dep, sorted(input_keys(dep) & triggered)))
+            if not changed:
+                return
+
+    def open_page(self):
+        """
+        Requests the page layout from the pages callback and fires the callbacks that run on load.
+        """
+        self.state = {'_pages_location.pathname': self.path, '_pages_location.search': '', '_pages_location.href': self.url + self.path}
+        self.components = {}
+
+        pages = [dep for dep in self.callbacks if '_pages_content.children' in dep['output']]
+        for dep in pages:
+            layout = self.request(dep, ['_pages_location.pathname']).get('_pages_content.children')
+            walk_layout(layout, self.state, self.components)
+
+        # callbacks with all their inputs on the page run on load, unless they prevent it
+        for dep in self.callbacks:
+            if dep in pages or dep.get('prevent_initial_call') or is_search(dep):
+                continue
+            if all(i['id'] in self.components for i in dep['inputs']):
+                self.request(dep, [])
+
+    def interact(self):
+        """
+        Selects a random option of a random dropdown and fires the callbacks it triggers.
+        """
+        dropdown = self.rng.choice([id_ for id_, type_ in self.components.items() if type_ == 'Dropdown'])
+        search = next((dep for dep in self.callbacks if f'{dropdown}.search_value' in input_keys(dep)), None)
+
+        if search is not None:
+            self.state[f'{dropdown}.search_value'] = self.rng.choice(SEARCH_QUERIES)
+            self.request(search, [f'{dropdown}.search_value'])
+
+        options = self.state.get(f'{dropdown}.options') or []
+        if not options:
+            return
+        option = self.rng.choice(options)
+        self.state[f'{dropdown}.value'] = option['value'] if isinstance(option, dict) else option
+        self.trigger([f'{dropdown}.value'])
+
+    def run(self, stop_at: float, interactions: int):
+        """
+        Runs sessions (open the page, then ``interactions`` dropdown changes) until ``stop_at``.
+        """
+        while time.perf_counter() < stop_at:
+            self.open_page()
+            for _ in range(interactions):
+                if time.perf_counter() >= stop_at or 'Dropdown' not in self.components.values():
+                    break
+                time.sleep(self.rng.uniform(0, 2 * self.think_s))
+                self.interact()
+
+def start_app(url: str, workers: int, threads: int) -> subprocess.Popen:
+    """
+    Starts the app and waits until it answers. One worker runs ``python -m src.app``, more run gunicorn.
+    """
+    if workers > 1:
+        host = urlparse(url).netloc
+        command = [sys.executable, '-m', 'gunicorn', 'src.app:server', '--bind', host,
+                   '--workers', str(workers), '--threads', str(threads), '--timeout', '120']
+    else:
+        command = [sys.executable, '-m', 'src.app']
+    process = subprocess.Popen(command, cwd=here.parent)
+
+    deadline = time.perf_counter() + 300 # startup queries and search index
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode}: {' '.join(command)}")
+        try:
+            requests.get(f'{url}/_dash-dependencies', timeout=5).raise_for_status()
+            return process
+        except requests.RequestException:
+            time.sleep(1)
+
+    process.terminate()
+    raise RuntimeError(f"App didn't answer at {url} within 300s")
+
+def summarize(records: list, seconds: float) -> pd.DataFrame:
+    """
+    Requests, errors, throughput and latency percentiles (ms) per callback, plus a total row.
+    """
+    df = pd.DataFrame(records, columns=['callback', 'seconds', 'ok'])
+
+    def row(group: pd.DataFrame) -> dict:
+        ms = group['seconds'].to_numpy() * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            'requests': len(group),
+            'errors': int((~group['ok']).sum()),
+            'req_per_s': round(len(group) / seconds, 2),
+            'p50_ms': round(p50, 1),
+            'p95_ms': round(p95, 1),
+            'p99_ms': round(p99, 1),
+            'max_ms': round(ms.max(), 1)
+        }
+
+    rows = {name: row(group) for name, group in df.groupby('callback')}
+    rows['total'] = row(df)
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('callback')
+
+def run_load_test(url: str, path: str, users: int, duration: float, warmup: float, think_s: float,
+                  interactions: int, seed: int) -> pd.DataFrame:
+    """
+    Runs the simulated users against a running app.
+
+    Args:
+        url (str): App url.
+        path (str): Page opened by each user.
+        users (int): Concurrent users (threads).
+        duration (float): Seconds measured, after the warm-up.
+        warmup (float): Seconds before measuring, so caches are filled.
+        think_s (float): Mean seconds between interactions.
+        interactions (int): Dropdown changes per session before the page is opened again.
+        seed (int): Random seed. User ``i`` uses ``seed + i``.
+
+    Returns:
+        pd.DataFrame: Per-callback results from ``summarize``.
+    """
+    callbacks = get_callbacks(url)
+    recorder = Recorder()
+    start = time.perf_counter()
+    stop_at = start + warmup + duration
+
+    threads = [
+        threading.Thread(
+            target=User(url, path, callbacks, recorder, think_s, random.Random(seed + i)).run,
+            args=(stop_at, interactions),
+            daemon=True
+        )
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(min(warmup / max(users, 1), 0.5)) # ramp up during the warm-up
+
+    time.sleep(max(start + warmup - time.perf_counter(), 0))
+    recorder.counting = True
+    measured_from = time.perf_counter()
+
+    for thread in threads:
+        thread.join()
+
+    if not recorder.records:
+        raise RuntimeError("No requests were measured; increase --duration")
+    return summarize(recorder.records, time.perf_counter() - measured_from)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the dashboard's server callbacks.")
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help="app url")
+    parser.add_argument('--path', default='/', help="page opened by each user")
+    parser.add_argument('--users', type=int, default=10, help="concurrent users")
+    parser.add_argument('--duration', type=float, default=60, help="seconds measured")
+    parser.add_argument('--warmup', type=float, default=10, help="seconds before measuring")
+    parser.add_argument('--think', type=float, default=1.0, help="mean seconds between interactions")
+    parser.add_argument('--interactions', type=int, default=10, help="dropdown changes per session")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--start', action='store_true', help="start the app first")
+    parser.add_argument('--workers', type=int, default=1, help="app worker processes (with --start)")
+    parser.add_argument('--threads', type=int, default=1, help="threads per gunicorn worker (with --start)")
+    parser.add_argument('--json', help="write the results and settings to this file")
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    process = start_app(url, args.workers, args.threads) if args.start else None
+    try:
+        results = run_load_test(url, args.path, args.users, args.duration, args.warmup, args.think, args.interactions, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{args.users} users, {args.duration:.0f}s, think time {args.think}s" + (f", {args.workers} workers x {args.threads} threads" if args.start else ''))
+    print(results.to_string())
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'settings': vars(args),
+            'results': results.reset_index().to_dict(orient='records')
+        }, indent=2))
@@ -0,0 +1,61 @@
+"""
+benchmarks/search_benchmark.py
+
+Times type-ahead queries on the in-process search index (``src/search.py``) against the
+``ILIKE`` queries they replace.
+
+Usage: python -m benchmarks.search_benchmark [repeat]
+
+created: 19/10/26
+"""
+
+import sys
+import time
+import pandas as pd
+from sqlalchemy import text
+from src.db import engine
+from src.search import SearchIndex, get_search_entries
+
+# keystrokes of typical searches
+QUERIES = ['e', 'eg', 'egl', 'egll', 'lhr', 'ezy', 'easy', 'lufth', 'heathrow', 'london heath', 'speedbird', 'port', 'zurich']
+
+ILIKE_QUERY = text("""
+    SELECT icao AS code, airport AS name FROM icao_list
+    WHERE icao ILIKE :prefix OR iata ILIKE :prefix OR airport ILIKE :contains OR region_name ILIKE :contains
+    UNION ALL
+    SELECT icao_operator_code, airline FROM airlines
+    WHERE icao_operator_code ILIKE :prefix OR airline ILIKE :contains OR telephony ILIKE :contains
+    LIMIT 10;
+""")
+
+def best_time(func, repeat: int) -> float:
+    """
+    Fastest of ``repeat`` runs, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    entries = get_search_entries()
+    start = time.perf_counter()
+    index = SearchIndex(entries)
+    print(f"{len(index)} entries indexed in {time.perf_counter() - start:.2f}s\n")
+
+    results = []
+    with engine.connect() as conn:
+        for query in QUERIES:
+            params = {'prefix': f'{query}%', 'contains': f'%{query}%'}
+            results.append({
+                'query': query,
+                'index_ms': round(best_time(lambda: index.search(query), repeat), 4),
+                'ilike_ms': round(best_time(lambda: conn.execute(ILIKE_QUERY, params).fetchall(), max(repeat // 10, 1)), 2),
+                'top_match': index.labels[index.search(query, limit=1)[0]] if index.search(query, limit=1) else ''
+            })
+
+    print(pd.DataFrame(results).to_string(index=False))
@@ -0,0 +1,64 @@
+"""
+benchmarks/spatial_benchmark.py
+
+Times nearest-airport lookups on the airport index (``src/spatial.py``) against a brute force search
+over every airport, and checks both agree.
+
+Points are drawn uniformly over Europe, or taken from a trajectory store partition when a partition
+name is given (all positions of its flights).
+
+Usage: python -m benchmarks.spatial_benchmark [n_points | partition]
+
+created: 19/10/26
+"""
+
+import sys
+import time
+import numpy as np
+from src.spatial import AirportIndex, get_airports, haversine_km
+from src.trajectories import TRAJECTORY_FOLDER
+
+def brute_force(index: AirportIndex, lats: np.ndarray, lons: np.ndarray, chunk: int = 1000) -> np.ndarray:
+    """
+    Nearest airport positions by measuring the distance to every airport.
+    """
+    positions = np.empty(len(lats), dtype=np.int64)
+    for start in range(0, len(lats), chunk):
+        matrix = haversine_km(lats[start:start + chunk, None], lons[start:start + chunk, None], index.lat, index.lon)
+        positions[start:start + chunk] = matrix.argmin(axis=1)
+    return positions
+
+if __name__ == "__main__":
+    arg = sys.argv[1] if len(sys.argv) > 1 else '1000000'
+
+    if arg.isdigit():
+        rng = np.random.default_rng(0)
+        lats = rng.uniform(35, 70, int(arg))
+        lons = rng.uniform(-15, 35, int(arg))
+    else:
+        lats = np.load(TRAJECTORY_FOLDER / arg / 'lat.npy').astype(np.float64)
+        lons = np.load(TRAJECTORY_FOLDER / arg / 'lon.npy').astype(np.float64)
+
+    index = AirportIndex(get_airports())
+    print(f"{len(index)} airports, {len(lats)} points")
+
+    start = time.perf_counter()
+    positions, _ = index.nearest(lats, lons)
+    print(f"index: {time.perf_counter() - start:.2f}s ({len(index._cells)} grid cells)")
+
+    start = time.perf_counter()
+    positions, _ = index.nearest(lats, lons)
+    print(f"index, cells cached: {time.perf_counter() - start:.2f}s")
+
+    sample = np.random.default_rng(1).choice(len(lats), min(len(lats), 20000), replace=False)
+    start = time.perf_counter()
+    expected = brute_force(index, lats[sample], lons[sample])
+    seconds = (time.perf_counter() - start) * len(lats) / len(sample)
+    print(f"brute force (extrapolated from {len(sample)} points): {seconds:.2f}s")
+
+    # ties (airports with the same coordinates) can pick a different position at the same distance
+    same = np.isclose(
+        haversine_km(lats[sample], lons[sample], index.lat[positions[sample]], index.lon[positions[sample]]),
+        haversine_km(lats[sample], lons[sample], index.lat[expected], index.lon[expected])
+    )
+    print(f"matches brute force: {same.mean():.2%}")
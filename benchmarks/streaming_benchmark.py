@@ -0,0 +1,42 @@
+"""
+benchmarks/streaming_benchmark.py
+
+Measures throughput and peak resident memory of streaming a ``flight_events`` or ``measurements`` 
+file into PostgreSQL.
+
+Run on a fresh process for each file, as peak RSS is the maximum for the whole process.
+Uses the ``resource`` module, so runs on Linux and macOS only.
+
+Usage: python -m benchmarks.streaming_benchmark <file> <flight_events|measurements> [batch_size]
+
+created: 19/10/26
+"""
+
+import sys
+import time
+import resource
+from src.db import TableName
+from setup.stream_ingestion import ingest_stream, STREAM_BATCH_SIZE
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB on Linux
+
+if __name__ == "__main__":
+    filename, table = sys.argv[1], TableName(sys.argv[2])
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else STREAM_BATCH_SIZE
+
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    rows = ingest_stream(filename, table, batch_size)
+    seconds = time.perf_counter() - start
+
+    print(f"file: {filename}")
+    print(f"batch size: {batch_size}")
+    print(f"rows: {rows}")
+    print(f"seconds: {seconds:.1f}")
+    print(f"rows/s: {rows / seconds:,.0f}")
+    print(f"peak RSS: {peak_rss_mb():.0f} MB (before ingestion: {start_rss:.0f} MB)")
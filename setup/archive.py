@@ -0,0 +1,196 @@
+"""
+setup/archive.py
+
+Tiered storage for ``flight_list``: months older than ``ARCHIVE_HORIZON_MONTHS`` are exported to
+compressed parquet and removed from PostgreSQL, so the database only holds recent months.
+
+Each month is written to its own partition, ``<ARCHIVE_FOLDER>/flight_list/year=YYYY/month=MM/``, as
+zstd compressed parquet sorted by ``dof``. Rows are streamed from a server-side cursor in batches
+of ``ARCHIVE_BATCH_SIZE``, so a month is never held in memory. The month is deleted from PostgreSQL
+in the same transaction that reads it, and only if the file holds the same number of rows.
+
+Summary tables and ``data_catalog`` are not touched, so the dashboards still show archived months.
+Queries over ``flight_list`` read the archive through the ``tiered`` query backend (``src/backends.py``),
+which is used automatically once months have been archived.
+
+Summary rebuilds (``data_update --rebuild``) are skipped while months are archived, as they recount from
+``flight_list`` in PostgreSQL only. Files of archived months are treated as ingested.
+
+Usage: python -m setup.archive [--horizon MONTHS] [--dry-run]
+
+created: 19/10/26
+"""
+
+import os
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from datetime import date
+from sqlalchemy import text, Integer, Float, Date, DateTime
+from loguru import logger
+from src.db import engine, FlightList, ENCODED_FLIGHT_LIST
+from src.backends import ARCHIVE_FOLDER, archived_months
+
+# months kept in PostgreSQL, counted back from the current month. 0 disables archiving (ARCHIVE_HORIZON_MONTHS in .env)
+ARCHIVE_HORIZON_MONTHS = int(os.getenv('ARCHIVE_HORIZON_MONTHS', 0))
+
+# rows read from PostgreSQL and written to parquet at a time (ARCHIVE_BATCH_SIZE in .env)
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 250000))
+
+# rows are deleted from flight_list_encoded when encoded storage is enabled (flight_list is a view)
+HOT_TABLE = 'flight_list_encoded' if ENCODED_FLIGHT_LIST else 'flight_list'
+
+def archive_schema() -> pa.Schema:
+    """
+    Parquet schema of archived ``flight_list`` rows, from the ``FlightList`` model. Fixed, so batches
+    with only nulls in a column are written with the column's type.
+    """
+    def arrow_type(column):
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, Date):
+            return pa.date32()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp('us')
+        return pa.string()
+
+    return pa.schema([(column.name, arrow_type(column)) for column in FlightList.__table__.columns])
+
+def month_end(month: date) -> date:
+    """
+    First day of the month after ``month``.
+    """
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_path(month: date, archive_folder: Path = ARCHIVE_FOLDER) -> Path:
+    """
+    Parquet file of an archived month.
+    """
+    return archive_folder / 'flight_list' / f'year={month.year}' / f'month={month.month:02d}' / f'flight_list_{month:%Y_%m}.parquet'
+
+def months_to_archive(horizon: int = ARCHIVE_HORIZON_MONTHS, today: date = None) -> list:
+    """
+    Months of ``flight_list`` in ``data_catalog`` that are older than the horizon and still in PostgreSQL.
+
+    Args:
+        horizon (int): Months kept in PostgreSQL, counted back from the current month. Defaults to ``ARCHIVE_HORIZON_MONTHS``.
+        today (date, optional): Defaults to today.
+
+    Returns:
+        list: First day of each month to archive (date), oldest first.
+    """
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - horizon
+    cutoff = date(index // 12, index % 12 + 1, 1)
+
+    query = text(f"""
+        SELECT c.month
+        FROM data_catalog c
+        WHERE c.dataset = 'flight_list'
+          AND c.month < :cutoff
+          AND EXISTS (
+              SELECT 1 FROM {HOT_TABLE} f
+              WHERE f.dof >= c.month AND f.dof < c.month + INTERVAL '1 month'
+          )
+        ORDER BY c.month;
+    """)
+    with engine.connect() as conn:
+        return [row.month for row in conn.execute(query, {'cutoff': cutoff})]
+
+def archive_month(month: date, archive_folder: Path = ARCHIVE_FOLDER, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Exports one month of ``flight_list`` to its parquet partition and deletes it from PostgreSQL.
+
+    The file is written next to the partition and moved into place before the delete is committed.
+    If the number of deleted rows doesn't match the file, the transaction is rolled back and the file removed.
+
+    Args:
+        month (date): First day of the month.
+        archive_folder (Path): Archive folder. Defaults to ``ARCHIVE_FOLDER``.
+        batch_size (int): Rows read and written at a time. Defaults to ``ARCHIVE_BATCH_SIZE``.
+
+    Returns:
+        int: Rows archived.
+
+    Raises:
+        RuntimeError: If the rows deleted don't match the rows written.
+    """
+    schema = archive_schema()
+    params = {'start': month, 'end': month_end(month)}
+    path = partition_path(month, archive_folder)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+
+    select = text(f"""
+        SELECT {', '.join(schema.names)}
+        FROM flight_list
+        WHERE dof >= :start AND dof < :end
+        ORDER BY dof;
+    """)
+
+    with engine.connect() as conn, conn.begin():
+        rows = 0
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            stream = conn.execution_options(stream_results=True, max_row_buffer=batch_size)
+            for chunk in pd.read_sql(select, stream, params=params, chunksize=batch_size):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+
+        written = pq.read_metadata(tmp_path).num_rows
+        deleted = conn.execute(text(f"DELETE FROM {HOT_TABLE} WHERE dof >= :start AND dof < :end"), params).rowcount
+
+        if not rows == written == deleted:
+            tmp_path.unlink()
+            raise RuntimeError(f"Archive of {month:%Y-%m} stopped: {rows} rows read, {written} written, {deleted} deleted")
+
+        tmp_path.replace(path)
+
+    logger.info(f"Archived {rows} rows of {month:%Y-%m} to {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return rows
+
+def vacuum():
+    """
+    Reclaims the space of deleted rows and refreshes planner statistics (``VACUUM`` can't run in a transaction).
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text(f"VACUUM (ANALYZE) {HOT_TABLE}"))
+    logger.info(f"Vacuumed {HOT_TABLE}")
+
+def archive_old_months(horizon: int = ARCHIVE_HORIZON_MONTHS, dry_run: bool = False) -> list:
+    """
+    Archives every month of ``flight_list`` older than the horizon, then vacuums the table.
+
+    Args:
+        horizon (int): Months kept in PostgreSQL. 0 disables archiving. Defaults to ``ARCHIVE_HORIZON_MONTHS``.
+        dry_run (bool): If True, only logs the months that would be archived.
+
+    Returns:
+        list: Months archived (or that would be archived).
+    """
+    if horizon <= 0:
+        logger.info("SKIPPING: archiving is disabled (ARCHIVE_HORIZON_MONTHS=0)")
+        return []
+
+    months = months_to_archive(horizon)
+    if dry_run or not months:
+        logger.info(f"{len(months)} months to archive: {', '.join(f'{m:%Y-%m}' for m in months) or '-'}")
+        return months
+
+    for month in months:
+        archive_month(month)
+    vacuum()
+
+    logger.info(f"{len(archived_months())} months archived in {ARCHIVE_FOLDER}")
+    return months
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old flight_list months to parquet.")
+    parser.add_argument('--horizon', type=int, default=ARCHIVE_HORIZON_MONTHS, help="months kept in PostgreSQL")
+    parser.add_argument('--dry-run', action='store_true', help="list the months that would be archived")
+    args = parser.parse_args()
+
+    archive_old_months(args.horizon, args.dry_run)
@@ -0,0 +1,57 @@
+"""
+setup/catalog.py
+
+Maintains ``data_catalog``, the months available in each dataset.
+
+Months are counted in memory for each ingested ``flight_list`` and ``emissions`` file and added to
+the catalog, so the dashboard dropdowns never need a ``DISTINCT`` scan. ``rebuild_catalog`` recounts
+everything for databases ingested before the catalog existed.
+
+created: 19/10/26
+"""
+
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, DataCatalog
+from setup.rollups import upsert_rollup
+
+here = Path(__file__).resolve().parent
+
+def row_months(df: pd.DataFrame, dataset: str) -> pd.Series:
+    """
+    First day of the month of each row of a ``flight_list`` (``dof``) or ``emissions`` (``year``, ``month``, any case) dataframe.
+    """
+    df = df.rename(columns=str.lower)
+
+    if dataset == 'emissions':
+        return pd.to_datetime(pd.DataFrame({'year': df['year'], 'month': df['month'], 'day': 1})).dt.date
+    return pd.to_datetime(df['dof']).dt.to_period('M').dt.to_timestamp().dt.date
+
+def update_catalog(df: pd.DataFrame, dataset: str, conn=None):
+    """
+    Adds the months of one ingested file to ``data_catalog``.
+
+    Args:
+        df (pd.DataFrame): Dataframe of the ingested file. ``flight_list`` files need a ``dof`` column, 
+            ``emissions`` files ``year`` and ``month`` columns (any case).
+        dataset (str): ``flight_list`` or ``emissions``.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    catalog = row_months(df, dataset).value_counts().rename_axis('month').reset_index(name='count')
+    catalog.insert(0, 'dataset', dataset)
+
+    upsert_rollup(catalog, DataCatalog, ['dataset', 'month'], conn=conn)
+    logger.info(f"Updated {len(catalog)} {dataset} months in data_catalog")
+
+def rebuild_catalog():
+    """
+    Recounts ``data_catalog`` from ``flight_list`` and ``emissions`` (``sql/update_data_catalog.sql``).
+    """
+    query = (here.parent / 'sql' / 'update_data_catalog.sql').read_text()
+
+    with engine.begin() as conn:
+        conn.execute(text(query))
+
+    logger.info("Rebuilt data_catalog")
@@ -12,26 +12,37 @@ Modifications:
     - Skip file for download if csv with filename already exists
     - Convert parquet to csv for ingestion into PostgreSQL
     - Added function to download new data releases and missing data 
+    - Download ``flight_events`` and ``measurements`` as parquet when enabled
+    - Optionally keep parquet files so ingestion can push column projection and row filters into the reader
+    - Detect new and republished releases with HEAD requests, conditional GETs and content hashes kept in a manifest
 
 Note: Eurocontrol filename ``co2_emmissions_by_state`` contains a typo for "emissions". 
 
 Original author: Eurocontrol Open Performance Data Initiative
 Source: https://www.opdi.aero/flight-list-data
-Last modified: 26/8/25 c-baines
+Last modified: 19/10/26 c-baines
 """
 
 import os
+import hashlib
 import requests
+from dotenv import load_dotenv, find_dotenv
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
 from pathlib import Path
 import pandas as pd
 from loguru import logger
+from src.db import INCLUDE_EVENTS_MEASUREMENTS
+from setup.download_manifest import DownloadManifest
 
+load_dotenv(find_dotenv())
 
 # ADDED: get parent directory
 here = Path(__file__).resolve().parent 
 
+# ADDED: keep downloaded parquet files instead of converting to csv (KEEP_PARQUET=true in .env)
+KEEP_PARQUET = os.getenv('KEEP_PARQUET', 'false').lower() == 'true'
+
 def generate_urls(data_type: str, start_date: str, end_date: str) -> list:
     """
     Generate a list of URLs for ``flight_list``, ``flight_events``, ``measurements`` or ``co2_emmissions_by_state``.
@@ -81,52 +92,123 @@ def generate_urls(data_type: str, start_date: str, end_date: str) -> list:
 
     return urls
 
-def download_files(urls: list, save_folder: str):
+def download_files(urls: list, save_folder: str, keep_parquet: bool = KEEP_PARQUET, manifest: DownloadManifest = None) -> list:
     """
-    Download files from the generated URLs and save them in the specified folder.
+    Download new and changed files from the generated URLs and save them in the specified folder.
+
+    Each URL is checked with a ``HEAD`` request first. Files whose ``ETag``, ``Last-Modified`` and 
+    ``Content-Length`` match the download manifest are skipped, and months that are not released yet 
+    (404) are skipped without an error. Files that are downloaded again are only replaced if their
+    SHA-256 differs from the manifest. Releases loaded by the streaming pipeline (``file`` is ``streamed``
+    in the manifest) are checked the same way without a local file, so they're only downloaded if republished.
 
     Args:
         urls (list): List of URLs to download.
         save_folder (str): Folder to save downloaded files.
+        keep_parquet (bool): If True, parquet files are not converted to csv. Defaults to ``KEEP_PARQUET`` in .env.
+        manifest (DownloadManifest, optional): Release manifest. Defaults to ``setup/data/download_manifest.json``.
+
+    Returns:
+        list: Names of new or changed files.
     """
     os.makedirs(save_folder, exist_ok=True)
+    manifest = manifest or DownloadManifest()
+    changed = []
 
     for url in urls:
         file_name = url.split("/")[-1] # file_name "flight_list_{YYYYmm}.parquet"
         save_path = os.path.join(save_folder, file_name)
-        # ADDED: skip file if file_name.csv already exists 
+        # ADDED: existing csv, or parquet file that was kept
         csv_path = save_path.split(".")[0] + '.csv'
-        if os.path.exists(csv_path): 
-            logger.info(f"SKIPPING: {csv_path} already exists.")
+        local_path = next((p for p in (csv_path, save_path) if os.path.exists(p)), None)
+        entry = manifest.get(url)
+        present = local_path or entry.get('file') == 'streamed' # streamed releases are in the database without a file
+
+        # ADDED: compare release headers with the manifest before downloading
+        try:
+            head = requests.head(url, allow_redirects=True, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to check {url}: {e}")
+            continue
+
+        if head.status_code == 404:
+            logger.info(f"NOT RELEASED: {file_name}")
             continue
 
+        if head.ok and present:
+            if manifest.is_unchanged(url, head.headers):
+                logger.info(f"UNCHANGED: {file_name}")
+                continue
+
+            if not manifest.get(url): # downloaded before the manifest existed
+                manifest.update(url, head.headers, file=os.path.basename(local_path))
+                logger.info(f"SKIPPING: {local_path} already exists, added to manifest")
+                continue
+
         # MODIFIED: changed from print() to logger.info()
         logger.info(f"DOWNLOADING: {url}")
 
+        # ADDED: conditional GET, so the server can answer 304 if nothing changed
+        conditional = {}
+        if present and entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if present and entry.get('last-modified'):
+            conditional['If-Modified-Since'] = entry['last-modified']
+
+        # ADDED: download to a temporary file, hashing as it's written
+        tmp_path = save_path + '.part'
+        digest = hashlib.sha256()
+
         try:
-            response = requests.get(url, stream=True)
+            response = requests.get(url, stream=True, headers=conditional)
+
+            if response.status_code == 304:
+                manifest.update(url, head.headers)
+                logger.info(f"UNCHANGED: {file_name} (not modified)")
+                continue
+
             response.raise_for_status()
 
-            with open(save_path, "wb") as file:
-                for chunk in response.iter_content(chunk_size=1024):
+            with open(tmp_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
                     file.write(chunk)
-
-            # MODIFIED: changed from print() to logger.info()
-            logger.info(f"SAVED TO {save_path}")
+                    digest.update(chunk)
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to download {url}: {e}. This month's data may not be released yet")
+            logger.error(f"Failed to download {url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             continue
 
+        sha256 = digest.hexdigest()
+
+        # ADDED: headers changed but the content didn't
+        if present and entry.get('sha256') == sha256:
+            os.remove(tmp_path)
+            manifest.update(url, response.headers, sha256)
+            logger.info(f"UNCHANGED: {file_name} (same content)")
+            continue
+
+        os.replace(tmp_path, save_path)
+
+        # MODIFIED: changed from print() to logger.info()
+        logger.info(f"SAVED TO {save_path}")
+
         # ADDED: convert .parquet to .csv and delete .parquet
-        if save_path.split(".")[-1] == "parquet":
+        if save_path.split(".")[-1] == "parquet" and not keep_parquet:
             df = pd.read_parquet(save_path) 
-            df.to_csv(save_path.replace('.parquet', '.csv'), index=False)
+            df.to_csv(csv_path, index=False)
             logger.info(f"CONVERTED {save_path} to csv")
 
             os.remove(save_path) 
             logger.info(f"REMOVED {save_path}")
 
+        local_file = save_path if os.path.exists(save_path) else csv_path
+        manifest.update(url, response.headers, sha256, file=os.path.basename(local_file), ingested=False)
+        changed.append(file_name)
+
+    return changed
+
 def download_metadata():
     """
     Download metadata files from github. 
@@ -169,20 +251,36 @@ def download_metadata():
 
 
 # ADDED: update function  
-def update(): 
+def update() -> dict: 
     """
-    Checks downloaded data and downloads all new and missing files.
+    Checks downloaded data and downloads all new, changed and missing files.
+    ``flight_events`` and ``measurements`` are only downloaded if ``INCLUDE_EVENTS_MEASUREMENTS`` is enabled in .env,
+    and are always kept as parquet so they can be streamed into the database.
+
+    Returns:
+        dict: Data type: names of new or changed files, for incremental refresh downstream.
     """
     datasets = {
         "co2_emmissions_by_state": ("2010", datetime.strftime(date.today(), "%Y")),
         "flight_list": ("202201", datetime.strftime(date.today(), "%Y%m"))
-        #"flight_events": ("20220101", datetime.strftime(date.today(), "%Y%m"))#,
-        #"measurements": ("20220101", datetime.strftime(date.today(), "%Y%m")),
     }
+
+    if INCLUDE_EVENTS_MEASUREMENTS:
+        datasets["flight_events"] = ("20220101", datetime.strftime(date.today(), "%Y%m%d"))
+        datasets["measurements"] = ("20220101", datetime.strftime(date.today(), "%Y%m%d"))
     
+    manifest = DownloadManifest()
+    changes = {}
+
     for data_type, (start_date, end_date) in datasets.items():
         urls = generate_urls(data_type, start_date, end_date)
-        download_files(urls, f"{here}/data/{data_type}")
+        keep_parquet = KEEP_PARQUET or data_type in ("flight_events", "measurements")
+        changes[data_type] = download_files(urls, f"{here}/data/{data_type}", keep_parquet, manifest)
+
+    for data_type, files in changes.items():
+        logger.info(f"{data_type}: {len(files)} new or changed {files if files else ''}")
+
+    return changes
 
 # if __name__ == "__main__": 
 #     update()
@@ -5,32 +5,145 @@ Ingest data into PostgreSQL database
 
 author: c-baines
 created: 23/4/25
-last modified: 29/8/25
+last modified: 19/10/26
 """
 
 import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pyarrow.csv as pa_csv
 from pathlib import Path
+from datetime import date
+from typing import Iterator
+from contextlib import contextmanager
 import os
-from src.db import FlightList, Emissions, IcaoList, IsoCodes, IcaoIso, TableName, session, Airlines
+from src.db import FlightList, FlightListEncoded, Emissions, IcaoList, IsoCodes, IcaoIso, TableName, session, Airlines
 from loguru import logger
-from src.db import engine 
+from src.db import engine, ENCODED_FLIGHT_LIST, INCLUDE_EVENTS_MEASUREMENTS
 from sqlalchemy import text 
+from setup.key_cache import encode_flight_list
+from setup.route_matrix import update_route_counts
+from setup.enrichment import add_flight_metrics, update_distance_bands
+from setup.stream_ingestion import ingest_stream_folder
+from setup.catalog import update_catalog, row_months
+from setup.rollups import delete_rollup_months
+from setup.archive import month_end
+from setup.download_manifest import DownloadManifest
+from setup.fleet_utilization import FleetUtilization, update_fleet_utilization
+from setup.hourly_traffic import update_hourly_traffic, subtract_hourly_traffic
+from src.backends import archived_months
+from setup.memory import check_memory, peak_rss_mb, reset_peak_rss
+from src.profiling import profiled, PROFILE_INGEST
 
 here = Path(__file__).resolve().parent 
 
+# flight_list data goes into flight_list_encoded when encoded storage is enabled
+FLIGHT_LIST_TABLE = TableName.flight_list_encoded if ENCODED_FLIGHT_LIST else TableName.flight_list
+
+# rows read, converted and inserted at a time (INGEST_BATCH_SIZE in .env)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 100000))
+
+# resident memory ceiling in MB, checked after each batch. 0 disables the check (INGEST_MAX_RSS_MB in .env)
+INGEST_MAX_RSS_MB = int(os.getenv('INGEST_MAX_RSS_MB', 0))
+
+# columns read from flight_list files for each ingestion profile (None reads all columns)
+PROFILE_COLUMNS = {
+    'full': None,
+    'dashboard': [
+        'id', 'icao24', 'flt_id', 'dof', 'adep', 'ades', 'model', 'typecode', 
+        'icao_aircraft_class', 'icao_operator', 'first_seen', 'last_seen'
+    ]
+}
+
+def get_ingest_profile() -> dict:
+    """
+    Builds the ``flight_list`` column projection and row filter from the ingestion settings in .env:
+        - INGEST_PROFILE: ``full`` (default) or ``dashboard`` (skips columns the dashboard doesn't use).
+        - INGEST_START_DATE, INGEST_END_DATE: Date window (YYYY-MM-DD, inclusive) on ``dof``.
+        - INGEST_AIRPORTS: Comma separated ICAO codes. Keeps flights departing from or arriving at these airports.
+
+    Returns:
+        dict: 
+            - columns (list | None): Columns to read.
+            - filters (list | None): Row filter in pyarrow disjunctive normal form (list of AND-ed condition lists, OR-ed together).
+    """
+    profile = os.getenv('INGEST_PROFILE', 'full')
+    start_date = os.getenv('INGEST_START_DATE')
+    end_date = os.getenv('INGEST_END_DATE')
+    airports = os.getenv('INGEST_AIRPORTS')
+
+    conditions = []
+    if start_date:
+        conditions.append(('dof', '>=', date.fromisoformat(start_date)))
+    if end_date:
+        conditions.append(('dof', '<=', date.fromisoformat(end_date)))
+
+    if airports:
+        airports = [a.strip().upper() for a in airports.split(',')]
+        filters = [conditions + [('adep', 'in', airports)], conditions + [('ades', 'in', airports)]]
+    else:
+        filters = [conditions] if conditions else None
+
+    return {'columns': PROFILE_COLUMNS[profile], 'filters': filters}
+
+INGEST_PROFILE = get_ingest_profile()
+
+def iter_file(filename: str, table: TableName, delimiter: str = ',', columns: list = None,
+              batch_size: int = INGEST_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Reads a csv or parquet file one batch of rows at a time, so memory use depends on the batch size
+    rather than the file size.
+
+    ``flight_list`` files are read with the ingestion profile's column projection and row filter. 
+    For parquet files both are pushed down into the reader, so unused column chunks and row groups 
+    whose statistics don't match the filter are never decoded.
+
+    Args:
+        filename (str): Path to the csv or parquet file.
+        table (TableName): Enum value indicating the target table.
+        delimiter (str): Delimiter in csv file. Defaults to ','.
+        columns (list, optional): Columns to read instead of the profile columns (``flight_list`` only).
+        batch_size (int): Maximum rows per batch. Defaults to ``INGEST_BATCH_SIZE``.
+
+    Yields:
+        pd.DataFrame: The next batch of rows.
+    """
+    if table not in (TableName.flight_list, TableName.flight_list_encoded):
+        yield from pd.read_csv(filename, delimiter=delimiter, chunksize=batch_size)
+        return
+
+    if filename.endswith('.parquet'):
+        file_format = ds.ParquetFileFormat()
+    else:
+        file_format = ds.CsvFileFormat(parse_options=pa_csv.ParseOptions(delimiter=delimiter))
+
+    filters = INGEST_PROFILE['filters']
+    dataset = ds.dataset(filename, format=file_format)
+    batches = dataset.to_batches(
+        columns=columns or INGEST_PROFILE['columns'],
+        filter=pq.filters_to_expression(filters) if filters else None,
+        batch_size=batch_size
+    )
+    for batch in batches:
+        if batch.num_rows: # batches of row groups the filter removed entirely are empty
+            yield batch.to_pandas()
+
 def is_ingested(filename: str, table: TableName, delimiter: str = ','):
     """
-    Checks whether a CSV file has already been ingested into the PostgreSQL database
-    by comparing a random sample of 3 rows against existing records.
+    Checks whether a CSV or parquet file has already been ingested into the PostgreSQL database
+    by comparing a random sample of 3 rows from each batch against existing records, so a file that
+    stopped partway is detected wherever it stopped. The file is read in batches, and ``flight_list``
+    files only read their ``id`` and ``dof`` columns.
 
     Args:
-        filename (str): Path or name of the CSV file to check.
+        filename (str): Path or name of the CSV or parquet file to check.
         table (TableName): Enum value representing the database table to check against.
         delimiter (str): Delimiter used in the CSV file (defaults to ',').
 
     Returns:
         bool: 
-            - True if all sampled rows are already present in the database.  
+            - True if all sampled rows are already present in the database, no rows match the ingestion profile,
+              or (``flight_list``) all rows are in months archived by ``setup/archive.py``.  
             - False if none of the sampled rows are present in the database.
 
     Raises:
@@ -40,10 +153,19 @@ def is_ingested(filename: str, table: TableName, delimiter: str = ','):
 
     logger.info(f'Checking if {filename} already ingested... ')
 
-    df = pd.read_csv(filename, delimiter=delimiter)
+    if table in (TableName.flight_list, TableName.flight_list_encoded):
+        samples, months = [], set()
+        for batch in iter_file(filename, table, delimiter, columns=['id', 'dof']): # only rows kept by the ingestion profile
+            samples.append(batch.sample(n=min(3, len(batch)))) # random sample of each batch
+            months.update(pd.to_datetime(batch['dof']).dt.to_period('M').dt.to_timestamp().dt.date)
 
-    if table == TableName.flight_list:
-        df = df.sample(n=3) # random sample
+        if not samples: # no rows match the ingestion profile's filter
+            return True
+
+        if months <= set(archived_months()): # rows were ingested, then moved to the archive
+            return True
+
+        df = pd.concat(samples, ignore_index=True)
         rows = df.to_dict(orient='records') # convert df to list of dictionaries
         ids_to_check = [f"'{row.get('id')}'" for row in rows] # convert list of dictionaries to list of ids (=ec_id)
         query = text(f""" 
@@ -60,9 +182,12 @@ def is_ingested(filename: str, table: TableName, delimiter: str = ','):
         else:
             raise Exception('File partially ingested')
 
-    elif table==TableName.emissions:
-        df = df.sample(n=3)
-        rows = df.to_dict(orient='records')
+    if table==TableName.emissions:
+        samples = [batch.sample(n=min(3, len(batch))) for batch in iter_file(filename, table, delimiter)]
+        if not samples: # empty file
+            return True
+
+        rows = pd.concat(samples).to_dict(orient='records')
         conditions = [f"(state_name='{row.get('STATE_NAME')}' and year={row.get('YEAR')} and month={row.get('MONTH')})" for row in rows]
         query = text(f"""
                 Select * from emissions
@@ -84,8 +209,9 @@ def is_ingested(filename: str, table: TableName, delimiter: str = ','):
                          """)
         
         sql_df = pd.read_sql(query,engine)
+        file_rows = sum(len(batch) for batch in iter_file(filename, table, delimiter))
 
-        if sql_df['count'].to_list()[0] == len(df):
+        if sql_df['count'].to_list()[0] == file_rows:
             return True
         elif sql_df['count'].to_list()[0] == 0:
             return False
@@ -106,14 +232,19 @@ def dict_to_db(row: dict, table: TableName):
     Raises:
         KeyError: If required fields are missing from the row dictionary.
     """
-    # make all keys lowercase and remove 'NaN' strings
-    row = {k.lower(): v for k,v in row.items() if not str(v).lower()=='nan'}
+    # make all keys lowercase and remove 'NaN' and 'NaT' (missing timestamp) values
+    row = {k.lower(): v for k,v in row.items() if not str(v).lower() in ('nan', 'nat')}
 
     if table == TableName.flight_list:
         row.update({'ec_id': row['id']}) # rename id column 
         row.pop('id')
         db_obj = FlightList(**row)
 
+    if table == TableName.flight_list_encoded:
+        row.update({'ec_id': row['id']}) # rename id column 
+        row.pop('id')
+        db_obj = FlightListEncoded(**row)
+
     if table == TableName.emissions:
         if "flight_month" in row: # 2019-2021 data files have extra date column 
             row.pop("flight_month") # remove extra date column 
@@ -153,36 +284,159 @@ def dict_to_db(row: dict, table: TableName):
       
     return db_obj
 
-def ingest_csv(filename: str, table: TableName, delimiter: str = ',' ):
+def delete_months(months: set, table: TableName, conn):
     """
-    Ingests ORM objects into PostgreSQL table.
+    Deletes whole months from a ``flight_list`` or ``emissions`` table and from the summary tables updated
+    during ingestion, in the caller's transaction, so a republished file replaces them.
 
     Args:
-        filename (str): Name of the csv file to ingest.
+        months (set): First day of each month (date).
+        table (TableName): Enum value indicating the table.
+        conn (Connection): Connection of the transaction that ingests the republished file.
+    """
+    if not months:
+        return
+    dataset = 'emissions' if table == TableName.emissions else 'flight_list'
+    if dataset == 'flight_list':
+        subtract_hourly_traffic(months, conn) # reads the months' rows, so before they're deleted
+
+    for month in sorted(months):
+        if dataset == 'emissions':
+            query = text("DELETE FROM emissions WHERE year = :year AND month = :month")
+            params = {'year': month.year, 'month': month.month}
+        else:
+            query = text(f"DELETE FROM {table.value} WHERE dof >= :start AND dof < :end")
+            params = {'start': month, 'end': month_end(month)}
+        deleted = conn.execute(query, params).rowcount
+        logger.info(f"Deleted {deleted} {table.value} rows of {month:%Y-%m} to replace them")
+
+    delete_rollup_months(months, dataset, conn)
+
+def ingest_file(filename: str, table: TableName, delimiter: str = ',', batch_size: int = INGEST_BATCH_SIZE,
+                max_rss_mb: int = INGEST_MAX_RSS_MB, replace: bool = False) -> int:
+    """
+    Ingests a file into a PostgreSQL table one batch at a time. Each batch is prepared, inserted and
+    added to the summary tables before the next is read. The fleet utilization rollup carries only the
+    last flight of each aircraft between batches (``FleetUtilization``), so memory doesn't grow with the file.
+
+    The whole file is one transaction: rows and summary table updates are committed after the last batch,
+    and rolled back if any batch fails or the memory ceiling is reached, so a file is never left half
+    ingested or counted in some rollups but not others.
+
+    Args:
+        filename (str): Name of the csv or parquet file to ingest.
         table (TableName): Enum value indicating the target table. 
         delimiter (str): Delimiter in csv file. Defaults to ','.
+        batch_size (int): Maximum rows per batch. Defaults to ``INGEST_BATCH_SIZE``.
+        max_rss_mb (int): Memory ceiling in MB, checked after each batch. Defaults to ``INGEST_MAX_RSS_MB``.
+        replace (bool): If True, the months in the file are deleted (with their summary table rows) before
+            its rows are inserted, in the same transaction. Used for republished files.
+
+    Returns:
+        int: Number of rows ingested.
+
+    Raises:
+        MemoryError: If resident memory goes over ``max_rss_mb``.
+    """
+    is_flight_list = table in (TableName.flight_list, TableName.flight_list_encoded)
+    replaced = set()
+    rows = 0
+
+    with ingest_transaction() as conn:
+        fleet = FleetUtilization(conn)
+        for df in iter_file(filename, table, delimiter, batch_size=batch_size):
+            df = prepare_dataframe(df, table)
+            if replace: # months are deleted when first seen, so later batches of a month aren't deleted with it
+                months = set(row_months(df, 'flight_list' if is_flight_list else 'emissions')) - replaced
+                delete_months(months, table, conn)
+                replaced |= months
+            insert_rows(df, table, batch_size)
+            update_summaries(df, table, fleet=False, conn=conn)
+
+            if is_flight_list:
+                fleet.add(df)
+
+            rows += len(df)
+            del df
+            check_memory(max_rss_mb, hint="Lower INGEST_BATCH_SIZE")
+
+    logger.info(f"Committed {rows} rows of {filename}")
+    return rows
+
+def prepare_dataframe(df: pd.DataFrame, table: TableName) -> pd.DataFrame:
     """
-    df = pd.read_csv(filename, delimiter=delimiter)
+    Adds derived columns to a ``flight_list`` dataframe before loading: distance and block time, 
+    and dimension table keys when encoded storage is enabled. Other tables are returned unchanged.
 
-    db_objects = []
+    Args:
+        df (pd.DataFrame): Rows read from a data file.
+        table (TableName): Enum value indicating the target table. 
 
-    for row in df.to_dict(orient='records'): 
-        db_obj = dict_to_db(row, table)
-        db_objects.append(db_obj) # append each row to db_objects 
-        
-        if len(db_objects) == 100000: # commit every 100k rows 
-            session.bulk_save_objects(db_objects)
-            session.commit()
+    Returns:
+        pd.DataFrame: Rows ready for ``insert_rows``.
+    """
+    if table in (TableName.flight_list, TableName.flight_list_encoded):
+        df = add_flight_metrics(df) # distance and block time, calculated before airports are encoded
 
-            logger.info(f"Inserted {len(db_objects)} records into the database")
+    if table == TableName.flight_list_encoded:
+        df = encode_flight_list(df) # replace repeated strings with dimension table keys
 
-            db_objects = []
+    return df
 
-    if db_objects: # if less than 100k left in db_objects, commit remainder 
-        session.bulk_save_objects(db_objects)
+@contextmanager
+def ingest_transaction():
+    """
+    Transaction of the shared session for inserted rows and their summary table updates, so a failure
+    rolls back both and the rollups never count rows that aren't in the database (or miss rows that are).
+
+    Yields:
+        Connection: Connection of the session's transaction, for the ``conn`` argument of the rollup updates.
+    """
+    try:
+        yield session.connection()
         session.commit()
+    except BaseException:
+        session.rollback()
+        raise
 
-        logger.info(f"Inserted {len(db_objects)} records into the database")
+def insert_rows(df: pd.DataFrame, table: TableName, batch_size: int = INGEST_BATCH_SIZE):
+    """
+    Inserts prepared rows into a PostgreSQL table in the session's transaction, ``batch_size`` rows per statement.
+    Rows are converted to dictionaries and ORM objects one batch at a time, so only one batch of them is held in memory.
+    The caller commits (``ingest_transaction``).
+
+    Args:
+        df (pd.DataFrame): Rows from ``prepare_dataframe``.
+        table (TableName): Enum value indicating the target table. 
+        batch_size (int): Rows per insert. Defaults to ``INGEST_BATCH_SIZE``.
+    """
+    for start in range(0, len(df), batch_size):
+        records = df.iloc[start:start + batch_size].to_dict(orient='records')
+        session.bulk_save_objects([dict_to_db(row, table) for row in records])
+
+        logger.info(f"Inserted {len(records)} records into the database")
+
+def update_summaries(df: pd.DataFrame, table: TableName, fleet: bool = True, conn=None):
+    """
+    Adds inserted rows to the summary tables that are updated during ingestion.
+
+    Args:
+        df (pd.DataFrame): Rows from ``prepare_dataframe``.
+        table (TableName): Enum value indicating the target table. 
+        fleet (bool): If True, also updates the fleet utilization rollup. Batched callers pass False and add each
+            batch to a ``FleetUtilization``, so turnarounds between batches are counted.
+        conn (Connection, optional): Connection of the transaction that inserted the rows. Defaults to a new transaction per table.
+    """
+    if table in (TableName.flight_list, TableName.flight_list_encoded):
+        update_route_counts(df, conn=conn) # add file's routes to the route matrix
+        update_distance_bands(df, conn=conn)
+        if fleet:
+            update_fleet_utilization(df, conn=conn)
+        update_hourly_traffic(df, conn=conn)
+        update_catalog(df, 'flight_list', conn=conn)
+
+    if table == TableName.emissions:
+        update_catalog(df, 'emissions', conn=conn)
 
 def iterate_folder(folder: str):
     """
@@ -192,31 +446,67 @@ def iterate_folder(folder: str):
         folder (str): Directory of files to ingest.
 
     Yields:
-        str: The path to each file in the folder. 
+        str: The path to each csv or parquet file in the folder. 
         
     """
     for root, dirs, files in os.walk(folder):
         for file in files:
-            if file.endswith('.csv'):
+            if file.endswith(('.csv', '.parquet')):
                 yield os.path.join(root, file)
 
-def ingest_folder(folder: str, table: TableName, delimiter: str = ',',  engine='python', encoding='utf-8'):
+def ingest_folder(folder: str, table: TableName, delimiter: str = ',',  engine='python', encoding='utf-8', profile: bool = None,
+                  manifest: DownloadManifest = None):
     """ 
-    Ingests each file in a folder into the provided PostgreSQL table.
+    Ingests each file in a folder into the provided PostgreSQL table, one batch of ``INGEST_BATCH_SIZE``
+    rows at a time. The peak resident memory while ingesting each file is logged.
+
+    Files the download manifest lists as downloaded but not ingested (new or republished releases) replace
+    the months they hold, as ``is_ingested`` can't tell a corrected release from the one already ingested.
+    Other files are ingested if ``is_ingested`` doesn't find their rows.
 
     Args:
         folder (str): Directory of files to ingest.
         table (TableName): Enum value indicating the target table.
         delimiter (str): Delimiter in csv file. Defaults to ','.
+        profile (bool, optional): If True, writes a sampled profile of each ingested file (``src/profiling.py``).
+            Defaults to ``PROFILE_INGEST`` in .env.
+        manifest (DownloadManifest, optional): Download manifest. Files are marked ingested once committed.
+            Defaults to no manifest (every file is checked with ``is_ingested``).
+
+    Returns:
+        list: Names of the files ingested.
     """
+    profile = PROFILE_INGEST if profile is None else profile
+    pending = set(manifest.pending(here/'data'/folder)) if manifest else set()
+    archived = set(archived_months())
+    ingested = []
+
     for filename in iterate_folder(str(here/'data'/folder)):
-        if is_ingested(filename, table, delimiter)==False: # check if file is already ingested or not
-            logger.info(f"Processing {filename}")
-            ingest_csv(filename, table, delimiter)
-            logger.info(f"Finished processing {filename}")
+        per_file = reset_peak_rss() # peak of this file, or of the process if it can't be reset
+        name = Path(filename).name
+        replace = name in pending
+
+        if replace and table != TableName.emissions and archived:
+            months = {m for df in iter_file(filename, table, delimiter, columns=['dof']) for m in row_months(df, 'flight_list')}
+            if months & archived:
+                logger.warning(f"SKIPPING: {filename} was republished, but {', '.join(f'{m:%Y-%m}' for m in sorted(months & archived))} "
+                               "is archived (setup/archive.py) and can't be replaced")
+                continue
+
+        if replace or is_ingested(filename, table, delimiter)==False: # check if file is already ingested or not
+            logger.info(f"Processing {filename}{' (new or republished release, replacing its months)' if replace else ''}")
+            with profiled(f"ingest_{name}", enabled=profile):
+                rows = ingest_file(filename, table, delimiter, replace=replace)
+            logger.info(f"Finished processing {filename}: {rows} rows, peak RSS {peak_rss_mb():.0f} MB{'' if per_file else ' (process)'}")
+            ingested.append(name)
         else:
             logger.info(f"{filename} is already ingested. Skipping file")
 
+        if replace:
+            manifest.mark_ingested(name)
+
+    return ingested
+
 def setup():
     """
     Ingests each dataset into PostgreSQL DB.
@@ -226,11 +516,22 @@ def setup():
     ingest_folder('icao_iso', TableName.icao_iso)
     ingest_folder('airlines', TableName.airlines)
     ingest_folder('co2_emmissions_by_state', TableName.emissions)
-    ingest_folder('flight_list', TableName.flight_list)
+    ingest_folder('flight_list', FLIGHT_LIST_TABLE)
+
+    if INCLUDE_EVENTS_MEASUREMENTS:
+        ingest_stream_folder('flight_events', TableName.flight_events)
+        ingest_stream_folder('measurements', TableName.measurements)
 
 def update():
     """
     Ingests new data releases for ``flight_list`` and ``co2_emmissions_by_state`` datasets into PostgreSQL DB.
+    Republished releases recorded in the download manifest replace the months they hold.
+    Also streams new ``flight_events`` and ``measurements`` releases if ``INCLUDE_EVENTS_MEASUREMENTS`` is enabled in .env.
     """
-    ingest_folder('co2_emmissions_by_state', TableName.emissions)
-    ingest_folder('flight_list', TableName.flight_list)
+    manifest = DownloadManifest()
+    ingest_folder('co2_emmissions_by_state', TableName.emissions, manifest=manifest)
+    ingest_folder('flight_list', FLIGHT_LIST_TABLE, manifest=manifest)
+
+    if INCLUDE_EVENTS_MEASUREMENTS:
+        ingest_stream_folder('flight_events', TableName.flight_events)
+        ingest_stream_folder('measurements', TableName.measurements)
@@ -1,28 +1,492 @@
 """
 setup/data_update.py
 
-Downloads and ingests new data releases and updates PostgreSQL DB. 
+Downloads and ingests new data releases and updates PostgreSQL DB.
+
+Runs the update as a dependency graph of stages:
+
+    schema ──────────────────┬─> ingest_reference ─┐
+    download_metadata ───────┘                     ├─> ingest_flight_list ─> classification ─┐
+    download_flight_list ──────────────────────────┘                                         │
+    download_emissions ─> ingest_emissions ──────────────────────────────────────────────────┼─> summaries ─> invalidate_cache
+    download_events ─> ingest_events ────────────────────────────────────────────────────────┘
+
+The file names each download finds new or changed are recorded in the run state. An ingest stage is skipped
+when its download found nothing and the download manifest has no file waiting to be ingested (``--init``
+always ingests). ``classification`` recounts ``manufacturer_count_summary`` for the years of the
+``flight_list`` files ingested in the run (``setup/manufacturer_counts.py``), or every year with ``--rebuild``.
+
+The choropleth country outlines (``europe_geometry``) are built after ``ingest_reference`` if they're missing.
+If ``ARCHIVE_HORIZON_MONTHS`` is set, months older than the horizon are archived to parquet (``archive``,
+see ``setup/archive.py``) after the summaries are refreshed.
+
+Stages start as soon as the stages they depend on have finished, so the downloads run in parallel.
+Stages that write to the database share one SQLAlchemy session and run one at a time. A lock file
+stops two updates running at once, and the result of each stage is saved so a failed run can be
+resumed from the failed stage.
+
+Usage:
+    python -m setup.data_update                  # update everything
+    python -m setup.data_update --init           # create the data tables first (new database)
+    python -m setup.data_update --since 202501   # only check releases from January 2025
+    python -m setup.data_update --stream         # stream flight_list releases into the DB without data files
+    python -m setup.data_update --dry-run        # print the stages that would run
+    python -m setup.data_update --resume         # skip stages completed by the last run
+    python -m setup.data_update --profile        # write a sampled profile of each ingested file
+
+Backfill distance and block time on a database ingested before they existed with ``setup.enrichment.backfill_flight_metrics()``
+(sql/update_flight_metrics.sql, which also covers ``flight_list_encoded``).
 
 created: 26/7/25
-modified: 29/8/25
+modified: 19/10/26
 """
 
-from setup import data_ingestion as ingest, data_download as download
-from setup.data_download import download_metadata 
-from src.db import create_tables
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from sqlalchemy import text
+from loguru import logger
+from setup import data_ingestion as ingest, download_pipeline
+from setup.data_download import download_metadata, generate_urls, download_files, KEEP_PARQUET
+from setup.download_manifest import DownloadManifest
+from setup.stream_ingestion import ingest_stream_folder
+from setup.route_matrix import rebuild_route_counts
+from setup.catalog import rebuild_catalog
+from setup.fleet_utilization import rebuild_fleet_utilization
+from setup.hourly_traffic import rebuild_hourly_traffic
+from setup.manufacturer_counts import update_manufacturer_counts, rebuild_manufacturer_counts
+from setup.europe_geometry import write_europe_geometry, GEOJSON_PATH
+from setup.archive import archive_old_months, ARCHIVE_HORIZON_MONTHS
+from src.backends import archived_months
+from src.db import engine, sql_folder, create_tables, create_summary_tables, TableName, INCLUDE_EVENTS_MEASUREMENTS
+from src.catalog import CACHE_STAMP
+
+here = Path(__file__).resolve().parent
+
+LOCK_PATH = here / 'data' / 'update.lock'
+STATE_PATH = here / 'data' / 'update_state.json'
+
+# summary tables recalculated after ingestion (manufacturer counts are updated first, by the classification stage)
+SUMMARY_SQL = ['update_card_count_summary.sql', 'update_flight_count_summary.sql']
+
+class Stage():
+    """
+    One step of the update.
+
+    Args:
+        name (str): Stage name.
+        run (callable): Function called with the parsed command line arguments.
+        after (list): Names of the stages that must finish first.
+        uses_db (bool): If True, the stage writes through the shared database session and
+            never runs at the same time as another database stage.
+    """
+    def __init__(self, name: str, run, after: list = (), uses_db: bool = False):
+        self.name = name
+        self.run = run
+        self.after = list(after)
+        self.uses_db = uses_db
+
+def run_sql(filename: str):
+    """
+    Runs a file from the ``sql`` folder in one transaction. Empty files are skipped.
+    """
+    query = (sql_folder / filename).read_text()
+    if not query.strip():
+        logger.warning(f"SKIPPING: sql/{filename} is empty")
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(query))
+    logger.info(f"Ran sql/{filename}")
+
+def release_window(args, data_type: str) -> tuple:
+    """
+    First and last release dates to check for a dataset, starting from ``--since`` (YYYYMM) if given.
+    """
+    today = date.today()
+    since = args.since
+
+    if data_type == "co2_emmissions_by_state":
+        return (since[:4] if since else "2010", today.strftime("%Y"))
+    if data_type == "flight_list":
+        return (since or "202201", today.strftime("%Y%m"))
+    return ((since or "202201") + "01", today.strftime("%Y%m%d")) # flight_events, measurements
+
+def download_dataset(args, data_type: str) -> list:
+    """
+    Downloads new and changed releases of one OPDI dataset.
+
+    Returns:
+        list: Names of new or changed files.
+    """
+    urls = generate_urls(data_type, *release_window(args, data_type))
+    keep_parquet = KEEP_PARQUET or data_type in ("flight_events", "measurements")
+    changed = download_files(urls, f"{here}/data/{data_type}", keep_parquet, args.manifest)
+    args.downloaded[data_type] = changed
+    return changed
+
+def has_new_files(args, folder: str) -> bool:
+    """
+    Whether an ingest stage has work: the download found new or changed files, or the manifest lists
+    downloaded files that haven't been ingested (e.g. after a failed run). Always True with ``--init``,
+    or if the folder's download result isn't known.
+    """
+    if args.init or folder not in args.downloaded or args.downloaded[folder]:
+        return True
+    return bool(args.manifest.pending(here / 'data' / folder))
+
+def ingest_new_files(folder: str, ingest_files):
+    """
+    Wraps the ingestion of a data folder so the stage is skipped when ``has_new_files`` is False.
+    The names of the files ingested are recorded in ``args.ingested``.
+
+    Args:
+        folder (str): Data folder, named after its dataset.
+        ingest_files (callable): Function called with the parsed command line arguments, returning the files ingested.
+    """
+    def run(args):
+        if not has_new_files(args, folder):
+            logger.info(f"SKIPPING: no new, changed or pending files in {folder}")
+            args.ingested[folder] = []
+            return
+        args.ingested[folder] = ingest_files(args) or []
+    return run
+
+def stream_flight_list(args) -> list:
+    """
+    Streams new ``flight_list`` releases into the database (``download_pipeline``).
+    """
+    urls = generate_urls('flight_list', *release_window(args, 'flight_list'))
+    loaded = download_pipeline.run_pipeline(urls, args.manifest)
+    args.ingested['flight_list'] = loaded
+    return loaded
+
+def create_schema(args):
+    """
+    Creates the data tables (``--init`` only) and any missing summary tables.
+    """
+    if args.init:
+        create_tables()
+    create_summary_tables()
+
+def ingest_reference(args):
+    """
+    Ingests the airport, country and airline reference tables.
+    """
+    ingest.ingest_folder('iata-icao', TableName.icao_list, profile=args.profile)
+    ingest.ingest_folder('iso_codes', TableName.iso_codes, ';', profile=args.profile)
+    ingest.ingest_folder('icao_iso', TableName.icao_iso, profile=args.profile)
+    ingest.ingest_folder('airlines', TableName.airlines, profile=args.profile)
+
+def ingest_events(args):
+    """
+    Streams new ``flight_events`` and ``measurements`` files into the database.
+    """
+    for folder, table in (('flight_events', TableName.flight_events), ('measurements', TableName.measurements)):
+        ingest_new_files(folder, lambda args: ingest_stream_folder(folder, table, manifest=args.manifest))(args)
+
+def classify_manufacturers(args):
+    """
+    Recounts ``manufacturer_count_summary`` for the years of the ``flight_list`` files ingested in the run,
+    or every year with ``--rebuild``. If the ingested files aren't known (a run resumed from an older state),
+    the current year is recounted.
+    """
+    if args.rebuild:
+        rebuild_manufacturer_counts()
+        return
+
+    files = args.ingested.get('flight_list')
+    if files is None:
+        years = {date.today().year}
+    else:
+        years = {int(match.group(1)) for f in files if (match := re.search(r'(\d{4})\d{2}', f))}
+
+    if not years:
+        logger.info("SKIPPING: no flight_list files were ingested")
+        return
+    update_manufacturer_counts(sorted(years))
+
+def refresh_summaries(args):
+    """
+    Recalculates the summary tables that aren't updated during ingestion. With ``--rebuild``,
+    also recounts the route matrix, fleet utilization, hourly traffic and data catalog, unless
+    months have been archived (they would be dropped from the recounts).
+    """
+    for filename in SUMMARY_SQL:
+        run_sql(filename)
+
+    if args.rebuild and archived_months():
+        logger.warning("SKIPPING rebuild: archived months aren't in flight_list and would be dropped from the summary tables")
+    elif args.rebuild:
+        rebuild_route_counts()
+        rebuild_fleet_utilization()
+        rebuild_hourly_traffic()
+        rebuild_catalog()
+
+def europe_geometry(args):
+    """
+    Builds the choropleth country outlines (``assets/europe.geojson``) if they're missing, or with ``--rebuild``.
+    A failed download is logged and doesn't fail the update, so the cache is still invalidated. The app
+    keeps the existing file, or falls back to plotly's world map without one.
+    """
+    if GEOJSON_PATH.exists() and not args.rebuild:
+        logger.info(f"SKIPPING: {GEOJSON_PATH} already exists.")
+        return
+    try:
+        write_europe_geometry()
+    except Exception as e:
+        logger.warning(f"SKIPPING: could not build {GEOJSON_PATH}: {e!r}. Retry with python -m setup.europe_geometry")
+
+def invalidate_cache(args):
+    """
+    Touches ``CACHE_STAMP`` so running apps reload their cached catalog, startup query frames and the
+    stores built from them (``refresh_startup_cache`` in ``src/stores.py``) on their next request.
+    """
+    CACHE_STAMP.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_STAMP.touch()
+    logger.info(f"Touched {CACHE_STAMP}")
+
+def build_stages(args) -> dict:
+    """
+    Builds the stage graph for the command line options.
+
+    Args:
+        args (argparse.Namespace): Parsed command line options.
+
+    Returns:
+        dict: Stage name: Stage.
+    """
+    stages = [
+        Stage('schema', create_schema, uses_db=True),
+        Stage('download_metadata', lambda args: download_metadata()),
+        Stage('download_emissions', lambda args: download_dataset(args, 'co2_emmissions_by_state')),
+        Stage('ingest_reference', ingest_reference, after=['schema', 'download_metadata'], uses_db=True),
+        Stage('ingest_emissions', ingest_new_files('co2_emmissions_by_state', lambda args: ingest.ingest_folder(
+                  'co2_emmissions_by_state', TableName.emissions, profile=args.profile, manifest=args.manifest)),
+              after=['schema', 'download_emissions'], uses_db=True)
+    ]
+
+    # distances are calculated from icao_list, so flight_list waits for the reference tables
+    if args.stream:
+        stages.append(Stage('ingest_flight_list', stream_flight_list, after=['ingest_reference'], uses_db=True))
+    else:
+        stages += [
+            Stage('download_flight_list', lambda args: download_dataset(args, 'flight_list')),
+            Stage('ingest_flight_list', ingest_new_files('flight_list', lambda args: ingest.ingest_folder(
+                      'flight_list', ingest.FLIGHT_LIST_TABLE, profile=args.profile, manifest=args.manifest)),
+                  after=['ingest_reference', 'download_flight_list'], uses_db=True)
+        ]
+
+    stages.append(Stage('classification', classify_manufacturers, after=['ingest_flight_list'], uses_db=True))
+    summaries_after = ['classification', 'ingest_emissions']
+
+    if INCLUDE_EVENTS_MEASUREMENTS:
+        stages += [
+            Stage('download_events', lambda args: [download_dataset(args, d) for d in ('flight_events', 'measurements')]),
+            Stage('ingest_events', ingest_events, after=['schema', 'download_events'], uses_db=True)
+        ]
+        summaries_after.append('ingest_events')
+
+    stages += [
+        Stage('europe_geometry', europe_geometry, after=['ingest_reference']),
+        Stage('summaries', refresh_summaries, after=summaries_after, uses_db=True)
+    ]
+    cache_after = ['summaries', 'europe_geometry']
+
+    if ARCHIVE_HORIZON_MONTHS > 0:
+        stages.append(Stage('archive', lambda args: archive_old_months(), after=['summaries'], uses_db=True))
+        cache_after.append('archive')
+
+    stages.append(Stage('invalidate_cache', invalidate_cache, after=cache_after))
+    return {stage.name: stage for stage in stages}
+
+def acquire_lock():
+    """
+    Creates the run lock file. A lock left by a process that is no longer running, or without a valid
+    process id (e.g. empty after a crash before it was written), is replaced.
+
+    Raises:
+        RuntimeError: If another update is running.
+    """
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # the lock is linked into place with the process id already written, so it's never seen empty while being created
+    own_path = LOCK_PATH.with_suffix(f'.{os.getpid()}')
+    own_path.write_text(str(os.getpid()))
+
+    while True:
+        try:
+            os.link(own_path, LOCK_PATH)
+        except FileExistsError:
+            try:
+                text_pid = LOCK_PATH.read_text().strip()
+            except FileNotFoundError: # removed since the open
+                continue
+            pid = int(text_pid) if text_pid.isdigit() else 0
+            try:
+                if pid <= 0: # os.kill(0, 0) would signal our own process group and succeed
+                    raise ProcessLookupError
+                os.kill(pid, 0) # signal 0 only checks that the process exists
+            except (ProcessLookupError, OverflowError):
+                logger.warning(f"Removing stale lock left by process {text_pid or '(none recorded)'}")
+                LOCK_PATH.unlink(missing_ok=True)
+                continue
+            except PermissionError: # running as another user
+                pass
+            own_path.unlink(missing_ok=True)
+            raise RuntimeError(f"Another update is running (process {pid}, {LOCK_PATH})")
+
+        own_path.unlink(missing_ok=True)
+        return
+
+def load_state() -> dict:
+    """
+    Stage results and file names of the last run (``setup/data/update_state.json``).
+    """
+    return json.loads(STATE_PATH.read_text()) if STATE_PATH.exists() else {'stages': {}}
+
+def save_state(state: dict):
+    """
+    Writes the stage results and file names of the current run.
+    """
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(json.dumps(state, indent=2))
+
+def run(args) -> dict:
+    """
+    Runs the stages, starting each one as soon as its dependencies have finished.
+    Stages downstream of a failed stage are marked ``blocked`` and not run. With ``--resume``, the files
+    downloaded and ingested by the resumed stages are restored from the last run.
+
+    Args:
+        args (argparse.Namespace): Parsed command line options.
+
+    Returns:
+        dict: Run state with the status and duration of each stage.
+    """
+    stages = build_stages(args)
+    last = load_state() if args.resume else {}
+    previous = last.get('stages', {})
+
+    # names of the files found by each download and loaded by each ingest stage, by data folder
+    args.downloaded = dict(last.get('downloaded', {}))
+    args.ingested = dict(last.get('ingested', {}))
+    state = {'started': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'since': args.since, 'stages': {},
+             'downloaded': args.downloaded, 'ingested': args.ingested}
+
+    done = {name for name, result in previous.items() if result['status'] in ('done', 'resumed')} & stages.keys()
+    for name in done:
+        state['stages'][name] = {'status': 'resumed', 'seconds': 0.0}
+
+    if args.dry_run:
+        for name, stage in stages.items():
+            action = 'skip (done)' if name in done else 'run'
+            print(f"{name:<22} {action:<12} after: {', '.join(stage.after) or '-'}")
+        return state
+
+    db_lock = threading.Lock()
+
+    def run_stage(stage: Stage) -> float:
+        if stage.uses_db:
+            with db_lock:
+                start = time.perf_counter() # time the stage, not the wait for the lock
+                stage.run(args)
+        else:
+            start = time.perf_counter()
+            stage.run(args)
+        return time.perf_counter() - start
+
+    pending = {name: stage for name, stage in stages.items() if name not in done}
+    failed = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        while pending or running:
+            blocked = [n for n, s in pending.items() if set(s.after) & failed]
+            for name in blocked:
+                state['stages'][name] = {'status': 'blocked', 'seconds': 0.0}
+                failed.add(name)
+                del pending[name]
+
+            for name in [n for n, s in pending.items() if set(s.after) <= done]:
+                logger.info(f"STAGE {name} started")
+                running[executor.submit(run_stage, pending.pop(name))] = name
+
+            if not running:
+                if blocked:
+                    continue # stages downstream of the blocked ones are blocked next
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    seconds = future.result()
+                    state['stages'][name] = {'status': 'done', 'seconds': round(seconds, 2)}
+                    done.add(name)
+                    logger.info(f"STAGE {name} finished in {seconds:.1f}s")
+                except Exception as e:
+                    state['stages'][name] = {'status': 'failed', 'seconds': 0.0, 'error': repr(e)}
+                    failed.add(name)
+                    logger.exception(f"STAGE {name} failed")
+
+            save_state(state)
+
+    return state
+
+def report(state: dict):
+    """
+    Logs the status and duration of each stage.
+    """
+    lines = [f"{'stage':<22} {'status':<8} {'seconds':>8}"]
+    for name, result in state['stages'].items():
+        lines.append(f"{name:<22} {result['status']:<8} {result['seconds']:>8.1f}")
+    logger.info("Update report\n" + "\n".join(lines))
+
+def main(argv: list = None) -> int:
+    """
+    Command line entry point.
 
-# download data 
-# download_metadata()
+    Args:
+        argv (list, optional): Arguments. Defaults to ``sys.argv``.
 
-# ingest data
-# create_tables() # create empty DB tables
-# ingest.setup() # ingset all data
+    Returns:
+        int: Exit code, 1 if any stage failed.
+    """
+    parser = argparse.ArgumentParser(description="Download and ingest new OPDI data releases.")
+    parser.add_argument('--init', action='store_true', help="create the data tables first (new database)")
+    parser.add_argument('--since', help="only check releases from this month (YYYYMM)")
+    parser.add_argument('--stream', action='store_true', help="stream flight_list releases into the DB without data files")
+    parser.add_argument('--dry-run', action='store_true', help="print the stages that would run")
+    parser.add_argument('--resume', action='store_true', help="skip stages completed by the last run")
+    parser.add_argument('--profile', action='store_true', default=None, help="write a sampled profile of each ingested file (default PROFILE_INGEST in .env)")
+    parser.add_argument('--rebuild', action='store_true', help="also recount the route matrix, fleet utilization, hourly traffic and data catalog, and rebuild the choropleth geometry")
+    args = parser.parse_args(argv)
 
+    if args.since:
+        datetime.strptime(args.since, '%Y%m') # raises ValueError for a bad month
 
-# update data 
-# download.update() # download new data releases 
-# ingest.update() # ingest new data releases 
+    if args.dry_run:
+        run(args)
+        return 0
 
+    args.manifest = DownloadManifest() # shared by the parallel download stages
 
+    acquire_lock()
+    try:
+        state = run(args)
+    finally:
+        LOCK_PATH.unlink(missing_ok=True)
 
+    report(state)
+    return 1 if any(r['status'] in ('failed', 'blocked') for r in state['stages'].values()) else 0
 
+if __name__ == "__main__":
+    sys.exit(main())
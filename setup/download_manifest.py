@@ -0,0 +1,126 @@
+"""
+setup/download_manifest.py
+
+Local manifest of downloaded OPDI files, used to detect new and republished releases.
+
+For each URL the manifest keeps the ``ETag``, ``Last-Modified`` and ``Content-Length`` headers last
+seen and the SHA-256 of the downloaded content. ``download_files`` compares a ``HEAD`` response with
+the manifest and only downloads files that are new or whose headers changed; the hash confirms
+whether a re-downloaded file actually differs.
+
+Downloaded files are recorded as not ingested (``ingested: false``) until ``ingest_folder`` has committed
+them, so a new or republished file is ingested (replacing the months it holds) even if the run that
+downloaded it stopped before ingesting it.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+
+here = Path(__file__).resolve().parent
+
+MANIFEST_PATH = Path(os.getenv('DOWNLOAD_MANIFEST', here / 'data' / 'download_manifest.json'))
+
+# response headers compared to detect a changed release
+RELEASE_HEADERS = ['etag', 'last-modified', 'content-length']
+
+class DownloadManifest():
+    """
+    Release metadata for downloaded files, keyed by URL.
+
+    Args:
+        path (Path): Manifest json file. Defaults to ``MANIFEST_PATH`` (``DOWNLOAD_MANIFEST`` in .env).
+    """
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self._lock = threading.Lock() # one manifest is shared by parallel download stages
+
+    def get(self, url: str) -> dict:
+        """
+        Manifest entry for a URL, or an empty dict if it has never been downloaded.
+        """
+        return self.entries.get(url, {})
+
+    def is_unchanged(self, url: str, headers: dict) -> bool:
+        """
+        Checks whether the release headers of a ``HEAD`` response match the manifest entry.
+
+        Args:
+            url (str): File URL.
+            headers (dict): Response headers (case-insensitive mapping).
+
+        Returns:
+            bool: True if the URL is in the manifest and no compared header has changed.
+        """
+        entry = self.get(url)
+        if not entry:
+            return False
+
+        compared = [h for h in RELEASE_HEADERS if headers.get(h) is not None]
+        return bool(compared) and all(entry.get(h) == headers.get(h) for h in compared)
+
+    def update(self, url: str, headers: dict, sha256: str = None, file: str = None, ingested: bool = None):
+        """
+        Records the release headers (and content hash and local file, if given) for a URL and saves the manifest.
+
+        Args:
+            url (str): File URL.
+            headers (dict): Response headers.
+            sha256 (str, optional): SHA-256 hex digest of the content. Defaults to the stored hash.
+            file (str, optional): Local file name. Defaults to the stored file name.
+            ingested (bool, optional): Whether the content is in the database. Defaults to the stored state.
+        """
+        with self._lock:
+            entry = self.get(url)
+            entry.update({h: headers.get(h) for h in RELEASE_HEADERS})
+            entry['checked_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+            if sha256:
+                entry['sha256'] = sha256
+            if file:
+                entry['file'] = file
+            if ingested is not None:
+                entry['ingested'] = ingested
+
+            self.entries[url] = entry
+            self.save()
+
+    def pending(self, folder: str = None) -> list:
+        """
+        Local files downloaded since they were last ingested (new or republished releases).
+
+        Args:
+            folder (str, optional): Only files in this folder. Defaults to every folder.
+
+        Returns:
+            list: File names.
+        """
+        files = [e['file'] for e in self.entries.values() if e.get('ingested') is False and e.get('file')]
+        return [f for f in files if folder is None or (Path(folder) / f).exists()]
+
+    def mark_ingested(self, file: str):
+        """
+        Records that a downloaded file has been ingested and saves the manifest.
+
+        Args:
+            file (str): Local file name.
+        """
+        with self._lock:
+            for entry in self.entries.values():
+                if entry.get('file') == file:
+                    entry['ingested'] = True
+            self.save()
+
+    def save(self):
+        """
+        Writes the manifest, replacing the previous file only once the new one is complete.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,241 @@
+"""
+setup/download_pipeline.py
+
+Streaming download mode: new ``flight_list`` releases go from HTTP straight into PostgreSQL without
+landing csv or parquet files in ``setup/data``.
+
+Three stages run at the same time, connected by bounded queues:
+    1. download: streams each new release into a spooled buffer (memory up to ``SPOOL_MAX_MB``, then a temporary file).
+    2. decode: reads the buffered parquet one record batch at a time with the ingestion profile's projection and filter.
+    3. load: inserts each batch and updates the summary tables, committing once per release.
+
+A full queue blocks the stage writing to it, so a slow database holds back decoding and
+downloading rather than buffering whole months in memory. While one month loads the next is
+already downloading, so the run takes about as long as its slowest stage.
+
+Parquet keeps its metadata at the end of the file, so each file is spooled whole before decoding;
+batches from one file are loaded while the next file downloads.
+
+Each release is loaded in one transaction, committed after its last batch and before it is recorded in
+the manifest. Its months are deleted first (``delete_months``), so a release that is loaded again after a
+failed or interrupted run replaces its rows instead of duplicating them.
+
+Usage: python -m setup.download_pipeline
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import time
+import queue
+import hashlib
+import threading
+import tempfile
+import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import date, datetime
+from loguru import logger
+from setup.data_download import generate_urls
+from setup.download_manifest import DownloadManifest
+from setup.data_ingestion import INGEST_PROFILE, FLIGHT_LIST_TABLE, prepare_dataframe, insert_rows, update_summaries, delete_months
+from setup.catalog import row_months
+from setup.fleet_utilization import FleetUtilization
+from src.db import session
+from setup.stream_ingestion import STREAM_BATCH_SIZE
+
+# size a release can reach in memory before the spool moves to a temporary file (SPOOL_MAX_MB in .env)
+SPOOL_MAX_MB = int(os.getenv('SPOOL_MAX_MB', 256))
+
+# items each queue holds before the stage writing to it blocks (PIPELINE_QUEUE_SIZE in .env)
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+
+_DONE = object() # end of stream marker
+
+class StageError():
+    """
+    Passed downstream when a stage fails, so the load stage can raise it.
+    """
+    def __init__(self, stage: str, error: Exception):
+        self.stage = stage
+        self.error = error
+
+def download_stage(urls: list, manifest: DownloadManifest, out_queue: queue.Queue, timings: dict):
+    """
+    Downloads releases that aren't in the manifest yet into spooled buffers.
+
+    Args:
+        urls (list): Release URLs.
+        manifest (DownloadManifest): Release manifest. Only URLs without an entry are downloaded.
+        out_queue (queue.Queue): Receives ``(url, headers, sha256, spool)`` per release, then ``_DONE``.
+        timings (dict): Seconds spent downloading are added to ``timings['download']``.
+    """
+    try:
+        for url in urls:
+            if manifest.get(url): # already downloaded or streamed, republished files go through download_files
+                continue
+
+            start = time.perf_counter()
+            with requests.get(url, stream=True) as response:
+                if response.status_code == 404:
+                    logger.info(f"NOT RELEASED: {url.split('/')[-1]}")
+                    continue
+                response.raise_for_status()
+
+                spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MB * 1024 * 1024)
+                digest = hashlib.sha256()
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    spool.write(chunk)
+                    digest.update(chunk)
+
+            spool.seek(0)
+            timings['download'] += time.perf_counter() - start
+            logger.info(f"DOWNLOADED: {url}")
+
+            out_queue.put((url, response.headers, digest.hexdigest(), spool)) # blocks while the queue is full
+    except Exception as e:
+        out_queue.put(StageError('download', e))
+    finally:
+        out_queue.put(_DONE)
+
+def decode_stage(in_queue: queue.Queue, out_queue: queue.Queue, timings: dict):
+    """
+    Decodes spooled parquet releases into prepared dataframes, one record batch at a time.
+
+    Args:
+        in_queue (queue.Queue): Output of ``download_stage``.
+        out_queue (queue.Queue): Receives ``('batch', df)`` per record batch and ``('file', url, headers, sha256)``
+            after the last batch of each release, then ``_DONE``.
+        timings (dict): Seconds spent decoding are added to ``timings['decode']``.
+    """
+    filters = INGEST_PROFILE['filters']
+    expression = pq.filters_to_expression(filters) if filters else None
+    item = None
+
+    try:
+        while (item := in_queue.get()) is not _DONE:
+            if isinstance(item, StageError):
+                out_queue.put(item)
+                continue
+
+            url, headers, sha256, spool = item
+            start = time.perf_counter()
+            parquet = pq.ParquetFile(spool)
+
+            for batch in parquet.iter_batches(batch_size=STREAM_BATCH_SIZE, columns=INGEST_PROFILE['columns']):
+                arrow_table = pa.Table.from_batches([batch])
+                if expression is not None:
+                    arrow_table = arrow_table.filter(expression)
+                if arrow_table.num_rows == 0:
+                    continue
+
+                df = prepare_dataframe(arrow_table.to_pandas(), FLIGHT_LIST_TABLE)
+                timings['decode'] += time.perf_counter() - start
+
+                out_queue.put(('batch', df)) # blocks while the loader is behind
+                start = time.perf_counter()
+
+            spool.close()
+            timings['decode'] += time.perf_counter() - start
+            out_queue.put(('file', url, headers, sha256))
+    except Exception as e:
+        out_queue.put(StageError('decode', e))
+    finally:
+        # drain the download stage so it isn't left blocked on a full queue
+        while item is not _DONE:
+            item = in_queue.get()
+        out_queue.put(_DONE)
+
+def run_pipeline(urls: list, manifest: DownloadManifest = None) -> list:
+    """
+    Downloads, decodes and loads new ``flight_list`` releases concurrently.
+
+    Args:
+        urls (list): Release URLs (``generate_urls('flight_list', ...)``).
+        manifest (DownloadManifest, optional): Release manifest. Defaults to ``setup/data/download_manifest.json``.
+
+    Returns:
+        list: Names of the releases loaded.
+
+    Raises:
+        Exception: The first error raised by any stage. Releases committed before the error stay in the
+            manifest, and the release being loaded is rolled back.
+    """
+    manifest = manifest or DownloadManifest()
+    downloaded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    decoded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    timings = {'download': 0.0, 'decode': 0.0, 'load': 0.0}
+
+    threads = [
+        threading.Thread(target=download_stage, args=(urls, manifest, downloaded, timings), daemon=True),
+        threading.Thread(target=decode_stage, args=(downloaded, decoded, timings), daemon=True)
+    ]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    loaded = []
+    error = None
+    replaced, fleet = set(), None # months deleted and fleet utilization (last flight of each aircraft) of the release being loaded
+
+    while (item := decoded.get()) is not _DONE:
+        if isinstance(item, StageError):
+            error = error or item
+            session.rollback() # the release being loaded isn't complete
+            continue
+        if error: # drain remaining items after a failure
+            continue
+
+        load_start = time.perf_counter()
+        try:
+            conn = session.connection() # the release's transaction, begun by its first batch
+            if item[0] == 'batch':
+                df = item[1]
+                months = set(row_months(df, 'flight_list')) - replaced
+                delete_months(months, FLIGHT_LIST_TABLE, conn) # rows of an earlier, interrupted load of the release
+                replaced |= months
+
+                insert_rows(df, FLIGHT_LIST_TABLE)
+                update_summaries(df, FLIGHT_LIST_TABLE, fleet=False, conn=conn)
+                fleet = fleet or FleetUtilization(conn)
+                fleet.add(df)
+            else:
+                _, url, headers, sha256 = item
+                session.commit()
+                replaced, fleet = set(), None
+
+                manifest.update(url, headers, sha256, file='streamed', ingested=True)
+                loaded.append(url.split('/')[-1])
+                logger.info(f"LOADED: {url}")
+        except Exception as e:
+            session.rollback()
+            error = StageError('load', e) # keep draining so the other stages can finish
+        timings['load'] += time.perf_counter() - load_start
+
+    for thread in threads:
+        thread.join()
+
+    total = time.perf_counter() - start
+    logger.info(
+        f"Pipeline finished in {total:.1f}s "
+        f"(download {timings['download']:.1f}s, decode {timings['decode']:.1f}s, load {timings['load']:.1f}s)"
+    )
+
+    if error:
+        raise RuntimeError(f"{error.stage} stage failed") from error.error
+
+    return loaded
+
+def update() -> list:
+    """
+    Streams all new ``flight_list`` releases into the database.
+
+    Returns:
+        list: Names of the releases loaded.
+    """
+    urls = generate_urls("flight_list", "202201", datetime.strftime(date.today(), "%Y%m"))
+    return run_pipeline(urls)
+
+if __name__ == "__main__":
+    update()
@@ -0,0 +1,159 @@
+"""
+setup/enrichment.py
+
+Calculates per-flight metrics for ``flight_list`` files at ingestion:
+    - ``distance_km``: great-circle distance between ``adep`` and ``ades`` using ``icao_list`` coordinates.
+    - ``block_time_s``: seconds between ``first_seen`` and ``last_seen``.
+
+Also maintains ``distance_band_summary`` so short/medium/long-haul statistics come from a small rollup.
+``backfill_flight_metrics`` adds the metrics to a database ingested before they existed.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import numpy as np
+import pandas as pd
+from functools import cache
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, sql_folder, DistanceBandSummary, ENCODED_FLIGHT_LIST
+from setup.rollups import upsert_rollup
+
+EARTH_RADIUS_KM = 6371.0088
+
+# upper bound (km) of each distance band, EUROCONTROL short/medium/long-haul definitions
+DISTANCE_BANDS = {'short': 1500, 'medium': 4000, 'long': np.inf}
+
+class AirportCoordinates():
+    """
+    Latitude and longitude (radians) of every ``icao_list`` airport held in NumPy arrays.
+
+    The last element of each array is NaN so airport codes not in ``icao_list`` (index -1)
+    get NaN coordinates without a separate mask.
+    """
+
+    def __init__(self):
+        query = text("""
+            SELECT DISTINCT ON (icao) icao, latitude, longitude
+            FROM icao_list
+            WHERE icao IS NOT NULL
+            ORDER BY icao;
+        """)
+        df = pd.read_sql(query, engine)
+
+        self.index = pd.Index(df['icao'])
+        self.lat = np.radians(np.append(df['latitude'].to_numpy(dtype=float), np.nan))
+        self.lon = np.radians(np.append(df['longitude'].to_numpy(dtype=float), np.nan))
+
+        logger.info(f"Loaded coordinates for {len(self.index)} airports")
+
+    def lookup(self, codes: pd.Series) -> tuple:
+        """
+        Gets the coordinates of each airport code.
+
+        Args:
+            codes (pd.Series): ICAO airport codes.
+
+        Returns:
+            tuple: Latitude and longitude arrays in radians (NaN for unknown airports).
+        """
+        idx = self.index.get_indexer(codes)
+        return self.lat[idx], self.lon[idx]
+
+@cache
+def get_airport_coordinates() -> AirportCoordinates:
+    """
+    Returns the airport coordinates, loading them from ``icao_list`` on first use.
+    """
+    return AirportCoordinates()
+
+def great_circle_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distance between two arrays of points using the haversine formula.
+
+    Args:
+        lat1, lon1 (np.ndarray): Latitude and longitude of the first points in radians.
+        lat2, lon2 (np.ndarray): Latitude and longitude of the second points in radians.
+
+    Returns:
+        np.ndarray: Distance in km.
+    """
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def add_flight_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds ``distance_km`` and ``block_time_s`` columns to a ``flight_list`` dataframe.
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file.
+
+    Returns:
+        pd.DataFrame: Dataframe with the metric columns added.
+    """
+    coordinates = get_airport_coordinates()
+
+    dep_lat, dep_lon = coordinates.lookup(df['adep'])
+    des_lat, des_lon = coordinates.lookup(df['ades'])
+    df['distance_km'] = great_circle_km(dep_lat, dep_lon, des_lat, des_lon)
+
+    block_time = (pd.to_datetime(df['last_seen']) - pd.to_datetime(df['first_seen'])).dt.total_seconds()
+    df['block_time_s'] = block_time.round().astype('Int64') # nullable, rows become python ints or None for the Integer column
+
+    return df
+
+def distance_bands(distance_km) -> np.ndarray:
+    """
+    Distance band of each flight: ``short``, ``medium``, ``long`` or ``unknown`` (no distance).
+
+    Args:
+        distance_km (array-like): Great-circle distances in km.
+
+    Returns:
+        np.ndarray: Band names.
+    """
+    distance = np.asarray(distance_km, dtype=float)
+    band_index = np.searchsorted(list(DISTANCE_BANDS.values()), distance) # NaN sorts past the last band
+    return np.append(list(DISTANCE_BANDS.keys()), 'unknown')[band_index]
+
+def update_distance_bands(df: pd.DataFrame, conn=None):
+    """
+    Adds the distance band counts and totals of one ingested ``flight_list`` file to ``distance_band_summary``.
+
+    Args:
+        df (pd.DataFrame): Dataframe of the ingested file with ``distance_km`` and ``block_time_s`` columns.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    distance = df['distance_km'].to_numpy(dtype=float)
+
+    summary = pd.DataFrame({
+        'month': pd.to_datetime(df['dof']).dt.to_period('M').dt.to_timestamp().dt.date,
+        'band': distance_bands(distance),
+        'distance_km': np.nan_to_num(distance),
+        'block_time_s': pd.to_numeric(df['block_time_s']).fillna(0).astype('int64')
+    })
+    summary = summary.groupby(['month', 'band']).agg(
+        count=('band', 'size'),
+        distance_km=('distance_km', 'sum'),
+        block_time_s=('block_time_s', 'sum')
+    ).reset_index()
+
+    upsert_rollup(summary, DistanceBandSummary, ['month', 'band'], conn=conn)
+    logger.info(f"Updated {len(summary)} distance band counts")
+
+def backfill_flight_metrics(encoded: bool = ENCODED_FLIGHT_LIST):
+    """
+    Adds ``distance_km`` and ``block_time_s`` to a database ingested before they were calculated
+    (``sql/update_flight_metrics.sql``) and recounts ``distance_band_summary``, in one transaction.
+
+    Args:
+        encoded (bool): If True, also recreates the ``flight_list`` view (``sql/create_flight_list_view.sql``)
+            so it shows the columns added to ``flight_list_encoded``. Defaults to ``FLIGHT_LIST_ENCODED`` in .env.
+    """
+    with engine.begin() as conn:
+        conn.execute(text((sql_folder / 'update_flight_metrics.sql').read_text()))
+        if encoded:
+            conn.execute(text((sql_folder / 'create_flight_list_view.sql').read_text()))
+
+    logger.info("Backfilled distance_km and block_time_s and rebuilt distance_band_summary")
@@ -0,0 +1,220 @@
+"""
+setup/europe_geometry.py
+
+Builds ``assets/europe.geojson``, the country outlines used by the emissions choropleth.
+
+The Natural Earth 1:50m admin 0 countries are pruned to Europe:
+    - Countries outside ``EUROPE_BBOX`` are dropped.
+    - Polygons of the remaining countries are clipped to the box, so overseas territories and
+      the Asian parts of Russia and Kazakhstan are removed.
+    - Outlines are simplified (Douglas-Peucker, ``SIMPLIFY_TOLERANCE`` degrees) and rounded
+      to 3 decimal places (about 100 m).
+
+Each feature's ``id`` is its ISO alpha-3 code, matching ``icao_iso.iso_alpha3``. Countries that
+aren't in ``icao_iso`` are kept as grey background.
+
+The app serves the file from ``assets/`` with a version in the URL, so browsers download it once
+and cache it instead of receiving the geometry in every figure. The update orchestrator
+(``setup/data_update.py``) builds it if it's missing.
+
+Usage: python -m setup.europe_geometry
+
+created: 19/10/26
+"""
+
+import os
+import json
+import requests
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+
+here = Path(__file__).resolve().parent
+
+GEOJSON_PATH = here.parent / 'assets' / 'europe.geojson'
+
+NATURAL_EARTH_URL = os.getenv(
+    'NATURAL_EARTH_URL',
+    'https://raw.githubusercontent.com/nvkelso/natural-earth-vector/master/geojson/ne_50m_admin_0_countries.geojson'
+)
+
+# west, south, east, north
+EUROPE_BBOX = (-25.0, 27.0, 50.0, 72.0)
+
+# Douglas-Peucker tolerance in degrees (0.02 is about 2 km)
+SIMPLIFY_TOLERANCE = 0.02
+
+def country_code(properties: dict) -> str:
+    """
+    ISO alpha-3 code of a Natural Earth feature. ``ISO_A3`` is '-99' for some countries (e.g. France,
+    Norway in older releases), where ``ADM0_A3`` has the code.
+    """
+    code = properties.get('ISO_A3') or '-99'
+    return properties.get('ADM0_A3') if code == '-99' else code
+
+def clip_ring(ring: np.ndarray, bbox: tuple = EUROPE_BBOX) -> np.ndarray:
+    """
+    Clips a polygon ring to a bounding box (Sutherland-Hodgman, one box edge at a time).
+
+    Args:
+        ring (np.ndarray): (n, 2) lon, lat points.
+        bbox (tuple): West, south, east, north. Defaults to ``EUROPE_BBOX``.
+
+    Returns:
+        np.ndarray: Clipped ring, closed, or an empty array if the ring is outside the box.
+    """
+    west, south, east, north = bbox
+    # (axis, limit, keep points with value >= limit if True, else <= limit)
+    edges = [(0, west, True), (0, east, False), (1, south, True), (1, north, False)]
+
+    points = ring[:-1] if len(ring) > 1 and np.array_equal(ring[0], ring[-1]) else ring
+    for axis, limit, keep_above in edges:
+        if len(points) == 0:
+            break
+        inside = points[:, axis] >= limit if keep_above else points[:, axis] <= limit
+        previous = np.roll(points, 1, axis=0)
+        previous_inside = np.roll(inside, 1)
+
+        clipped = []
+        for point, prev, point_in, prev_in in zip(points, previous, inside, previous_inside):
+            if point_in != prev_in: # edge crosses the limit: add the crossing point
+                t = (limit - prev[axis]) / (point[axis] - prev[axis])
+                clipped.append(prev + t * (point - prev))
+            if point_in:
+                clipped.append(point)
+        points = np.array(clipped).reshape(-1, 2)
+
+    if len(points) < 3:
+        return np.empty((0, 2))
+    return np.vstack([points, points[:1]])
+
+def simplify_ring(ring: np.ndarray, tolerance: float = SIMPLIFY_TOLERANCE) -> np.ndarray:
+    """
+    Simplifies a closed ring with the Douglas-Peucker algorithm.
+
+    Args:
+        ring (np.ndarray): (n, 2) closed ring.
+        tolerance (float): Largest distance (degrees) of a removed point from the simplified outline.
+
+    Returns:
+        np.ndarray: Simplified ring, closed.
+    """
+    if len(ring) <= 4:
+        return ring
+
+    # split the ring at its farthest point from the start so neither half is degenerate
+    split = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[[0, split, len(ring) - 1]] = True
+
+    stack = [(0, split), (split, len(ring) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = ring[end] - ring[start]
+        offsets = ring[start + 1:end] - ring[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(*offsets.T)
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack += [(start, middle), (middle, end)]
+
+    return ring[keep]
+
+def prune_polygon(polygon: list) -> list:
+    """
+    Clips, simplifies and rounds one polygon (outer ring and holes).
+
+    Returns:
+        list: GeoJSON polygon coordinates, or an empty list if the polygon is outside the box or too small.
+    """
+    rings = []
+    for i, ring in enumerate(polygon):
+        ring = np.round(simplify_ring(clip_ring(np.asarray(ring, dtype=float))), 3)
+        if len(ring):
+            ring = ring[np.r_[True, np.any(ring[1:] != ring[:-1], axis=1)]] # consecutive duplicates after rounding
+
+        if len(ring) < 4:
+            if i == 0:
+                return [] # outer ring gone: drop the polygon with its holes
+            continue
+        rings.append(ring.tolist())
+    return rings
+
+def build_europe_geometry(source: dict, countries: set) -> dict:
+    """
+    Prunes Natural Earth countries to a Europe-only feature collection.
+
+    Args:
+        source (dict): Natural Earth admin 0 countries GeoJSON.
+        countries (set): ISO alpha-3 codes with data. Other countries in the box get ``background`` set to true.
+
+    Returns:
+        dict: GeoJSON feature collection with ISO alpha-3 feature ids.
+    """
+    features = []
+    for feature in source['features']:
+        geometry = feature['geometry']
+        if geometry is None:
+            continue
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        polygons = [p for p in (prune_polygon(polygon) for polygon in polygons) if p]
+        if not polygons:
+            continue
+
+        code = country_code(feature['properties'])
+        features.append({
+            'type': 'Feature',
+            'id': code,
+            'properties': {'name': feature['properties'].get('NAME'), 'background': code not in countries},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': polygons}
+        })
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def get_countries() -> set:
+    """
+    ISO alpha-3 codes of the countries in the emissions data (``icao_iso``).
+    """
+    query = text("""
+        SELECT DISTINCT iso_alpha3
+        FROM icao_iso
+        WHERE iso_alpha3 IS NOT NULL;
+    """)
+    return set(pd.read_sql(query, engine)['iso_alpha3'])
+
+def write_europe_geometry(path: Path = GEOJSON_PATH, url: str = NATURAL_EARTH_URL) -> Path:
+    """
+    Downloads the Natural Earth countries and writes the pruned Europe geometry.
+
+    Args:
+        path (Path): Output file. Defaults to ``assets/europe.geojson``.
+        url (str): Natural Earth admin 0 countries GeoJSON. Defaults to ``NATURAL_EARTH_URL``.
+
+    Returns:
+        Path: Output file.
+    """
+    response = requests.get(url, timeout=120)
+    response.raise_for_status()
+
+    geometry = build_europe_geometry(response.json(), get_countries())
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(geometry, separators=(',', ':')))
+    tmp_path.replace(path)
+
+    logger.info(f"Wrote {len(geometry['features'])} countries to {path} ({path.stat().st_size / 1024:.0f} KB, source {len(response.content) / 1024:.0f} KB)")
+    return path
+
+if __name__ == "__main__":
+    write_europe_geometry()
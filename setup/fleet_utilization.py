@@ -0,0 +1,157 @@
+"""
+setup/fleet_utilization.py
+
+Maintains ``fleet_utilization_summary``, the daily utilization of each aircraft for each operator:
+cycles (flights), block time and ground turnaround time.
+
+Files are ingested in batches (``FleetUtilization``). Each batch is sorted once by (``icao24``, ``first_seen``),
+so each aircraft's flights are consecutive and in order. Block time is ``last_seen - first_seen``. The
+turnaround before a flight is the gap since the previous flight of the same aircraft, if it is under
+``TURNAROUND_MAX_HOURS`` (longer gaps are parking, e.g. overnight, not turnarounds). Only the ``last_seen``
+of each aircraft's latest flight is carried to the next batch, for the turnaround before its first flight
+there, so memory is bounded by the number of aircraft rather than the size of the file. The daily totals of
+each batch are added to the summary table.
+
+Files are monthly, so the first flight of each aircraft in a file has no turnaround. A flight in a later
+batch that started before the carried flight ended (rows not in time order) gets no turnaround. ``rebuild_fleet_utilization``
+recounts everything from ``flight_list`` with window functions, turnarounds across months included.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, FleetUtilizationSummary
+from setup.key_cache import get_key_cache
+from setup.rollups import upsert_rollup
+
+here = Path(__file__).resolve().parent
+
+# longest ground time between two flights counted as a turnaround (TURNAROUND_MAX_HOURS in .env)
+TURNAROUND_MAX_S = int(float(os.getenv('TURNAROUND_MAX_HOURS', 12)) * 3600)
+
+def to_epoch_s(values: pd.Series) -> np.ndarray:
+    """
+    Timestamps (strings or datetimes, any timezone) as UTC epoch seconds.
+    """
+    return pd.to_datetime(values, utc=True).dt.tz_convert(None).to_numpy().astype('datetime64[s]').astype(np.int64)
+
+def utilization_by_day(df: pd.DataFrame, max_turnaround_s: int = TURNAROUND_MAX_S, previous: pd.Series = None) -> tuple:
+    """
+    Daily cycles, block time and turnarounds per aircraft and operator.
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file or batch, with ``icao_operator`` or ``operator_key``.
+        max_turnaround_s (int): Longest ground time counted as a turnaround. Defaults to ``TURNAROUND_MAX_S``.
+        previous (pd.Series, optional): ``last_seen`` (epoch seconds) of each aircraft's latest flight in earlier
+            batches, indexed by ``icao24``. Defaults to none (no turnaround before each aircraft's first flight).
+
+    Returns:
+        tuple: Dataframe with columns ``dof``, ``icao24``, ``operator_key``, ``cycles``, ``block_time_s``, ``turnarounds``,
+            ``turnaround_s``, and ``previous`` updated with the flights of ``df``.
+    """
+    # flight_list_encoded files are already encoded
+    operator_key = df['operator_key'] if 'operator_key' in df else get_key_cache('operator').encode(df, ['icao_operator'])
+
+    flights = pd.DataFrame({
+        'dof': pd.to_datetime(df['dof']).dt.date,
+        'icao24': df['icao24'],
+        'operator_key': operator_key,
+        'first_seen': df['first_seen'],
+        'last_seen': df['last_seen']
+    }).dropna(subset=['icao24', 'first_seen', 'last_seen'])
+
+    # one sort: each aircraft's flights are consecutive and in time order
+    flights = flights.sort_values(['icao24', 'first_seen'], kind='stable', ignore_index=True)
+
+    first_seen = to_epoch_s(flights['first_seen'])
+    last_seen = to_epoch_s(flights['last_seen'])
+    icao24 = flights['icao24'].to_numpy()
+
+    ground_s = np.full(len(flights), -1, dtype=np.int64)
+    same_aircraft = icao24[1:] == icao24[:-1]
+    ground_s[1:] = np.where(same_aircraft, first_seen[1:] - last_seen[:-1], -1)
+
+    first = np.r_[True, ~same_aircraft][:len(flights)] # first and last flight of each aircraft in the batch
+    last = np.r_[~same_aircraft, True][:len(flights)]
+    if previous is not None and len(previous):
+        before = pd.Series(icao24[first]).map(previous).to_numpy(dtype='float64', na_value=np.nan)
+        ground_s[first] = np.where(np.isnan(before), -1, first_seen[first] - np.nan_to_num(before)).astype(np.int64)
+    turnaround = (ground_s >= 0) & (ground_s <= max_turnaround_s)
+
+    latest = pd.Series(last_seen[last], index=icao24[last])
+    previous = latest if previous is None else pd.concat([previous, latest]).groupby(level=0).max()
+
+    flights['block_time_s'] = np.clip(last_seen - first_seen, 0, None)
+    flights['turnarounds'] = turnaround.astype(np.int64)
+    flights['turnaround_s'] = np.where(turnaround, ground_s, 0)
+
+    flights = flights.dropna(subset=['operator_key']) # operator is part of the key
+    flights['operator_key'] = flights['operator_key'].astype('int64')
+
+    summary = flights.groupby(['dof', 'icao24', 'operator_key']).agg(
+        cycles=('icao24', 'size'),
+        block_time_s=('block_time_s', 'sum'),
+        turnarounds=('turnarounds', 'sum'),
+        turnaround_s=('turnaround_s', 'sum')
+    ).reset_index()
+    return summary, previous
+
+class FleetUtilization():
+    """
+    Adds the daily aircraft utilization of one ``flight_list`` file to ``fleet_utilization_summary`` one batch
+    at a time, carrying the ``last_seen`` of each aircraft's latest flight between batches.
+
+    Args:
+        conn (Connection, optional): Connection of an open transaction, so the updates commit with the ingested rows. Defaults to a new transaction per batch.
+        max_turnaround_s (int): Longest ground time counted as a turnaround. Defaults to ``TURNAROUND_MAX_S``.
+    """
+    def __init__(self, conn=None, max_turnaround_s: int = TURNAROUND_MAX_S):
+        self.conn = conn
+        self.max_turnaround_s = max_turnaround_s
+        self.previous = None # icao24: last_seen (epoch seconds)
+
+    def add(self, df: pd.DataFrame) -> int:
+        """
+        Adds the utilization of a batch.
+
+        Args:
+            df (pd.DataFrame): Batch of the ingested file.
+
+        Returns:
+            int: Aircraft utilization days updated.
+        """
+        summary, self.previous = utilization_by_day(df, self.max_turnaround_s, self.previous)
+        upsert_rollup(summary, FleetUtilizationSummary, ['dof', 'icao24', 'operator_key'], conn=self.conn)
+        return len(summary)
+
+def update_fleet_utilization(df: pd.DataFrame, conn=None):
+    """
+    Adds the daily aircraft utilization of one ingested ``flight_list`` file (or batch, without turnarounds
+    across batches) to ``fleet_utilization_summary``.
+
+    Args:
+        df (pd.DataFrame): Dataframe of the ingested file.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    days = FleetUtilization(conn).add(df)
+    logger.info(f"Updated {days} aircraft utilization days")
+
+def rebuild_fleet_utilization(max_turnaround_s: int = TURNAROUND_MAX_S):
+    """
+    Recounts ``fleet_utilization_summary`` from ``flight_list`` (``sql/update_fleet_utilization_summary.sql``).
+
+    Args:
+        max_turnaround_s (int): Longest ground time counted as a turnaround. Defaults to ``TURNAROUND_MAX_S``.
+    """
+    query = (here.parent / 'sql' / 'update_fleet_utilization_summary.sql').read_text()
+
+    with engine.begin() as conn:
+        conn.execute(text(query), {'max_turnaround_s': max_turnaround_s})
+
+    logger.info("Rebuilt fleet_utilization_summary")
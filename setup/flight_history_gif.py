@@ -0,0 +1,96 @@
+"""
+setup/flight_history_gif.py
+
+Regenerates ``assets/flight-history.gif`` from the trajectory store.
+
+Each frame draws the positions recorded in a trailing time window over Europe. Positions are
+ordered by time once, so each frame is a binary search and a slice rather than a scan of every point.
+
+Usage: python -m setup.flight_history_gif <partition> [frame_minutes] [trail_minutes]
+
+created: 19/10/26
+"""
+
+import sys
+import numpy as np
+from pathlib import Path
+from datetime import datetime, timezone
+from PIL import Image, ImageDraw
+from loguru import logger
+from src.trajectories import TrajectoryStore, TRAJECTORY_FOLDER, open_partition
+
+here = Path(__file__).resolve().parent
+
+# map extent (equirectangular) and image size
+LON_RANGE = (-25.0, 45.0)
+LAT_RANGE = (34.0, 72.0)
+WIDTH, HEIGHT = 800, 600
+
+BACKGROUND = (18, 67, 109)
+POINT_COLOUR = (255, 255, 255)
+TEXT_COLOUR = (250, 250, 250)
+
+def to_pixels(lat: np.ndarray, lon: np.ndarray) -> tuple:
+    """
+    Projects latitude and longitude (degrees) to image pixel coordinates.
+    """
+    x = (lon - LON_RANGE[0]) / (LON_RANGE[1] - LON_RANGE[0]) * WIDTH
+    y = (LAT_RANGE[1] - lat) / (LAT_RANGE[1] - LAT_RANGE[0]) * HEIGHT
+    return x, y
+
+def render_frames(partition: Path, frame_minutes: int = 30, trail_minutes: int = 60) -> list:
+    """
+    Renders one image per time step of a trajectory store partition.
+
+    Args:
+        partition (Path): Partition folder.
+        frame_minutes (int): Time between frames. Defaults to 30.
+        trail_minutes (int): Positions recorded within this many minutes before the frame time are drawn. Defaults to 60.
+
+    Returns:
+        list: PIL images.
+    """
+    arrays = open_partition(partition).arrays
+
+    order = np.argsort(arrays['time'], kind='stable')
+    times = np.asarray(arrays['time'])[order]
+    x, y = to_pixels(np.asarray(arrays['lat'])[order], np.asarray(arrays['lon'])[order])
+
+    frames = []
+    for frame_time in range(int(times[0]), int(times[-1]) + 1, frame_minutes * 60):
+        start, end = np.searchsorted(times, [frame_time - trail_minutes * 60, frame_time], side='right')
+
+        image = Image.new('RGB', (WIDTH, HEIGHT), BACKGROUND)
+        draw = ImageDraw.Draw(image)
+        for px, py in zip(x[start:end], y[start:end]):
+            draw.point((px, py), fill=POINT_COLOUR)
+
+        label = datetime.fromtimestamp(frame_time, tz=timezone.utc).strftime('%d %b %Y %H:%M UTC')
+        draw.text((10, 10), label, fill=TEXT_COLOUR)
+        frames.append(image)
+
+    return frames
+
+def write_gif(partition: Path, frame_minutes: int = 30, trail_minutes: int = 60, save_path: Path = here.parent / 'assets' / 'flight-history.gif'):
+    """
+    Writes the animation of a trajectory store partition as a GIF.
+
+    Args:
+        partition (Path): Partition folder.
+        frame_minutes (int): Time between frames. Defaults to 30.
+        trail_minutes (int): Length of the trail drawn for each frame. Defaults to 60.
+        save_path (Path): Output file. Defaults to ``assets/flight-history.gif``.
+    """
+    frames = render_frames(partition, frame_minutes, trail_minutes)
+    frames[0].save(save_path, save_all=True, append_images=frames[1:], duration=100, loop=0)
+    logger.info(f"SAVED {len(frames)} frames TO {save_path}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        partition = TRAJECTORY_FOLDER / sys.argv[1]
+    else:
+        partition = TrajectoryStore().partitions()[-1].path # latest partition
+
+    frame_minutes = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    trail_minutes = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+    write_gif(partition, frame_minutes, trail_minutes)
@@ -0,0 +1,121 @@
+"""
+setup/hourly_traffic.py
+
+Maintains the hourly traffic rollups behind the hour of day x weekday heatmaps:
+    - ``hourly_traffic_summary``: flights departing in each hour of each day, per distance band.
+    - ``airport_hourly_traffic_summary``: departures and arrivals at each airport in each hour of each day
+      (if ``HOURLY_TRAFFIC_BY_AIRPORT`` is enabled).
+
+Hours are UTC, from ``first_seen`` for departures and ``last_seen`` for arrivals. Counts are
+aggregated in memory for each ingested ``flight_list`` file and added to the existing counts, so the
+heatmaps never group ``flight_list``. ``rebuild_hourly_traffic`` recounts everything from ``flight_list``.
+
+Rollup days are the dates of the movements, so late flights of a month count on the first day of the next
+month. When a month is replaced, its flights are subtracted (``subtract_hourly_traffic``) rather than
+its days deleted.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, HourlyTrafficSummary, AirportHourlyTrafficSummary, HOURLY_TRAFFIC_BY_AIRPORT
+from setup.key_cache import get_key_cache
+from setup.rollups import upsert_rollup
+from setup.enrichment import distance_bands
+from setup.archive import month_end
+
+here = Path(__file__).resolve().parent
+
+def count_hourly_traffic(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Counts flights departing in each hour of each day, per distance band.
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file with ``first_seen`` and ``distance_km`` columns.
+
+    Returns:
+        pd.DataFrame: Columns ``dof``, ``hour``, ``band``, ``count``.
+    """
+    first_seen = pd.to_datetime(df['first_seen'], utc=True)
+
+    traffic = pd.DataFrame({
+        'dof': first_seen.dt.date,
+        'hour': first_seen.dt.hour,
+        'band': distance_bands(df['distance_km'])
+    }).dropna()
+    traffic['hour'] = traffic['hour'].astype('int64') # float while NaT hours were present
+
+    return traffic.groupby(['dof', 'hour', 'band']).size().reset_index(name='count')
+
+def count_airport_hourly_traffic(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Counts departures and arrivals at each airport in each hour of each day.
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file, with airport codes or ``adep_key``/``ades_key`` columns.
+
+    Returns:
+        pd.DataFrame: Columns ``dof``, ``hour``, ``airport_key``, ``movement``, ``count``.
+    """
+    movements = []
+
+    # flight_list_encoded files are already encoded
+    for movement, airport, time_column in [('departure', 'adep', 'first_seen'), ('arrival', 'ades', 'last_seen')]:
+        times = pd.to_datetime(df[time_column], utc=True)
+        movements.append(pd.DataFrame({
+            'dof': times.dt.date,
+            'hour': times.dt.hour,
+            'airport_key': df[f'{airport}_key'] if f'{airport}_key' in df else get_key_cache('airport').encode(df, [airport]),
+            'movement': movement
+        }))
+
+    traffic = pd.concat(movements, ignore_index=True).dropna() # flights without an actual airport or time aren't counted
+    traffic[['hour', 'airport_key']] = traffic[['hour', 'airport_key']].astype('int64')
+
+    return traffic.groupby(['dof', 'hour', 'airport_key', 'movement']).size().reset_index(name='count')
+
+def update_hourly_traffic(df: pd.DataFrame, by_airport: bool = HOURLY_TRAFFIC_BY_AIRPORT, conn=None):
+    """
+    Adds the hourly traffic of one ingested ``flight_list`` file to the hourly rollups.
+
+    Args:
+        df (pd.DataFrame): Dataframe of the ingested file.
+        by_airport (bool): If True, also updates ``airport_hourly_traffic_summary``. Defaults to ``HOURLY_TRAFFIC_BY_AIRPORT`` in .env.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    traffic = count_hourly_traffic(df)
+    upsert_rollup(traffic, HourlyTrafficSummary, ['dof', 'hour', 'band'], conn=conn)
+    logger.info(f"Updated {len(traffic)} hourly traffic counts")
+
+    if by_airport:
+        airport_traffic = count_airport_hourly_traffic(df)
+        upsert_rollup(airport_traffic, AirportHourlyTrafficSummary, ['dof', 'hour', 'airport_key', 'movement'], conn=conn)
+        logger.info(f"Updated {len(airport_traffic)} airport hourly traffic counts")
+
+def subtract_hourly_traffic(months: list, conn):
+    """
+    Subtracts the flights of whole months (by ``dof``) from the hourly rollups
+    (``sql/subtract_hourly_traffic.sql``). Runs before the months' ``flight_list`` rows are deleted.
+
+    Args:
+        months (list): First day of each month (date).
+        conn (Connection): Connection of the transaction that replaces the months' rows.
+    """
+    query = text((here.parent / 'sql' / 'subtract_hourly_traffic.sql').read_text())
+    for month in sorted(months):
+        conn.execute(query, {'start': month, 'end': month_end(month)})
+
+def rebuild_hourly_traffic():
+    """
+    Recounts the hourly traffic rollups from ``flight_list`` (``sql/update_hourly_traffic_summary.sql``).
+    """
+    query = (here.parent / 'sql' / 'update_hourly_traffic_summary.sql').read_text()
+
+    with engine.begin() as conn:
+        conn.execute(text(query))
+
+    logger.info("Rebuilt hourly_traffic_summary and airport_hourly_traffic_summary")
@@ -0,0 +1,136 @@
+"""
+setup/key_cache.py
+
+In-memory cache of surrogate keys for the ``flight_list`` dimension tables.
+
+Keys are loaded from PostgreSQL once and new values are inserted in one statement per batch,
+so encoding a file only queries the database for values it has not seen before. Each dimension's
+cache is loaded on first use, so the rollups of unencoded storage only need ``airport_key`` and
+``operator_key`` (created by ``create_summary_tables``).
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import pandas as pd
+from functools import cache
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from loguru import logger
+from src.db import engine, AirportKey, OperatorKey, AircraftTypeKey, VersionKey
+
+# flight_list columns replaced by keys in flight_list_encoded
+ENCODED_COLUMNS = ['adep', 'ades', 'adep_p', 'ades_p', 'icao_operator', 'model', 'typecode', 'icao_aircraft_class', 'version']
+
+# dimension: (model, value columns)
+DIMENSIONS = {
+    'airport': (AirportKey, ['icao']),
+    'operator': (OperatorKey, ['icao_operator']),
+    'aircraft_type': (AircraftTypeKey, ['model', 'typecode', 'icao_aircraft_class']),
+    'version': (VersionKey, ['version'])
+}
+
+class KeyCache():
+    """
+    Maps values of one or more columns to the surrogate key of a dimension table.
+
+    Args:
+        model (Base): SQLAlchemy ORM model of the dimension table.
+        columns (list): Names of the value columns in the dimension table.
+    """
+
+    def __init__(self, model, columns: list):
+        self.model = model
+        self.columns = columns
+        self.keys = {}
+        self.load()
+
+    def load(self):
+        """
+        Loads all existing keys from the dimension table.
+        """
+        query = select(self.model.id, *[getattr(self.model, col) for col in self.columns])
+
+        with engine.connect() as conn:
+            self.keys = {tuple(row[1:]): row[0] for row in conn.execute(query)}
+
+        logger.info(f"Loaded {len(self.keys)} keys from {self.model.__tablename__}")
+
+    def add(self, values: set):
+        """
+        Inserts values that are not yet in the cache into the dimension table and caches their keys.
+
+        Args:
+            values (set): Tuples of column values.
+        """
+        missing = [v for v in values if v not in self.keys and any(x is not None for x in v)]
+
+        if not missing:
+            return
+
+        query = (
+            insert(self.model)
+            .values([dict(zip(self.columns, v)) for v in missing])
+            .on_conflict_do_nothing()
+        )
+
+        with engine.begin() as conn:
+            conn.execute(query)
+
+        self.load() # keys inserted by another process are skipped by on_conflict_do_nothing, so reload
+
+    def encode(self, df: pd.DataFrame, columns: list) -> pd.Series:
+        """
+        Encodes the given dataframe columns as surrogate keys.
+
+        Args:
+            df (pd.DataFrame): Dataframe containing the value columns.
+            columns (list): Names of the dataframe columns, in the same order as ``self.columns``.
+
+        Returns:
+            pd.Series: Surrogate key (or None for missing values) for each row, as object dtype so keys stay integers.
+        """
+        values = df[columns].astype(object).where(df[columns].notna(), None)
+        rows = list(values.itertuples(index=False, name=None))
+
+        self.add(set(rows))
+
+        return pd.Series([self.keys.get(row) for row in rows], index=df.index, dtype=object)
+
+@cache
+def get_key_cache(dimension: str) -> KeyCache:
+    """
+    Returns the key cache of one dimension table, loading it on first use.
+
+    Args:
+        dimension (str): ``airport``, ``operator``, ``aircraft_type`` or ``version``.
+
+    Returns:
+        KeyCache: Key cache of the dimension table.
+    """
+    return KeyCache(*DIMENSIONS[dimension])
+
+def encode_flight_list(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces the string columns of a ``flight_list`` file with surrogate key columns for ``flight_list_encoded``.
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file.
+
+    Returns:
+        pd.DataFrame: Dataframe with ``*_key`` columns in place of the encoded string columns.
+    """
+    df.columns = df.columns.str.lower()
+
+    for col in ENCODED_COLUMNS: # columns skipped by the ingestion profile are stored as NULL keys
+        if col not in df:
+            df[col] = None
+
+    for col in ['adep', 'ades', 'adep_p', 'ades_p']:
+        df[f'{col}_key'] = get_key_cache('airport').encode(df, [col])
+
+    df['operator_key'] = get_key_cache('operator').encode(df, ['icao_operator'])
+    df['aircraft_type_key'] = get_key_cache('aircraft_type').encode(df, ['model', 'typecode', 'icao_aircraft_class'])
+    df['version_key'] = get_key_cache('version').encode(df, ['version'])
+
+    return df.drop(columns=ENCODED_COLUMNS)
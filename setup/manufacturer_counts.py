@@ -0,0 +1,56 @@
+"""
+setup/manufacturer_counts.py
+
+Maintains ``manufacturer_count_summary``: number of flights per year, month and manufacturer, for the
+manufacturer graphs on the home page.
+
+Whole years are recounted with ``build_manufacturer_counts`` (``src/classification.py``) and replace the
+years' rows in one transaction. The data update recounts the years of the ``flight_list`` files ingested
+in the run. Once months have been archived the counts are read through ``TieredBackend``, so archived
+months of a recounted year are kept.
+
+created: 19/10/26
+"""
+
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+from src.backends import get_backend, archived_months
+from src.classification import build_manufacturer_counts
+
+def update_manufacturer_counts(years: list = None, backend=None) -> int:
+    """
+    Recounts ``manufacturer_count_summary`` for some years, or all of it.
+
+    Args:
+        years (list, optional): Years to recount. Defaults to every year (the table is rebuilt).
+        backend (PostgresBackend | DuckDBBackend | TieredBackend, optional): Query backend. Defaults to ``tiered``
+            if months have been archived, otherwise ``postgres`` (``QUERY_BACKEND`` is ignored, as the DuckDB
+            export may be older than PostgreSQL).
+
+    Returns:
+        int: Rows written.
+    """
+    backend = backend or get_backend('tiered' if archived_months() else 'postgres')
+    counts = build_manufacturer_counts(backend, years).to_pylist()
+
+    with engine.begin() as conn:
+        if years:
+            conn.execute(text("DELETE FROM manufacturer_count_summary WHERE year = ANY(:years)"), {'years': sorted(set(map(int, years)))})
+        else:
+            conn.execute(text("DELETE FROM manufacturer_count_summary"))
+
+        if counts:
+            conn.execute(text("""
+                INSERT INTO manufacturer_count_summary (count, year, month, manufacturer)
+                VALUES (:count, :year, :month, :manufacturer)
+            """), counts)
+
+    logger.info(f"Recounted manufacturer_count_summary for {', '.join(map(str, sorted(set(years)))) if years else 'every year'}: {len(counts)} rows")
+    return len(counts)
+
+def rebuild_manufacturer_counts() -> int:
+    """
+    Recounts ``manufacturer_count_summary`` for every year.
+    """
+    return update_manufacturer_counts()
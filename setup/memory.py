@@ -0,0 +1,77 @@
+"""
+setup/memory.py
+
+Resident memory (RSS) of the ingestion process, for the per-file peak reported by ``ingest_folder`` and the
+``INGEST_MAX_RSS_MB`` ceiling.
+
+Current and peak RSS are read from ``/proc/self`` (Linux). Elsewhere the peak falls back to
+``getrusage``, which is the peak of the whole process and can't be reset between files.
+
+created: 19/10/26
+"""
+
+import gc
+import os
+import sys
+import resource
+import pyarrow as pa
+
+def rss_mb() -> float:
+    """
+    Current resident memory of the process in MB.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident memory in MB, since the last ``reset_peak_rss`` (or the process start).
+    """
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB on Linux
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident memory to the current RSS, so the next ``peak_rss_mb`` covers one file.
+
+    Returns:
+        bool: False if the peak can't be reset (not Linux), so ``peak_rss_mb`` is the process peak.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+def check_memory(max_rss_mb: int, hint: str = ''):
+    """
+    Raises before the process reaches a memory ceiling instead of being killed by the OOM killer.
+    Unreferenced objects and pyarrow's unused pool memory are released first.
+
+    Args:
+        max_rss_mb (int): Ceiling in MB. 0 disables the check.
+        hint (str, optional): Added to the error message, e.g. the setting to lower.
+
+    Raises:
+        MemoryError: If RSS is still over the ceiling.
+    """
+    if not max_rss_mb or rss_mb() <= max_rss_mb:
+        return
+
+    gc.collect()
+    pa.default_memory_pool().release_unused()
+
+    rss = rss_mb()
+    if rss > max_rss_mb:
+        raise MemoryError(f"Resident memory {rss:.0f} MB is over the {max_rss_mb} MB ceiling. {hint}".strip())
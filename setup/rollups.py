@@ -0,0 +1,69 @@
+"""
+setup/rollups.py
+
+Helpers for summary (rollup) tables that are updated incrementally during ingestion.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import pandas as pd
+from contextlib import nullcontext
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from src.db import engine
+
+# summary table: date column, for the tables updated while ingesting flight_list files and keyed by the flights' dof.
+# data_catalog is updated for both datasets and is filtered on its dataset column. The hourly traffic rollups are
+# keyed by movement dates, so replaced months are subtracted from them instead (setup/hourly_traffic.py).
+FLIGHT_LIST_ROLLUPS = {
+    'route_count_summary': 'month',
+    'route_operator_count_summary': 'month',
+    'distance_band_summary': 'month',
+    'fleet_utilization_summary': 'dof'
+}
+
+def upsert_rollup(df: pd.DataFrame, model, key_columns: list, batch_size: int = 10000, conn=None):
+    """
+    Adds the value columns of a dataframe to a summary table, inserting rows for new keys.
+
+    Args:
+        df (pd.DataFrame): Key columns and value columns (counts and totals) to add.
+        model (Base): SQLAlchemy ORM model of the summary table.
+        key_columns (list): Columns making up the summary table's primary key. All other columns are added.
+        batch_size (int): Rows per insert statement. Defaults to 10000.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    value_columns = [col for col in df.columns if col not in key_columns]
+
+    # convert numpy scalars to python types for psycopg2
+    records = [
+        {k: (v.item() if hasattr(v, 'item') else v) for k, v in row.items()}
+        for row in df.to_dict(orient='records')
+    ]
+
+    with nullcontext(conn) if conn is not None else engine.begin() as conn:
+        for i in range(0, len(records), batch_size):
+            query = insert(model).values(records[i:i + batch_size])
+            query = query.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={col: getattr(model, col) + query.excluded[col] for col in value_columns}
+            )
+            conn.execute(query)
+
+def delete_rollup_months(months: list, dataset: str, conn):
+    """
+    Removes whole months from the summary tables updated while ingesting a dataset, so the months can be
+    counted again from a republished file.
+
+    Args:
+        months (list): First day of each month (date).
+        dataset (str): ``flight_list`` or ``emissions``.
+        conn (Connection): Connection of the transaction that replaces the months' rows.
+    """
+    params = {'months': list(months), 'dataset': dataset}
+    tables = FLIGHT_LIST_ROLLUPS if dataset == 'flight_list' else {}
+
+    for table, column in tables.items():
+        conn.execute(text(f"DELETE FROM {table} WHERE DATE_TRUNC('month', {column})::date = ANY(:months)"), params)
+    conn.execute(text("DELETE FROM data_catalog WHERE dataset = :dataset AND month = ANY(:months)"), params)
@@ -0,0 +1,80 @@
+"""
+setup/route_matrix.py
+
+Maintains the origin-destination route matrix (``route_count_summary`` and ``route_operator_count_summary``).
+
+Counts are aggregated in memory for each ingested ``flight_list`` file and added to the existing
+counts, so the matrix never needs a scan of ``flight_list``. ``rebuild_route_counts`` recounts
+everything from ``flight_list`` for databases ingested before the matrix existed.
+
+created: 19/10/26
+"""
+
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, RouteCountSummary, RouteOperatorCountSummary, ROUTE_MATRIX_BY_OPERATOR
+from setup.key_cache import get_key_cache
+from setup.rollups import upsert_rollup
+
+here = Path(__file__).resolve().parent
+
+def count_routes(df: pd.DataFrame, by_operator: bool = False) -> pd.DataFrame:
+    """
+    Counts flights per month and origin-destination airport pair (and operator).
+
+    Args:
+        df (pd.DataFrame): Dataframe of a ``flight_list`` file, with airport codes or ``adep_key``/``ades_key`` columns.
+        by_operator (bool): If True, also groups by ``operator_key``. Defaults to False.
+
+    Returns:
+        pd.DataFrame: Columns ``month``, ``adep_key``, ``ades_key``, (``operator_key``), ``count``.
+    """
+    # flight_list_encoded files are already encoded
+    adep_key = df['adep_key'] if 'adep_key' in df else get_key_cache('airport').encode(df, ['adep'])
+    ades_key = df['ades_key'] if 'ades_key' in df else get_key_cache('airport').encode(df, ['ades'])
+
+    routes = pd.DataFrame({
+        'month': pd.to_datetime(df['dof']).dt.to_period('M').dt.to_timestamp().dt.date,
+        'adep_key': adep_key,
+        'ades_key': ades_key
+    })
+    group_columns = ['month', 'adep_key', 'ades_key']
+
+    if by_operator:
+        routes['operator_key'] = df['operator_key'] if 'operator_key' in df else get_key_cache('operator').encode(df, ['icao_operator'])
+        group_columns.append('operator_key')
+
+    routes = routes.dropna() # flights without an actual departure or destination aren't routes
+
+    return routes.groupby(group_columns).size().reset_index(name='count')
+
+def update_route_counts(df: pd.DataFrame, by_operator: bool = ROUTE_MATRIX_BY_OPERATOR, conn=None):
+    """
+    Adds the routes of one ingested ``flight_list`` file to the route matrix.
+
+    Args:
+        df (pd.DataFrame): Dataframe of the ingested file.
+        by_operator (bool): If True, also updates ``route_operator_count_summary``. Defaults to ``ROUTE_MATRIX_BY_OPERATOR`` in .env.
+        conn (Connection, optional): Connection of an open transaction, so the update commits with the ingested rows. Defaults to a new transaction.
+    """
+    routes = count_routes(df)
+    upsert_rollup(routes, RouteCountSummary, ['month', 'adep_key', 'ades_key'], conn=conn)
+    logger.info(f"Updated {len(routes)} route counts")
+
+    if by_operator:
+        operator_routes = count_routes(df, by_operator=True)
+        upsert_rollup(operator_routes, RouteOperatorCountSummary, ['month', 'adep_key', 'ades_key', 'operator_key'], conn=conn)
+        logger.info(f"Updated {len(operator_routes)} route operator counts")
+
+def rebuild_route_counts():
+    """
+    Recounts the route matrix from ``flight_list`` (``sql/update_route_count_summary.sql``).
+    """
+    query = (here.parent / 'sql' / 'update_route_count_summary.sql').read_text()
+
+    with engine.begin() as conn:
+        conn.execute(text(query))
+
+    logger.info("Rebuilt route_count_summary and route_operator_count_summary")
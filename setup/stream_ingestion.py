@@ -0,0 +1,200 @@
+"""
+setup/stream_ingestion.py
+
+Streaming ingestion for the ``flight_events`` and ``measurements`` datasets.
+
+These files are much larger than ``flight_list`` files, so they are never loaded whole. Files are read
+one record batch at a time (parquet row groups or csv blocks) and each batch is written
+straight to PostgreSQL with COPY, so memory use depends on the batch size rather than the file size.
+All batches of a file are copied in one transaction, so a file is either fully ingested or not at all.
+
+``flight_events`` positions are also written to the trajectory store (``src/trajectories.py``).
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import io
+import os
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import pandas as pd
+from pathlib import Path
+from typing import Iterator
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine, TableName
+from src.trajectories import write_partition
+from setup.download_manifest import DownloadManifest
+
+here = Path(__file__).resolve().parent
+
+# rows per record batch (STREAM_BATCH_SIZE in .env)
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 100000))
+
+# source file column: table column
+STREAM_COLUMNS = {
+    TableName.flight_events: {
+        'id': 'ec_id',
+        'flight_id': 'flight_ec_id',
+        'type': 'type',
+        'event_time': 'event_time',
+        'longitude': 'longitude',
+        'latitude': 'latitude',
+        'altitude': 'altitude',
+        'source': 'source',
+        'version': 'version',
+        'info': 'info'
+    },
+    TableName.measurements: {
+        'id': 'ec_id',
+        'event_id': 'event_ec_id',
+        'type': 'type',
+        'value': 'value',
+        'version': 'version'
+    }
+}
+
+def iter_batches(filename: str, columns: list, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Yields record batches of a parquet or csv file without reading the whole file.
+
+    Args:
+        filename (str): Path to the parquet or csv file.
+        columns (list): Columns to read.
+        batch_size (int): Maximum rows per batch. Defaults to ``STREAM_BATCH_SIZE``.
+
+    Yields:
+        pa.RecordBatch: The next batch of rows.
+    """
+    if filename.endswith('.parquet'):
+        yield from pq.ParquetFile(filename).iter_batches(batch_size=batch_size, columns=columns)
+        return
+
+    reader = pa_csv.open_csv(
+        filename,
+        read_options=pa_csv.ReadOptions(block_size=batch_size * 200), # csv blocks are sized in bytes, ~200 bytes per row
+        convert_options=pa_csv.ConvertOptions(include_columns=columns)
+    )
+    for batch in reader:
+        yield batch
+
+def copy_batch(cursor, batch: pa.RecordBatch, table: TableName):
+    """
+    Writes a record batch to a PostgreSQL table with COPY, in the cursor's transaction.
+
+    Args:
+        cursor: psycopg2 cursor of the file's transaction.
+        batch (pa.RecordBatch): Rows with the source file columns of ``STREAM_COLUMNS``.
+        table (TableName): Enum value indicating the target table.
+    """
+    buffer = io.BytesIO()
+    pa_csv.write_csv(batch, buffer, write_options=pa_csv.WriteOptions(include_header=False))
+    buffer.seek(0)
+
+    columns = ', '.join(STREAM_COLUMNS[table][col] for col in batch.schema.names)
+    cursor.copy_expert(f"COPY {table.value} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def is_stream_ingested(filename: str, table: TableName) -> bool:
+    """
+    Checks whether a ``flight_events`` or ``measurements`` file has already been ingested by comparing
+    a sample of 3 ids from the first batch against existing records. Files are committed in one
+    transaction (``ingest_stream``), so rows of the first batch are only present if the whole file is.
+
+    Args:
+        filename (str): Path to the parquet or csv file.
+        table (TableName): Enum value indicating the target table.
+
+    Returns:
+        bool:
+            - True if all sampled rows are already present in the database (or the file is empty).
+            - False if none of the sampled rows are present in the database.
+
+    Raises:
+        Exception: If only some of the sampled rows are found in the database
+                (indicating a partially ingested file).
+    """
+    first_batch = next(iter_batches(filename, ['id'], batch_size=1000), None)
+    if first_batch is None or first_batch.num_rows == 0:
+        return True
+
+    ids = first_batch.column('id').to_pandas().sample(n=min(3, first_batch.num_rows)).astype(str).to_list()
+    query = text(f"SELECT ec_id FROM {table.value} WHERE ec_id = ANY(:ids)")
+    sql_df = pd.read_sql(query, engine, params={'ids': ids})
+
+    if len(sql_df) == len(ids):
+        return True
+    elif sql_df.empty:
+        return False
+    else:
+        raise Exception('File partially ingested')
+
+def ingest_stream(filename: str, table: TableName, batch_size: int = STREAM_BATCH_SIZE) -> int:
+    """
+    Ingests a ``flight_events`` or ``measurements`` file one batch at a time. The batches are committed
+    together once the whole file is copied, and rolled back if any of them fails.
+
+    Args:
+        filename (str): Path to the parquet or csv file.
+        table (TableName): Enum value indicating the target table.
+        batch_size (int): Maximum rows per batch. Defaults to ``STREAM_BATCH_SIZE``.
+
+    Returns:
+        int: Number of rows ingested.
+    """
+    rows = 0
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for batch in iter_batches(filename, list(STREAM_COLUMNS[table]), batch_size):
+                copy_batch(cursor, batch, table)
+                rows += batch.num_rows
+                logger.info(f"Copied {rows} records into {table.value}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"Committed {rows} records into {table.value}")
+    return rows
+
+def ingest_stream_folder(folder: str, table: TableName, batch_size: int = STREAM_BATCH_SIZE,
+                         manifest: DownloadManifest = None) -> list:
+    """
+    Streams each file in a folder into the provided PostgreSQL table.
+
+    Args:
+        folder (str): Directory of files to ingest.
+        table (TableName): Enum value indicating the target table.
+        batch_size (int): Maximum rows per batch. Defaults to ``STREAM_BATCH_SIZE``.
+        manifest (DownloadManifest, optional): Download manifest. Files are marked ingested once checked or committed.
+
+    Returns:
+        list: Names of the files ingested.
+    """
+    ingested = []
+    for root, dirs, files in os.walk(here / 'data' / folder):
+        for file in sorted(files):
+            if not file.endswith(('.csv', '.parquet')):
+                continue
+
+            filename = os.path.join(root, file)
+            if is_stream_ingested(filename, table):
+                logger.info(f"{filename} is already ingested. Skipping file")
+            else:
+                logger.info(f"Processing {filename}")
+                ingest_stream(filename, table, batch_size)
+                logger.info(f"Finished processing {filename}")
+                ingested.append(file)
+
+                if table == TableName.flight_events and filename.endswith('.parquet'):
+                    write_partition(filename) # positions for per-flight track lookups
+
+            if manifest:
+                manifest.mark_ingested(file)
+
+    return ingested
@@ -0,0 +1,35 @@
+-- Compatibility view for dictionary encoded flight_list storage 
+-- Decodes the integer keys in flight_list_encoded back into the original flight_list columns
+-- Joins are LEFT JOINs on unique keys so postgres removes joins for columns a query doesn't use
+-- 19/10/26
+
+CREATE OR REPLACE VIEW flight_list AS
+SELECT 
+    f.id,
+    f.ec_id,
+    f.icao24,
+    f.flt_id,
+    f.dof,
+    adep.icao AS adep,
+    ades.icao AS ades,
+    adep_p.icao AS adep_p,
+    ades_p.icao AS ades_p,
+    f.registration,
+    t.model,
+    t.typecode,
+    t.icao_aircraft_class,
+    o.icao_operator,
+    f.first_seen,
+    f.last_seen,
+    v.version,
+    f.unix_time,
+    f.distance_km,
+    f.block_time_s
+FROM flight_list_encoded f
+LEFT JOIN airport_key adep ON f.adep_key = adep.id
+LEFT JOIN airport_key ades ON f.ades_key = ades.id
+LEFT JOIN airport_key adep_p ON f.adep_p_key = adep_p.id
+LEFT JOIN airport_key ades_p ON f.ades_p_key = ades_p.id
+LEFT JOIN aircraft_type_key t ON f.aircraft_type_key = t.id
+LEFT JOIN operator_key o ON f.operator_key = o.id
+LEFT JOIN version_key v ON f.version_key = v.id;
@@ -0,0 +1,48 @@
+-- Query to subtract the flights of one month (by dof) from the hourly traffic rollups, before the month's flight_list rows are replaced
+-- Rollup days are the UTC dates of first_seen and last_seen, so a month's flights also count on the first day of the next month
+-- and can't be removed by deleting the month's rollup days. Matches sql/update_hourly_traffic_summary.sql
+-- :start and :end are the first day of the month and of the next month
+-- 19/10/26
+
+UPDATE hourly_traffic_summary h
+SET count = h.count - f.count
+FROM (
+    SELECT
+        first_seen::date AS dof,
+        EXTRACT(HOUR FROM first_seen) AS hour,
+        CASE
+            WHEN distance_km IS NULL THEN 'unknown'
+            WHEN distance_km <= 1500 THEN 'short'
+            WHEN distance_km <= 4000 THEN 'medium'
+            ELSE 'long'
+        END AS band,
+        COUNT(*) AS count
+    FROM flight_list
+    WHERE dof >= :start AND dof < :end
+    AND first_seen IS NOT NULL
+    GROUP BY 1, 2, 3
+) f
+WHERE h.dof = f.dof AND h.hour = f.hour AND h.band = f.band;
+
+UPDATE airport_hourly_traffic_summary s
+SET count = s.count - f.count
+FROM (
+    SELECT
+        m.time::date AS dof,
+        EXTRACT(HOUR FROM m.time) AS hour,
+        a.id AS airport_key,
+        m.movement,
+        COUNT(*) AS count
+    FROM (
+        SELECT adep AS airport, first_seen AS time, 'departure' AS movement FROM flight_list WHERE dof >= :start AND dof < :end
+        UNION ALL
+        SELECT ades, last_seen, 'arrival' FROM flight_list WHERE dof >= :start AND dof < :end
+    ) m
+    JOIN airport_key a ON m.airport = a.icao
+    WHERE m.time IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+) f
+WHERE s.dof = f.dof AND s.hour = f.hour AND s.airport_key = f.airport_key AND s.movement = f.movement;
+
+DELETE FROM hourly_traffic_summary WHERE count <= 0;
+DELETE FROM airport_hourly_traffic_summary WHERE count <= 0;
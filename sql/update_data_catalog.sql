@@ -0,0 +1,22 @@
+-- Query to recount the months available in flight_list and emissions 
+-- 19/10/26
+
+TRUNCATE data_catalog;
+
+INSERT INTO data_catalog (dataset, month, count)
+SELECT 
+    'flight_list',
+    DATE_TRUNC('month', dof)::date AS month,
+    COUNT(*)
+FROM flight_list
+WHERE dof IS NOT NULL
+GROUP BY DATE_TRUNC('month', dof);
+
+INSERT INTO data_catalog (dataset, month, count)
+SELECT 
+    'emissions',
+    MAKE_DATE(year, month, 1) AS month,
+    COUNT(*)
+FROM emissions
+WHERE year IS NOT NULL AND month IS NOT NULL
+GROUP BY MAKE_DATE(year, month, 1);
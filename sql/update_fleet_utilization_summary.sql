@@ -0,0 +1,37 @@
+-- Query to recount daily aircraft utilization per operator from flight_list
+-- One pass over flights ordered by aircraft and first_seen: LAG gives the ground time since the aircraft's previous flight
+-- :max_turnaround_s is the longest ground time counted as a turnaround (TURNAROUND_MAX_HOURS in .env)
+-- 19/10/26
+
+INSERT INTO operator_key (icao_operator)
+SELECT DISTINCT icao_operator FROM flight_list WHERE icao_operator IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+TRUNCATE fleet_utilization_summary;
+
+WITH flights AS (
+    SELECT
+        dof,
+        icao24,
+        icao_operator,
+        GREATEST(EXTRACT(EPOCH FROM (last_seen - first_seen)), 0) AS block_time_s,
+        EXTRACT(EPOCH FROM (
+            first_seen - LAG(last_seen) OVER (PARTITION BY icao24 ORDER BY first_seen)
+        )) AS ground_s
+    FROM flight_list
+    WHERE icao24 IS NOT NULL
+    AND first_seen IS NOT NULL
+    AND last_seen IS NOT NULL
+)
+INSERT INTO fleet_utilization_summary (dof, icao24, operator_key, cycles, block_time_s, turnarounds, turnaround_s)
+SELECT
+    f.dof,
+    f.icao24,
+    o.id AS operator_key,
+    COUNT(*) AS cycles,
+    SUM(f.block_time_s)::bigint AS block_time_s,
+    COUNT(*) FILTER (WHERE f.ground_s BETWEEN 0 AND :max_turnaround_s) AS turnarounds,
+    COALESCE(SUM(f.ground_s) FILTER (WHERE f.ground_s BETWEEN 0 AND :max_turnaround_s), 0)::bigint AS turnaround_s
+FROM flights f
+JOIN operator_key o ON f.icao_operator = o.icao_operator
+GROUP BY 1, 2, 3;
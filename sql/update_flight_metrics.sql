@@ -0,0 +1,78 @@
+-- Query to add distance_km and block_time_s to a flight_list table ingested before they were calculated at ingestion
+-- Backfills block time from first_seen/last_seen and great-circle (haversine) distance from icao_list coordinates
+-- With FLIGHT_LIST_ENCODED=true the columns are added to flight_list_encoded (airports through airport_key),
+-- and the flight_list view has to be recreated with sql/create_flight_list_view.sql to show them
+-- (setup.enrichment.backfill_flight_metrics runs both)
+-- 19/10/26
+
+DO $$
+BEGIN
+    IF to_regclass('public.flight_list_encoded') IS NOT NULL THEN
+        ALTER TABLE flight_list_encoded ADD COLUMN IF NOT EXISTS distance_km double precision;
+        ALTER TABLE flight_list_encoded ADD COLUMN IF NOT EXISTS block_time_s integer;
+
+        UPDATE flight_list_encoded
+        SET block_time_s = EXTRACT(EPOCH FROM (last_seen - first_seen))::int
+        WHERE block_time_s IS NULL;
+
+        WITH airport AS (
+            SELECT DISTINCT ON (k.id) k.id, radians(i.latitude) AS lat, radians(i.longitude) AS lon
+            FROM airport_key k
+            JOIN icao_list i ON k.icao = i.icao
+        )
+        UPDATE flight_list_encoded f
+        SET distance_km = 2 * 6371.0088 * asin(sqrt(
+                power(sin((des.lat - dep.lat) / 2), 2)
+                + cos(dep.lat) * cos(des.lat) * power(sin((des.lon - dep.lon) / 2), 2)
+            ))
+        FROM airport dep, airport des
+        WHERE f.adep_key = dep.id
+        AND f.ades_key = des.id
+        AND f.distance_km IS NULL;
+    ELSE
+        ALTER TABLE flight_list ADD COLUMN IF NOT EXISTS distance_km double precision;
+        ALTER TABLE flight_list ADD COLUMN IF NOT EXISTS block_time_s integer;
+
+        UPDATE flight_list
+        SET block_time_s = EXTRACT(EPOCH FROM (last_seen - first_seen))::int
+        WHERE block_time_s IS NULL;
+
+        WITH airport AS (
+            SELECT DISTINCT ON (icao) icao, radians(latitude) AS lat, radians(longitude) AS lon
+            FROM icao_list
+            WHERE icao IS NOT NULL
+        )
+        UPDATE flight_list f
+        SET distance_km = 2 * 6371.0088 * asin(sqrt(
+                power(sin((des.lat - dep.lat) / 2), 2)
+                + cos(dep.lat) * cos(des.lat) * power(sin((des.lon - dep.lon) / 2), 2)
+            ))
+        FROM airport dep, airport des
+        WHERE f.adep = dep.icao
+        AND f.ades = des.icao
+        AND f.distance_km IS NULL;
+    END IF;
+END $$;
+
+TRUNCATE distance_band_summary;
+
+-- read from the storage table, as the flight_list view may not have the new columns yet
+DO $$
+BEGIN
+    EXECUTE format($query$
+        INSERT INTO distance_band_summary (month, band, count, distance_km, block_time_s)
+        SELECT
+            DATE_TRUNC('month', dof)::date AS month,
+            CASE
+                WHEN distance_km IS NULL THEN 'unknown'
+                WHEN distance_km <= 1500 THEN 'short'
+                WHEN distance_km <= 4000 THEN 'medium'
+                ELSE 'long'
+            END AS band,
+            COUNT(*) AS count,
+            COALESCE(SUM(distance_km), 0) AS distance_km,
+            COALESCE(SUM(block_time_s), 0) AS block_time_s
+        FROM %I
+        GROUP BY 1, 2
+    $query$, CASE WHEN to_regclass('public.flight_list_encoded') IS NOT NULL THEN 'flight_list_encoded' ELSE 'flight_list' END);
+END $$;
@@ -0,0 +1,43 @@
+-- Query to recount hourly network and airport traffic from flight_list
+-- Hours are UTC (first_seen and last_seen are stored in UTC): departures from first_seen, arrivals from last_seen
+-- Distance bands match DISTANCE_BANDS in setup/enrichment.py
+-- 19/10/26
+
+INSERT INTO airport_key (icao)
+SELECT adep FROM flight_list WHERE adep IS NOT NULL
+UNION
+SELECT ades FROM flight_list WHERE ades IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+TRUNCATE hourly_traffic_summary, airport_hourly_traffic_summary;
+
+INSERT INTO hourly_traffic_summary (dof, hour, band, count)
+SELECT
+    first_seen::date AS dof,
+    EXTRACT(HOUR FROM first_seen) AS hour,
+    CASE
+        WHEN distance_km IS NULL THEN 'unknown'
+        WHEN distance_km <= 1500 THEN 'short'
+        WHEN distance_km <= 4000 THEN 'medium'
+        ELSE 'long'
+    END AS band,
+    COUNT(*) AS count
+FROM flight_list
+WHERE first_seen IS NOT NULL
+GROUP BY 1, 2, 3;
+
+INSERT INTO airport_hourly_traffic_summary (dof, hour, airport_key, movement, count)
+SELECT
+    m.time::date AS dof,
+    EXTRACT(HOUR FROM m.time) AS hour,
+    a.id AS airport_key,
+    m.movement,
+    COUNT(*) AS count
+FROM (
+    SELECT adep AS airport, first_seen AS time, 'departure' AS movement FROM flight_list
+    UNION ALL
+    SELECT ades, last_seen, 'arrival' FROM flight_list
+) m
+JOIN airport_key a ON m.airport = a.icao
+WHERE m.time IS NOT NULL
+GROUP BY 1, 2, 3, 4;
@@ -0,0 +1,39 @@
+-- Query to recount the origin-destination route matrix from flight_list
+-- Adds any missing airports and operators to the key tables first 
+-- 19/10/26
+
+INSERT INTO airport_key (icao)
+SELECT adep FROM flight_list WHERE adep IS NOT NULL
+UNION 
+SELECT ades FROM flight_list WHERE ades IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO operator_key (icao_operator)
+SELECT DISTINCT icao_operator FROM flight_list WHERE icao_operator IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+TRUNCATE route_count_summary, route_operator_count_summary;
+
+INSERT INTO route_count_summary (month, adep_key, ades_key, count)
+SELECT 
+    DATE_TRUNC('month', f.dof)::date AS month,
+    adep.id AS adep_key,
+    ades.id AS ades_key,
+    COUNT(*) AS count
+FROM flight_list f
+JOIN airport_key adep ON f.adep = adep.icao
+JOIN airport_key ades ON f.ades = ades.icao
+GROUP BY 1, 2, 3;
+
+INSERT INTO route_operator_count_summary (month, adep_key, ades_key, operator_key, count)
+SELECT 
+    DATE_TRUNC('month', f.dof)::date AS month,
+    adep.id AS adep_key,
+    ades.id AS ades_key,
+    o.id AS operator_key,
+    COUNT(*) AS count
+FROM flight_list f
+JOIN airport_key adep ON f.adep = adep.icao
+JOIN airport_key ades ON f.ades = ades.icao
+JOIN operator_key o ON f.icao_operator = o.icao_operator
+GROUP BY 1, 2, 3, 4;
@@ -3,16 +3,20 @@ src/app.py
 
 author: c-baines
 created: 28/4/25
-modified: 20/8/25
+modified: 19/10/26
 """
 
 from dash import Dash, html, page_container, page_registry
 from src.callbacks import register_callbacks
+from src.stores import refresh_startup_cache
+from src.profiling import register_profiling, PROFILING
 import os
 import dash_bootstrap_components as dbc
 
 assets_path = os.path.join(os.path.dirname(__file__), '..', 'assets')
 app = Dash(__name__, use_pages=True, assets_folder=assets_path, external_stylesheets=[dbc.themes.BOOTSTRAP])
+server = app.server # WSGI app for multi-worker servers, e.g. gunicorn src.app:server
+server.before_request(refresh_startup_cache) # reload cached frames after data updates
 
 nav_links = dbc.Nav(
     [
@@ -36,6 +40,7 @@ navbar = dbc.Navbar(
                         dbc.Nav(
                             [
                                 dbc.NavLink("Home", href="/", active="exact"),
+                                dbc.NavLink("Flight", href="/flight", active="exact"),
                                 dbc.NavLink("Data", href="/data", active="exact"),
                                 dbc.NavLink("About", href="/about", active="exact"),
                             ],
@@ -61,6 +66,9 @@ app.layout = html.Div([
 
 register_callbacks(app)
 
+if PROFILING:
+    register_profiling(app)
+
 if __name__ == "__main__":
     app.run(debug=False)
 
@@ -0,0 +1,181 @@
+"""
+src/backends.py
+
+Query backends for the analytics queries in ``src/queries.py``.
+
+- ``PostgresBackend``: runs queries on the PostgreSQL tables through ``src.db.engine``.
+- ``DuckDBBackend``: runs queries in an embedded DuckDB over the downloaded ``flight_list`` parquet
+  files (``KEEP_PARQUET=true``). Columnar scans only read the columns a query uses. The small
+  reference tables (``airlines``, ``icao_list``, ``aircraft_model``) are copied from PostgreSQL once.
+- ``TieredBackend``: runs queries in an embedded DuckDB over the recent months still in PostgreSQL
+  plus the months archived to parquet by ``setup/archive.py``, so queries cover every month.
+
+All backends return results as Arrow tables. The backend is chosen with ``QUERY_BACKEND`` in .env,
+or is ``tiered`` once months have been archived.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import re
+import duckdb
+import pandas as pd
+import pyarrow as pa
+from pathlib import Path
+from datetime import date
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+
+PARQUET_FOLDER = Path(os.getenv(
+    'PARQUET_FOLDER',
+    Path(__file__).resolve().parent.parent / 'setup' / 'data'
+))
+
+# months of flight_list archived to parquet by setup/archive.py (ARCHIVE_FOLDER in .env)
+ARCHIVE_FOLDER = Path(os.getenv('ARCHIVE_FOLDER', PARQUET_FOLDER / 'archive'))
+
+# reference tables copied from PostgreSQL into DuckDB
+REFERENCE_TABLES = ['airlines', 'icao_list', 'aircraft_model']
+
+def archived_months(archive_folder: Path = ARCHIVE_FOLDER) -> list:
+    """
+    Months of ``flight_list`` in the archive, from its ``flight_list/year=YYYY/month=MM`` partition folders.
+
+    Args:
+        archive_folder (Path): Archive folder. Defaults to ``ARCHIVE_FOLDER``.
+
+    Returns:
+        list: First day of each archived month (date), ascending.
+    """
+    months = []
+    for partition in (archive_folder / 'flight_list').glob('year=*/month=*'):
+        if any(partition.glob('*.parquet')):
+            months.append(date(int(partition.parent.name[5:]), int(partition.name[6:]), 1))
+    return sorted(months)
+
+class PostgresBackend():
+    """
+    Runs queries on PostgreSQL.
+    """
+    name = 'postgres'
+    dialect = 'postgres'
+
+    def query(self, query: str, params: dict = None) -> pa.Table:
+        """
+        Runs a query.
+
+        Args:
+            query (str): SQL query with ``:name`` parameters.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            pa.Table: Query result.
+        """
+        df = pd.read_sql(text(query), engine, params=params, dtype_backend="pyarrow")
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+class DuckDBBackend():
+    """
+    Runs queries in an embedded DuckDB over the local parquet store.
+
+    Args:
+        parquet_folder (Path): Folder containing a ``flight_list`` folder of parquet files. Defaults to ``PARQUET_FOLDER``.
+    """
+    name = 'duckdb'
+    dialect = 'duckdb'
+
+    def __init__(self, parquet_folder: Path = PARQUET_FOLDER):
+        self.con = duckdb.connect()
+
+        flight_list_glob = (parquet_folder / 'flight_list' / '*.parquet').as_posix()
+        self.con.execute(f"CREATE VIEW flight_list AS SELECT * FROM read_parquet('{flight_list_glob}')")
+        self.copy_reference_tables()
+
+        logger.info(f"DuckDB backend reading {flight_list_glob}")
+
+    def copy_reference_tables(self):
+        """
+        Copies the small reference tables (``REFERENCE_TABLES``) from PostgreSQL into DuckDB.
+        """
+        for table in REFERENCE_TABLES:
+            arrow_table = PostgresBackend().query(f"SELECT * FROM {table}")
+            self.con.register(f'{table}_arrow', arrow_table)
+            self.con.execute(f"CREATE TABLE {table} AS SELECT * FROM {table}_arrow")
+            self.con.unregister(f'{table}_arrow')
+
+    def query(self, query: str, params: dict = None) -> pa.Table:
+        """
+        Runs a query.
+
+        Args:
+            query (str): SQL query with ``:name`` parameters (converted to DuckDB ``$name`` parameters).
+            params (dict, optional): Query parameters.
+
+        Returns:
+            pa.Table: Query result.
+        """
+        for name in params or {}:
+            query = re.sub(rf'(?<!:):{name}\b', f'${name}', query) # not ::casts or longer names sharing the prefix
+        return self.con.execute(query, params or {}).arrow()
+
+class TieredBackend(DuckDBBackend):
+    """
+    Runs queries in an embedded DuckDB over both storage tiers:
+        - Hot: months still in PostgreSQL, read through DuckDB's ``postgres`` extension. Filters on ``dof``
+          are pushed down to PostgreSQL.
+        - Archive: months exported by ``setup/archive.py``, read from the compressed parquet partitions.
+
+    ``flight_list`` is a view over the union of both, so the ``flight_list`` queries in ``src/queries.py``
+    answer for archived months without changes. Hot rows are limited to the months after the last
+    archived month, so a month is never counted twice (e.g. if an archive run stopped before deleting it).
+
+    Args:
+        archive_folder (Path): Archive folder. Defaults to ``ARCHIVE_FOLDER``.
+    """
+    name = 'tiered'
+
+    def __init__(self, archive_folder: Path = ARCHIVE_FOLDER):
+        self.con = duckdb.connect()
+        self.con.execute("INSTALL postgres; LOAD postgres;")
+
+        url = engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        self.con.execute(f"ATTACH '{url}' AS pg (TYPE postgres, READ_ONLY)")
+
+        months = archived_months(archive_folder)
+        if months:
+            last = months[-1]
+            archive_end = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+            archive_glob = (archive_folder / 'flight_list' / '*' / '*' / '*.parquet').as_posix()
+            self.con.execute(f"""
+                CREATE VIEW flight_list AS
+                SELECT * FROM pg.public.flight_list WHERE dof >= DATE '{archive_end}'
+                UNION ALL BY NAME
+                SELECT * FROM read_parquet('{archive_glob}', hive_partitioning = false)
+            """)
+            logger.info(f"Tiered backend: {len(months)} archived months ({months[0]:%Y-%m} to {last:%Y-%m}) in {archive_folder}, later months in PostgreSQL")
+        else:
+            self.con.execute("CREATE VIEW flight_list AS SELECT * FROM pg.public.flight_list")
+            logger.info("Tiered backend: no archived months, reading PostgreSQL")
+
+        self.copy_reference_tables()
+
+def get_backend(name: str = None):
+    """
+    Creates the query backend.
+
+    Args:
+        name (str, optional): ``postgres``, ``duckdb`` or ``tiered``. Defaults to ``QUERY_BACKEND`` in .env,
+            or ``tiered`` if months have been archived (otherwise ``postgres``).
+
+    Returns:
+        PostgresBackend | DuckDBBackend | TieredBackend: Query backend.
+    """
+    name = name or os.getenv('QUERY_BACKEND') or ('tiered' if archived_months() else 'postgres')
+
+    if name == 'duckdb':
+        return DuckDBBackend()
+    if name == 'tiered':
+        return TieredBackend()
+    return PostgresBackend()
@@ -4,17 +4,22 @@ src/callbacks.py
 Callbacks used to update figures in app.
 
 created: 19/5/25
-modified: 22/8/25
+modified: 19/10/26
 """
-from dash import Input, Output, callback
-from src.queries import STARTUP_QUERIES, get_top_airlines, get_top_models
+from dash import Input, Output, State, ClientsideFunction, callback, ctx, no_update
+from src.queries import STARTUP_QUERIES, get_top_airlines, get_top_models, get_emissions_slice, get_top_emitters, get_fleet_utilization, get_traffic_heatmap
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-# import pandas as pd
+from src.trajectories import TrajectoryStore
+from src.stores import flight_counts_window, get_daily_counts
+from src.search import get_search_index
+from src.spatial import get_airport_index
+from src.choropleth import emissions_choropleth, get_europe_geometry
+import pandas as pd
 # import plotly.express as px
 
+TRAJECTORY_STORE = TrajectoryStore()
+
 
 def register_callbacks(app): 
     """
@@ -24,168 +29,108 @@ def register_callbacks(app):
         app (dash.Dash): The Dash app instance to which the callbacks will be registered.
     """
 
-    # Flight count cards
-    @app.callback(
+    # Flight count cards, flight count line graph and manufacturers line graph are built in the 
+    # browser (assets/clientside.js) from the datasets in the home page dcc.Store components
+    app.clientside_callback(
+        ClientsideFunction(namespace='flights', function_name='monthRange'),
+        Output('flight-count-date-range', 'start_date'),
+        Output('flight-count-date-range', 'end_date'),
+        Input('flight-count-dropdown', 'value'),
+        State('flight-count-sums-store', 'data'),
+        prevent_initial_call=True
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='flights', function_name='indicatorCards'),
         Output('card', 'figure'),
-        Input('flight-count-dropdown', 'value')
+        Input('flight-count-date-range', 'start_date'),
+        Input('flight-count-date-range', 'end_date'),
+        State('flight-count-sums-store', 'data'),
+        State('figure-templates-store', 'data')
+    )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='flights', function_name='flightCountLine'),
+        Output('flight-count-graph', 'figure'),
+        Input('flight-count-date-range', 'start_date'),
+        Input('flight-count-date-range', 'end_date'),
+        Input('flight-counts-window-store', 'data'),
+        State('flight-counts-store', 'data'),
+        State('flight-count-sums-store', 'data'),
+        State('figure-templates-store', 'data')
     )
-    def update_indicator_cards(month_string):
+
+    # Full resolution flight counts for a selected date range or zoomed window
+    @app.callback(
+        Output('flight-counts-window-store', 'data'),
+        Input('flight-count-date-range', 'start_date'),
+        Input('flight-count-date-range', 'end_date'),
+        Input('flight-count-graph', 'relayoutData'),
+        prevent_initial_call=True
+    )
+    def update_flight_count_window(start_date, end_date, relayout):
         """
-        Update the indicator card figures based on selected month.
+        Fetch daily flight counts for the selected date range or the zoomed x-axis range of the 
+        flight count line graph. The line graph shows the downsampled counts in 
+        flight-counts-store when the whole date range is selected and not zoomed.
 
         Args:
-            month_string (str): Valye from 'flight-count-dropdown'.
-                Either 'all' (full dataset) or a month value matching 
-                'month_string' column in the df.
+            start_date (str): Start date from flight-count-date-range ('YYYY-MM-DD').
+            end_date (str): End date from flight-count-date-range ('YYYY-MM-DD').
+            relayout (dict): relayoutData from flight-count-graph.
 
         Returns:
-            plotly.graph_objects.Figure: Updated indicator cards figure.
+            dict | None: Window key, x-axis range and columnar flight counts, or None for the overview.
         """
-        df = STARTUP_QUERIES.CARD_COUNTS_DF.copy()
-        columns = ['intra_eu', 'departures_to_outside', 'arrivals_from_outside', 'overflights']
-        vals = {}
-        # tuple of value and previous month value
-        if not month_string or month_string=='all': # if no previous month then delta value = None
-            vals = {col:(df[col].sum(), None) for col in columns}
-
-        else:
-            curr_df = df[df['month_string']==month_string].copy()
-            prev_month_str = (datetime.strptime(month_string,'%B %Y') + relativedelta(months=-1)).strftime('%B %Y')
-            prev_df = df[df['month_string']==prev_month_str].copy()
-
-            # if there is no previous month data 
-            if prev_df.empty:
-                vals = {col:(curr_df[col].to_list()[0], None) for col in columns}
-            else:
-                vals = {col:(curr_df[col].to_list()[0], prev_df[col].to_list()[0]) for col in columns} 
-
-        fig = make_subplots(
-                rows=1, cols=len(columns),
-                specs=[[{'type': 'domain'}]*len(columns)]
-            )
-        
-        count=1 # count is for tracking column position [0, 1, 2, 3, ...]
-        for col, val in vals.items(): # add each category as trace 
-            fig.add_trace(
-                go.Indicator(
-                    mode="number+delta",
-                    value=val[0],
-                    delta={
-                        'reference': val[1], 
-                        'relative': True, 
-                        'valueformat': '.1%'
-                    } 
-                    if val[1] else None, 
-                    title={'text': col.replace('_', ' ').title()},
-                    number={"font": {"size": 60}},
-                    domain={
-                        'x': [0.5, 0.95], 
-                        'y': [0.5, 0.95]
-                    }
-                ),
-                row=1, col=count
-            )
-            count+=1
-
-        fig.update_layout(
-            height=200,
-            margin=dict(t=30, b=10, l=10, r=10)  
-        )
-
-        return fig
+        relayout = relayout or {}
+        range_key = f"{start_date[:10]}/{end_date[:10]}"
+
+        if ctx.triggered_id == 'flight-count-graph':
+            if 'xaxis.range[0]' in relayout:
+                x_range = [relayout['xaxis.range[0]'], relayout['xaxis.range[1]']]
+                return {'key': 'zoom', 'range_key': range_key, 'range': x_range, **flight_counts_window(*x_range)}
+            if not relayout.get('xaxis.autorange'):
+                return no_update # legend clicks, drag mode changes etc.
+
+        # date range change or zoom reset
+        daily_counts = get_daily_counts()
+        if daily_counts.offset(start_date) == 0 and daily_counts.offset(end_date) == len(daily_counts.cumsum) - 2:
+            return None
+        return {'key': range_key, 'range': None, **flight_counts_window(start_date, end_date)}
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='flights', function_name='manufacturerPercentLine'),
+        Output('manufacturer-percent-graph', 'figure'),
+        Input('airlines-dropdown', 'value'),
+        State('manufacturer-percent-store', 'data'),
+        State('figure-templates-store', 'data')
+    )
 
-    # Flight count line graph
+    # Airport and airline type-ahead, answered from the in-process search index
     @app.callback(
-            Output('flight-count-graph', 'figure'),
-            Input('flight-count-dropdown', 'value')
+        Output('place-search', 'options'),
+        Input('place-search', 'search_value'),
+        State('place-search', 'value')
     )
-    def update_flight_count_line(month_string):
+    def update_place_search_options(search_value, value):
         """
-        Updates flight_list line graph based on selected month. 
+        Search airports and airlines as the user types.
 
         Args:
-            month_string (str): Value from 'flight-count-dropdown'.
-                Either 'all' (full dataset) or a month value matching 
-                'month_string' column in the df.
+            search_value (str): Text typed in the place-search dropdown.
+            value (str): Selected entry, e.g. 'airport:EGLL', kept in the options so it stays displayed.
 
         Returns:
-            plotly.graph_objects.Figure: Updated line graph figure.
+            list: Dropdown options, best match first.
         """
-        df = STARTUP_QUERIES.FL_COUNT_BY_DAY_DF.copy()
-
-        if month_string!='all':
-            df = df[df['month_year']==month_string] 
-
-        color_map = {
-            'total': '#000000',   
-            'intra-eu': '#12436D',
-            'arrivals_from_outside': '#28A197', 
-            'departures_to_outside': '#801650', 
-            'overflights': '#F46A25'
-        }
-
-        label_map = {
-            'total': 'Total',
-            'intra-eu': 'Intra Europe',
-            'arrivals_from_outside': 'Arrivals',
-            'departures_to_outside': 'Departures',
-            'overflights': 'Overflights'
-        }
-
-        fig = go.Figure()
-
-        for category in df['category'].unique(): # iterates through unique category labels
-            category_df = df[df['category'] == category] # get category subset df
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=category_df['dof'],
-                    y=category_df['count'],
-                    mode='lines',
-                    name=label_map.get(category, category), # gets category key value from dict, or default category label 
-                    line=dict(color=color_map[category]),
-                    showlegend=True
-                )
-            )
-
-        fig.update_layout(
-            xaxis=dict(
-                showgrid=False,  
-                showline=True,   
-                linecolor='rgb(204, 204, 204)',
-                linewidth=2,
-                ticklen=5,
-                ticks='outside',
-                tickwidth=2,
-                tickcolor='rgb(204, 204, 204)'
-            ),
-            yaxis=dict(
-                showgrid=True, 
-                griddash='dot',
-                showline=False,   
-                linecolor='rgb(204, 204, 204)',
-                linewidth=2
-            ),
-            legend=dict(
-                orientation="h",     
-                yanchor="bottom",
-                y=-0.3,              
-                xanchor="center",
-                x=0.5
-            ),
-            plot_bgcolor='white', 
-            height=500,
-            template="plotly_white",
-            margin=dict(t=40)
-        )
+        if not search_value:
+            return no_update
 
-        fig.update_layout(
-            title="Number of flights Over Time",
-            xaxis_title="Time",
-            yaxis_title="Number of flights"
-        )
-
-        return fig 
+        index = get_search_index()
+        options = index.options(search_value)
+        if value and value not in [o['value'] for o in options]:
+            options.append({'label': index.label(value), 'value': value})
+        return options
 
     # Airlines and aircraft pie and bar graphs
     @app.callback(
@@ -197,7 +142,7 @@ def register_callbacks(app):
         Update aircraft and airline pie and bar charts. 
 
         Args:
-            year (float): Value from airlines-dropdown. 
+            year (int): Value from airlines-dropdown. 
                 Either 'all' (full dataset) or a year value matching 
                 'year' column in the df.
 
@@ -216,11 +161,11 @@ def register_callbacks(app):
         }) 
 
         if year!='all':
-            airlines_df = airlines_df[airlines_df['year']==year]
+            airlines_df = airlines_df[airlines_df['year'].eq(year).fillna(False)] # years are nullable integers
             airlines_df.sort_values('count', ascending=False, inplace=True)
             airlines_df = airlines_df.head(10) 
 
-            model_df = model_df[model_df['year']==year]
+            model_df = model_df[model_df['year'].eq(year).fillna(False)]
             model_df.sort_values('count', ascending=False, inplace=True)
             model_df = model_df.head(10)
 
@@ -240,7 +185,7 @@ def register_callbacks(app):
             model_df.sort_values('count', ascending=False, inplace=True)
             model_df = model_df.head(10)
 
-            manufacturer_df = manufacturer_df.groupby(['manufacturer']).agg({
+            manufacturer_df = manufacturer_df.groupby(['manufacturer'], observed=True).agg({
                 'count': 'sum'
             }).reset_index()
 
@@ -381,96 +326,122 @@ def register_callbacks(app):
     
         return fig     
 
-    # Manufacturers line graph
+    # Fleet utilization bar graphs
     @app.callback(
-        Output('manufacturer-percent-graph', 'figure'),
-        Input('airlines-dropdown', 'value')
-    )    
-    def update_manufacturer_percent_line(year):
+        Output('fleet-utilization-graph', 'figure'),
+        Input('fleet-dropdown', 'value'),
+        Input('place-search', 'value')
+    )
+    def update_fleet_utilization(month, place):
         """
-        Update manufacturer line graph. 
+        Update fleet utilization bar graphs: block hours per aircraft day and mean turnaround time 
+        for the busiest operators, or for the aircraft of the airline selected in place-search.
 
         Args:
-            year (float): Value from airlines-dropdown. 
-                Either 'all' (full dataset) or a year value matching 
-                'year' column in the df.
+            month (str): Value from fleet-dropdown. Either 'all' or a month string e.g. 'March 2024'.
+            place (str): Value from place-search, e.g. 'airline:EZY'. Airports are ignored.
 
         Returns:
-            plotly.graph_objects.Figure: Updated manufacturer line graph figure. 
+            plotly.graph_objects.Figure: Updated bar graphs figure.
         """
-        df = STARTUP_QUERIES.MANUFACTURER_PERCENT_DF.copy()
+        operator = place.split(':', 1)[1] if place and place.startswith('airline:') else None
+        month_start = None if month == 'all' else pd.to_datetime(month, format='%B %Y').strftime('%Y-%m-%d')
 
-        if year!='all':
-            df = df[df['year']==year]
+        if month_start is None and operator is None:
+            df = STARTUP_QUERIES.FLEET_UTILIZATION_DF # whole table scan, cached
+        else:
+            df = get_fleet_utilization(month_start, operator)
+        df = df.iloc[::-1] # busiest at the top
 
-        fig = go.Figure()
+        fig = make_subplots(
+            rows=1, cols=2,
+            subplot_titles=('Block Hours per Aircraft Day', 'Mean Turnaround (min)'),
+            shared_yaxes=True
+        )
 
-        color_map = {
-            'Airbus': '#12436D', 
-            'Bombardier': '#FFC000',
-            'Cessna': '#3D3D3D',
-            'ATR': '#A285D1',
-            'Embraer': '#801650',
-            'Boeing': '#28A197',
-            'Other':'#F46A25',
-            'Piper': '#2073BC'
-        }
+        fig.add_trace(
+            go.Bar(
+                x=df['block_hours_per_day'],
+                y=df['name'],
+                orientation='h',
+                width=0.5,
+                marker_color='#12436D',
+                customdata=df[['aircraft', 'cycles_per_day']],
+                hovertemplate='%{x:.1f} h<br>%{customdata[0]} aircraft<br>%{customdata[1]:.1f} flights per day',
+                name=''
+            ),
+            row=1, col=1
+        )
 
-        for manufacturer in df['manufacturer'].unique():
-            df_subset = df[df['manufacturer'] == manufacturer]
+        fig.add_trace(
+            go.Bar(
+                x=df['turnaround_min'],
+                y=df['name'],
+                orientation='h',
+                width=0.5,
+                marker_color='#28A197',
+                hovertemplate='%{x:.0f} min',
+                name=''
+            ),
+            row=1, col=2
+        )
 
-            fig.add_trace(go.Scatter(
-                x=df_subset['date'], 
-                y=df_subset['percentage'],
-                mode='lines',
-                name=manufacturer,
-                marker=dict(color=color_map.get(manufacturer, 'rgb(204, 204, 204)'))
-            ))
+        fig.update_xaxes(showgrid=True, gridcolor='rgb(204, 204, 204)', griddash='dot')
 
         fig.update_layout(
-            xaxis=dict(
-                showgrid=False,
-                showline=True,   
-                linecolor='rgb(204, 204, 204)',
-                linewidth=2,
-                tickmode='linear',
-                dtick=1,              
-                tickformat='d',
-                ticklen=5,
-                ticks='outside',
-                tickwidth=2,
-                tickcolor='rgb(204, 204, 204)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                showline=False,   
-                linecolor='rgb(204, 204, 204)',
-                linewidth=2,
-                griddash='dot',
-                gridcolor='rgb(204, 204, 204)'       
-            ),
-            legend=dict(
-                orientation="h",     
-                yanchor="bottom",
-                y=-0.25,              
-                xanchor="center",
-                x=0.5
-            ),
-            title="Percentage Share",
-            xaxis_title="Year",
-            yaxis_title="Percent",
-            template="plotly_white",
-            plot_bgcolor='white', 
-            height=500
+            title=f'Aircraft of {operator}' if operator else 'Busiest Operators',
+            plot_bgcolor='white',
+            showlegend=False,
+            height=450,
+            margin=dict(t=80)
+        )
+
+        return fig
+
+    # Hour of day x weekday traffic heatmap
+    @app.callback(
+        Output('traffic-heatmap', 'figure'),
+        Input('heatmap-dropdown', 'value'),
+        Input('place-search', 'value')
+    )
+    def update_traffic_heatmap(month, place):
+        """
+        Update the hour of day x weekday heatmap of mean flights, for all flights or 
+        for the airport selected in place-search.
+
+        Args:
+            month (str): Value from heatmap-dropdown. Either 'all' or a month string e.g. 'March 2024'.
+            place (str): Value from place-search, e.g. 'airport:EGLL'. Airlines are ignored.
+
+        Returns:
+            plotly.graph_objects.Figure: Updated heatmap figure.
+        """
+        airport = place.split(':', 1)[1] if place and place.startswith('airport:') else None
+        month_start = None if month == 'all' else pd.to_datetime(month, format='%B %Y').strftime('%Y-%m-%d')
+
+        df = get_traffic_heatmap(month_start, airport)
+
+        fig = go.Figure(
+            go.Heatmap(
+                z=df.to_numpy(),
+                x=[f'{h:02d}:00' for h in df.columns],
+                y=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                colorscale=[[0, '#FFFFFF'], [1, '#12436D']],
+                colorbar=dict(title='Flights'),
+                hovertemplate='%{y} %{x} UTC<br>%{z:.0f} flights<extra></extra>'
+            )
         )
 
-        fig.update_xaxes(
-            dtick="M6",  # show every 6 months 
-            tickformat="%b %Y"  # abbreviated month name + year (Jan 2021, Feb 2021...)
+        fig.update_layout(
+            title=f'{"Movements at " + airport if airport else "Departures"} per Hour (UTC)',
+            yaxis=dict(autorange='reversed'), # Monday at the top
+            plot_bgcolor='white',
+            height=400,
+            margin=dict(t=50)
         )
 
         return fig
-  
+
     # Emissions heatmap 
     @app.callback(
         Output('emissions-choropleth', 'figure'),
@@ -483,65 +454,25 @@ def register_callbacks(app):
 
         Args:
             year (int): Value from choropleth-dropdown-year. 
-                Either 'all' (full dataset) or a year value matching 
-                'month_string' column in the df.
+                Either 'all' (full dataset) or a year value.
             month (str): Value from choropleth-dropdown-month. 
-                Either 'all' (full dataset) or a month value matching 
-                'year' column in the df.
+                Either 'all' (full dataset) or a month name.
 
         Returns:
             plotly.graph_objects.Figure: Updated emissions choropleth figure.
         """
-    
-        df = STARTUP_QUERIES.COUNTRY_EMISSIONS_DF.copy()
-
-        if year!='all':
-            df = df[df['year']==year]
-
-        if month!='all':
-            df = df[df['month_string']==month]
-
-        df = df.groupby(['iso_alpha3']).agg({
-            'state_name': 'first',
-            'co2_qty_tonnes': 'mean'
-        }).reset_index()
+        # precomputed slice of mean emissions per country for the selected year and month
+        df = get_emissions_slice(STARTUP_QUERIES.EMISSIONS_CUBE, year, month)
 
         # get top 5 emitters for date range
-        df = df.sort_values(by='co2_qty_tonnes',ascending=False)
-        x = df['co2_qty_tonnes'].to_list()[:5]
-        y = df['state_name'].to_list()[:5]
+        top_df = get_top_emitters(STARTUP_QUERIES.EMISSIONS_CUBE, year, month, n=5)
+        x = top_df['co2_qty_tonnes'].to_list()
+        y = top_df['state_name'].to_list()
         x.reverse()
         y.reverse()
 
-        fig = go.Figure(go.Choropleth(
-            locations=df['iso_alpha3'],           
-            z=df['co2_qty_tonnes'],              
-            text=df['state_name'],                
-            colorscale='Blues',
-            marker_line_color='white',           
-            marker_line_width=1.5,                
-            colorbar_title='CO₂ (tonnes)'
-        ))
-
-        fig.update_layout(
-            title='CO₂ Emissions by Country',
-            geo=dict(
-                showframe=False,
-                showcoastlines=True,
-                showcountries=True,
-                projection_type='natural earth',
-                bgcolor='white',  
-                center=dict(lat=52, lon=10),
-                projection_scale=2.5
-            ),
-            height=600,
-            margin=dict(l=0, r=0, t=50, b=0),
-            font=dict(
-                family='Open Sans, sans-serif',
-                size=14,
-                color='#2a3f5f'
-            )
-        )
+        # country outlines from the cached assets/europe.geojson, referenced by URL
+        fig = emissions_choropleth(df, get_europe_geometry())
 
         # fig = make_subplots(
         #     rows=1, cols=2,
@@ -581,6 +512,89 @@ def register_callbacks(app):
         return fig
     
 
+    # Flight track map and altitude profile
+    @app.callback(
+        Output('flight-track-map', 'figure'),
+        Output('flight-altitude-graph', 'figure'),
+        Output('flight-track-message', 'children'),
+        Input('flight-id-input', 'value')
+    )
+    def update_flight_track(ec_id):
+        """
+        Update flight track map and altitude graph from the trajectory store.
+
+        Args:
+            ec_id (str): Value from flight-id-input. Eurocontrol flight id (``flight_list.ec_id``).
+
+        Returns:
+            tuple: Track map figure, altitude figure and status message.
+        """
+        track_fig = go.Figure()
+        altitude_fig = go.Figure()
+
+        track = TRAJECTORY_STORE.get_track(ec_id.strip()) if ec_id else None
+
+        if track is not None:
+            times = pd.to_datetime(track['time'], unit='s')
+
+            track_fig.add_trace(
+                go.Scattergeo(
+                    lat=track['lat'],
+                    lon=track['lon'],
+                    mode='lines+markers',
+                    line=dict(color='#12436D', width=2),
+                    marker=dict(size=4, color='#12436D'),
+                    text=times.strftime('%d %b %Y %H:%M'),
+                    name=''
+                )
+            )
+
+            altitude_fig.add_trace(
+                go.Scatter(
+                    x=times,
+                    y=track['alt'],
+                    mode='lines',
+                    line=dict(color='#12436D'),
+                    name=''
+                )
+            )
+
+        track_fig.update_layout(
+            geo=dict(
+                showframe=False,
+                showcoastlines=True,
+                showcountries=True,
+                projection_type='natural earth',
+                bgcolor='white',
+                fitbounds='locations' if track is not None else False,
+                center=dict(lat=52, lon=10),
+                projection_scale=2.5
+            ),
+            height=500,
+            margin=dict(l=0, r=0, t=30, b=0)
+        )
+
+        altitude_fig.update_layout(
+            title='Altitude',
+            xaxis_title='Time',
+            yaxis_title='Altitude (ft)',
+            template='plotly_white',
+            plot_bgcolor='white',
+            height=300
+        )
+
+        if not ec_id:
+            message = 'Enter a flight id to show its track.'
+        elif track is None:
+            message = f'No track found for {ec_id}.'
+        else:
+            # airports nearest the first and last positions (within 50 km)
+            ends = get_airport_index().nearest_icao(track['lat'][[0, -1]], track['lon'][[0, -1]], max_km=50)
+            route = ' to '.join(code or 'unknown' for code in ends)
+            message = f'{len(track["time"])} positions, {route}.'
+
+        return track_fig, altitude_fig, message
+
     # @app.callback(
     #     Output(), 
     #     Input()
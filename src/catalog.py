@@ -0,0 +1,98 @@
+"""
+src/catalog.py
+
+Dropdown options from ``data_catalog``, the months available in each dataset (maintained by
+``setup/catalog.py`` during ingestion).
+
+The catalog is cached in the app process and re-read after ``CATALOG_TTL`` seconds, so newly
+ingested months appear in the dropdowns without restarting the app. Touching ``CACHE_STAMP``
+(done by the update orchestrator, ``setup/data_update.py``) makes the next read reload it straight away.
+The ``STARTUP_QUERIES`` frames are reloaded on the same stamp, or when the catalog changes, so a listed month
+is also in the cached frames (``src/queries.py``).
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import time
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+
+# seconds before the cached catalog is re-read (CATALOG_TTL in .env)
+CATALOG_TTL = int(os.getenv('CATALOG_TTL', 300))
+
+# file touched after data updates to invalidate the cached catalog (CACHE_STAMP in .env)
+CACHE_STAMP = Path(os.getenv(
+    'CACHE_STAMP',
+    Path(__file__).resolve().parent.parent / 'setup' / 'data' / 'cache_stamp'
+))
+
+_cache = {'catalog': None, 'loaded_at': 0.0}
+
+def get_catalog() -> pd.DataFrame:
+    """
+    Returns ``data_catalog``, re-reading it if the cached copy is older than ``CATALOG_TTL`` or ``CACHE_STAMP``.
+
+    Returns:
+        pd.DataFrame: ``dataset`` and ``month`` (datetime) columns, ordered by month.
+    """
+    stamp = CACHE_STAMP.stat().st_mtime if CACHE_STAMP.exists() else 0.0
+    loaded_at = _cache['loaded_at']
+
+    if _cache['catalog'] is None or time.time() - loaded_at > CATALOG_TTL or stamp > loaded_at:
+        query = text("""
+            SELECT dataset, month
+            FROM data_catalog
+            ORDER BY month;
+        """)
+        df = pd.read_sql(query, engine)
+        df['month'] = pd.to_datetime(df['month'])
+
+        if df.empty:
+            logger.warning("data_catalog is empty, run setup.catalog.rebuild_catalog()")
+
+        _cache.update(catalog=df, loaded_at=time.time())
+
+    return _cache['catalog']
+
+def get_months(dataset: str) -> pd.Series:
+    """
+    Months available in a dataset.
+
+    Args:
+        dataset (str): ``flight_list`` or ``emissions``.
+
+    Returns:
+        pd.Series: First day of each month (datetime), ascending.
+    """
+    df = get_catalog()
+    return df.loc[df['dataset'] == dataset, 'month']
+
+def flight_month_options() -> list:
+    """
+    Month strings (e.g. 'March 2024') with flight data, ascending.
+    """
+    return get_months('flight_list').dt.strftime('%B %Y').to_list()
+
+def flight_year_options() -> list:
+    """
+    Years with flight data, ascending.
+    """
+    return sorted(get_months('flight_list').dt.year.unique().tolist())
+
+def emissions_year_options() -> list:
+    """
+    Years with emissions data, ascending.
+    """
+    return sorted(get_months('emissions').dt.year.unique().tolist())
+
+def emissions_month_options() -> list:
+    """
+    Month names with emissions data in any year, January first.
+    """
+    months = sorted(get_months('emissions').dt.month.unique().tolist())
+    return [pd.Timestamp(2000, m, 1).strftime('%B') for m in months]
@@ -0,0 +1,127 @@
+"""
+src/choropleth.py
+
+Emissions choropleth figure, drawn on the Europe country outlines in ``assets/europe.geojson``
+(built by ``setup/europe_geometry.py``).
+
+The figure references the geometry by URL instead of embedding it, so the browser downloads the
+file once and caches it. The URL carries the file's modification time, so a rebuilt file gets a
+new URL. The URL is built with ``dash.get_asset_url``, so it follows the app's ``requests_pathname_prefix``
+when it's served under a path. The map's base layers are hidden, so plotly doesn't load its world topojson either.
+If the file hasn't been built (or ``CHOROPLETH_GEOMETRY=world``), the figure falls back to
+plotly's world map zoomed to Europe.
+
+Compare figure payloads and first render times with ``python -m benchmarks.choropleth_benchmark``.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import json
+from functools import cache
+from pathlib import Path
+import pandas as pd
+import plotly.graph_objects as go
+from dash import get_asset_url
+
+GEOJSON_PATH = Path(__file__).resolve().parent.parent / 'assets' / 'europe.geojson'
+
+# 'europe' (bundled geometry) or 'world' (plotly's world map) (CHOROPLETH_GEOMETRY in .env)
+CHOROPLETH_GEOMETRY = os.getenv('CHOROPLETH_GEOMETRY', 'europe')
+
+def geojson_url() -> str:
+    """
+    URL of the geometry asset under the app's path prefix, or ``/assets/europe.geojson`` outside an app (benchmarks).
+    """
+    try:
+        return get_asset_url(GEOJSON_PATH.name)
+    except AttributeError: # no Dash app created yet, so no asset config
+        return f'/assets/{GEOJSON_PATH.name}'
+
+@cache
+def _read_geometry(mtime: float) -> dict:
+    features = json.loads(GEOJSON_PATH.read_text())['features']
+    return {
+        'url': f'{geojson_url()}?v={int(mtime)}',
+        'ids': [feature['id'] for feature in features]
+    }
+
+def get_europe_geometry() -> dict:
+    """
+    URL and feature ids of the bundled Europe geometry, or None if it isn't used.
+
+    Returns:
+        dict | None: ``url`` (versioned asset URL) and ``ids`` (ISO alpha-3 code of each country).
+    """
+    if CHOROPLETH_GEOMETRY != 'europe' or not GEOJSON_PATH.exists():
+        return None
+    return _read_geometry(GEOJSON_PATH.stat().st_mtime)
+
+def emissions_choropleth(df: pd.DataFrame, geometry: dict = None) -> go.Figure:
+    """
+    Choropleth of emissions per country.
+
+    Args:
+        df (pd.DataFrame): ``iso_alpha3``, ``state_name`` and ``co2_qty_tonnes`` per country.
+        geometry (dict, optional): From ``get_europe_geometry``. Defaults to plotly's world map.
+
+    Returns:
+        plotly.graph_objects.Figure: Emissions choropleth figure.
+    """
+    choropleth = dict(
+        locations=df['iso_alpha3'],
+        z=df['co2_qty_tonnes'],
+        text=df['state_name'],
+        colorscale='Blues',
+        marker_line_color='white',
+        marker_line_width=1.5,
+        colorbar_title='CO₂ (tonnes)'
+    )
+
+    if geometry:
+        # countries without data drawn in grey, so the map isn't cut off at the data's borders
+        background = sorted(set(geometry['ids']) - set(df['iso_alpha3']))
+        fig = go.Figure([
+            go.Choropleth(
+                geojson=geometry['url'],
+                featureidkey='id',
+                locations=background,
+                z=[0] * len(background),
+                colorscale=[[0, '#EEEEEE'], [1, '#EEEEEE']],
+                showscale=False,
+                marker_line_color='white',
+                marker_line_width=1,
+                hoverinfo='skip'
+            ),
+            go.Choropleth(geojson=geometry['url'], featureidkey='id', **choropleth)
+        ])
+        geo = dict(
+            visible=False, # no base layers: only the bundled geometry is drawn
+            projection_type='natural earth',
+            fitbounds='geojson'
+        )
+    else:
+        fig = go.Figure(go.Choropleth(**choropleth))
+        geo = dict(
+            showframe=False,
+            showcoastlines=True,
+            showcountries=True,
+            projection_type='natural earth',
+            bgcolor='white',
+            center=dict(lat=52, lon=10),
+            projection_scale=2.5
+        )
+
+    fig.update_layout(
+        title='CO₂ Emissions by Country',
+        geo=geo,
+        height=600,
+        margin=dict(l=0, r=0, t=50, b=0),
+        font=dict(
+            family='Open Sans, sans-serif',
+            size=14,
+            color='#2a3f5f'
+        )
+    )
+    return fig
@@ -0,0 +1,95 @@
+"""
+src/classification.py
+
+Regex based classification of aircraft models into manufacturers.
+
+The rules are written once here so the same CASE expression can be generated for each query
+backend's SQL dialect. ``build_manufacturer_counts`` counts flights per manufacturer for
+``manufacturer_count_summary`` (``setup/manufacturer_counts.py``).
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+from datetime import date
+
+# manufacturer: (ILIKE patterns, case-insensitive regex patterns), checked in order
+MANUFACTURER_RULES = {
+    'Boeing': (['%BOEING%'], [r'^7[2-8]\d']),
+    'Airbus': (['%AIRBUS%', '%MBB%', '%EC%'], [r'^A-?3\d', r'^A2\d', r'^A1\d']),
+    'Embraer': (['%EMBRAER%', '%EMB%', '%ERJ%', '%PHENOM%'], [r'^E\d']),
+    'Bombardier': (['%BOMBARDIER%', '%CRJ%', '%CHALLENGER%', '%DHC%', '%BD%', '%GLOBAL EXPRESS%'], []),
+    'ATR': (['%ATR%'], []),
+    'Cessna': (['%CESSNA%', '%CITATION%'], [r'^C-?\d{3}']),
+    'Piper': (['%PIPER%', 'PA-%'], []),
+    'Ground Support Equipment (GSE)': ([
+        '%GROUND VEHICLE%', '%MAINTAINANCE%', '%AIRPORT%FIRE%', '%FIRE%RESCUE%', 
+        '%FIRE%DEP%', 'FIRE%ENGINE%', '%SNOW AND CLEANING%'
+    ], [])
+}
+
+def regex_match(column: str, pattern: str, dialect: str) -> str:
+    """
+    Case-insensitive regex match condition in the given SQL dialect.
+
+    Args:
+        column (str): Column name.
+        pattern (str): Regex pattern.
+        dialect (str): ``postgres`` or ``duckdb``.
+
+    Returns:
+        str: SQL condition.
+    """
+    if dialect == 'duckdb':
+        return f"regexp_matches({column}, '{pattern}', 'i')"
+    return f"{column} ~* '{pattern}'"
+
+def manufacturer_case(column: str = 'model', dialect: str = 'postgres') -> str:
+    """
+    SQL CASE expression classifying an aircraft model column into a manufacturer.
+
+    Args:
+        column (str): Aircraft model column. Defaults to 'model'.
+        dialect (str): ``postgres`` or ``duckdb``. Defaults to 'postgres'.
+
+    Returns:
+        str: SQL CASE expression.
+    """
+    whens = []
+    for manufacturer, (ilike_patterns, regex_patterns) in MANUFACTURER_RULES.items():
+        conditions = [f"{column} ILIKE '{p}'" for p in ilike_patterns]
+        conditions += [regex_match(column, p, dialect) for p in regex_patterns]
+        whens.append(f"WHEN {' OR '.join(conditions)} THEN '{manufacturer}'")
+
+    whens.append(f"WHEN {column} IS NULL THEN 'Not recorded'")
+
+    return "CASE " + " ".join(whens) + " ELSE 'Other' END"
+
+def build_manufacturer_counts(backend, years: list = None):
+    """
+    Builds the ``manufacturer_count_summary`` rows: number of flights per year, month and manufacturer.
+
+    Args:
+        backend (PostgresBackend | DuckDBBackend | TieredBackend): Query backend.
+        years (list, optional): Only count these years. Defaults to every year.
+
+    Returns:
+        pa.Table: Columns ``count``, ``year``, ``month``, ``manufacturer``.
+    """
+    where = ''
+    if years:
+        # date ranges rather than DATE_PART, so filters on dof reach PostgreSQL and the archive partitions
+        ranges = [f"(dof >= DATE '{date(y, 1, 1)}' AND dof < DATE '{date(y + 1, 1, 1)}')" for y in sorted(set(map(int, years)))]
+        where = f"WHERE {' OR '.join(ranges)}"
+
+    query = f"""
+        SELECT 
+            COUNT(*) AS count,
+            CAST(DATE_PART('year', dof) AS INTEGER) AS year,
+            CAST(DATE_PART('month', dof) AS INTEGER) AS month,
+            {manufacturer_case('model', backend.dialect)} AS manufacturer
+        FROM flight_list
+        {where}
+        GROUP BY 2, 3, 4;
+    """
+    return backend.query(query)
@@ -0,0 +1,78 @@
+"""
+src/downsampling.py
+
+Largest-Triangle-Three-Buckets (LTTB) downsampling for line graphs.
+
+LTTB keeps the first and last points and, for each bucket in between, the point forming the
+largest triangle with the previously kept point and the average of the next bucket. Peaks and
+troughs survive, so a decimated series looks like the full series at a fraction of the points.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# maximum points per line graph series (LINE_POINT_BUDGET in .env)
+LINE_POINT_BUDGET = int(os.getenv('LINE_POINT_BUDGET', 500))
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Selects ``n_out`` points of a series with LTTB.
+
+    Args:
+        x (np.ndarray): Sorted numeric x values.
+        y (np.ndarray): y values.
+        n_out (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Indices of the kept points, in order.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        if i == n_out - 3: # last bucket: next "bucket" is the last point
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def downsample_series(df: pd.DataFrame, x: str, y: str, by: str, n_out: int = LINE_POINT_BUDGET) -> pd.DataFrame:
+    """
+    Downsamples each series of a long-format dataframe with LTTB.
+
+    Args:
+        df (pd.DataFrame): Rows sorted by ``x`` within each series.
+        x (str): Date column (dates or 'YYYY-MM-DD' strings).
+        y (str): Value column.
+        by (str): Series column (e.g. 'category').
+        n_out (int): Maximum points per series. Defaults to ``LINE_POINT_BUDGET``.
+
+    Returns:
+        pd.DataFrame: Kept rows.
+    """
+    parts = []
+    for _, series in df.groupby(by, sort=False):
+        x_values = series[x].to_numpy().astype('datetime64[D]').astype(np.float64)
+        y_values = series[y].to_numpy(dtype=np.float64, na_value=0)
+        parts.append(series.iloc[lttb(x_values, y_values, n_out)])
+
+    return pd.concat(parts) if parts else df
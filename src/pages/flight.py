@@ -0,0 +1,32 @@
+"""
+src/pages/flight.py
+
+Flight detail page in app. Shows a single flight's track from the trajectory store.
+
+created: 19/10/26
+"""
+
+import dash
+from dash import html, dcc
+
+dash.register_page(__name__, path='/flight', name='Flight', order=4)
+
+layout = html.Div([
+    html.Div([
+        html.H5("Flight Track",
+                style={'font-weight': 'bold'}
+        ),
+
+        dcc.Input(
+            id='flight-id-input',
+            type='text',
+            placeholder='Flight id',
+            debounce=True,
+            className='my-dropdown'
+        ),
+
+        html.P(id='flight-track-message'),
+        dcc.Graph(id='flight-track-map'),
+        dcc.Graph(id='flight-altitude-graph')
+    ], className="my-container")
+])
@@ -4,81 +4,152 @@ src/pages/home.py
 App home page with html layout
 
 created: 19/5/25
-modified: 20/8/25
+modified: 19/10/26
 """
 
 import dash
 from dash import html, dcc
-from src.queries import get_flight_counts_by_day, get_months_unique, get_country_emissions, get_year_emissions, get_month_emissions, STARTUP_QUERIES
+from src.catalog import flight_month_options, flight_year_options, emissions_year_options, emissions_month_options
+from src.stores import flight_count_sums_store, flight_counts_store, manufacturer_percent_store, figure_templates_store, get_daily_counts
 import dash_bootstrap_components as dbc
 
 dash.register_page(__name__, path='/', name='Home', order=1)
 
-layout = html.Div([
-       # Flights overview container
-    html.Div([
-        html.H5("Flight History",
-                style={'font-weight': 'bold'}
-        ),
-
-        dcc.Dropdown(
-            id='flight-count-dropdown',
-            options=[{"label": "All data", "value": "all"}] + [{"label": m, "value": m} for m in get_months_unique()],
-            value="all",
-            clearable=False,
-            className='my-dropdown'
-        ),
-
-        dcc.Graph(id="card"),
-        dcc.Graph(id='flight-count-graph')
-    ], className="my-container"),
-
-    # Airlines + manufacturers container
-    html.Div([
-        html.H5('Airlines and Aircraft',
-                style={'font-weight': 'bold'}
-        ),
-
-        dcc.Dropdown(
-            id='airlines-dropdown',
-            options=[{"label": "All years", "value": "all"}] + [{"label": y, "value": y} for y in sorted(STARTUP_QUERIES.TOP_AIRLINES_DF['year'].unique())],
-            value='all',
-            clearable=False,
-            className='my-dropdown'
-        ),
-
-        dcc.Graph(id='airlines-bar-graph'),
-        dcc.Graph(id='manufacturer-percent-graph')
-    ], className="my-container"),
-
-    # Emissions container
-    html.Div([
-        html.H5('Flight Emissions',
-                style={'font-weight': 'bold'}
-        ),
+def layout():
+    """
+    Home page layout. Built on each page load so dropdown options follow ``data_catalog``.
+    """
+    daily_counts = get_daily_counts()
 
+    return html.Div([
+        # Datasets for clientside callbacks, sent once with the page
+        dcc.Store(id='flight-count-sums-store', data=flight_count_sums_store()),
+        dcc.Store(id='flight-counts-store', data=flight_counts_store()),
+        dcc.Store(id='flight-counts-window-store'),
+        dcc.Store(id='manufacturer-percent-store', data=manufacturer_percent_store()),
+        dcc.Store(id='figure-templates-store', data=figure_templates_store()),
+
+        # Type-ahead airport and airline search (src/search.py), options filled by update_place_search_options
         html.Div([
-            html.Div([
-                dcc.Dropdown(
-                    id='choropleth-dropdown-year',
-                    options=[{"label": "All years", "value": "all"}] + [{"label": y, "value": y} for y in get_year_emissions()],
-                    value="all",
-                    clearable=False,
-                    className='my-dropdown'
-                )
-            ], className="dropdown-container"),
+            dcc.Dropdown(
+                id='place-search',
+                placeholder='Search airports and airlines',
+                searchable=True,
+                className='my-dropdown'
+            )
+        ], className="my-container"),
+
+           # Flights overview container
+        html.Div([
+            html.H5("Flight History",
+                    style={'font-weight': 'bold'}
+            ),
+
+            dcc.Dropdown(
+                id='flight-count-dropdown',
+                options=[{"label": "All data", "value": "all"}] + [{"label": m, "value": m} for m in flight_month_options()],
+                value="all",
+                clearable=False,
+                className='my-dropdown'
+            ),
+
+            # set from the dropdown, or any range; cards compare with the same range a year earlier
+            dcc.DatePickerRange(
+                id='flight-count-date-range',
+                min_date_allowed=str(daily_counts.first_day),
+                max_date_allowed=str(daily_counts.last_day),
+                start_date=str(daily_counts.first_day),
+                end_date=str(daily_counts.last_day),
+                display_format='D MMM YYYY',
+                className='my-date-range'
+            ),
+
+            dcc.Graph(id="card"),
+            dcc.Graph(id='flight-count-graph')
+        ], className="my-container"),
+
+        # Airlines + manufacturers container
+        html.Div([
+            html.H5('Airlines and Aircraft',
+                    style={'font-weight': 'bold'}
+            ),
+
+            dcc.Dropdown(
+                id='airlines-dropdown',
+                options=[{"label": "All years", "value": "all"}] + [{"label": y, "value": y} for y in flight_year_options()],
+                value='all',
+                clearable=False,
+                className='my-dropdown'
+            ),
+
+            dcc.Graph(id='airlines-bar-graph'),
+            dcc.Graph(id='manufacturer-percent-graph')
+        ], className="my-container"),
+
+        # Fleet utilization container
+        html.Div([
+            html.H5('Fleet Utilization',
+                    style={'font-weight': 'bold'}
+            ),
+
+            # busiest operators, or the aircraft of the airline selected in place-search
+            dcc.Dropdown(
+                id='fleet-dropdown',
+                options=[{"label": "All data", "value": "all"}] + [{"label": m, "value": m} for m in flight_month_options()],
+                value='all',
+                clearable=False,
+                className='my-dropdown'
+            ),
+
+            dcc.Graph(id='fleet-utilization-graph')
+        ], className="my-container"),
+
+        # Peak hours container
+        html.Div([
+            html.H5('Peak Hours',
+                    style={'font-weight': 'bold'}
+            ),
+
+            # all flights, or departures and arrivals at the airport selected in place-search
+            dcc.Dropdown(
+                id='heatmap-dropdown',
+                options=[{"label": "All data", "value": "all"}] + [{"label": m, "value": m} for m in flight_month_options()],
+                value='all',
+                clearable=False,
+                className='my-dropdown'
+            ),
+
+            dcc.Graph(id='traffic-heatmap')
+        ], className="my-container"),
+
+        # Emissions container
+        html.Div([
+            html.H5('Flight Emissions',
+                    style={'font-weight': 'bold'}
+            ),
 
             html.Div([
-                dcc.Dropdown(
-                    id='choropleth-dropdown-month',
-                    options=[{"label": "All months", "value": "all"}] + [{"label": m, "value": m} for m in get_month_emissions()],
-                    value="all",
-                    clearable=False,
-                    className='my-dropdown'
-                )
-            ], className="dropdown-container")
-        ]),
-
-        dcc.Graph(id='emissions-choropleth')
-    ], className="my-container")
-])
+                html.Div([
+                    dcc.Dropdown(
+                        id='choropleth-dropdown-year',
+                        options=[{"label": "All years", "value": "all"}] + [{"label": y, "value": y} for y in emissions_year_options()],
+                        value="all",
+                        clearable=False,
+                        className='my-dropdown'
+                    )
+                ], className="dropdown-container"),
+
+                html.Div([
+                    dcc.Dropdown(
+                        id='choropleth-dropdown-month',
+                        options=[{"label": "All months", "value": "all"}] + [{"label": m, "value": m} for m in emissions_month_options()],
+                        value="all",
+                        clearable=False,
+                        className='my-dropdown'
+                    )
+                ], className="dropdown-container")
+            ]),
+
+            dcc.Graph(id='emissions-choropleth')
+        ], className="my-container")
+    ])
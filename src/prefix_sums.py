@@ -0,0 +1,93 @@
+"""
+src/prefix_sums.py
+
+Daily flight counts per category held as cumulative sums, so the total for any date range is
+two lookups and a subtraction, however long the range.
+
+Row ``i`` of the cumulative sum array holds the counts of every day before day offset ``i``
+(days since the first day), so the total from day ``a`` to day ``b`` inclusive is
+``cumsum[b + 1] - cumsum[a]``.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import numpy as np
+import pandas as pd
+
+class DailyCounts():
+    """
+    Cumulative daily counts per category.
+
+    Args:
+        df (pd.DataFrame): Long-format daily counts with date, category and count columns.
+        date (str): Date column. Defaults to 'dof'.
+        category (str): Category column. Defaults to 'category'.
+        count (str): Count column. Defaults to 'count'.
+    """
+    def __init__(self, df: pd.DataFrame, date: str = 'dof', category: str = 'category', count: str = 'count'):
+        days = df[date].to_numpy().astype('datetime64[D]')
+        self.first_day = days.min()
+        self.last_day = days.max()
+        self.categories = [str(c) for c in pd.unique(df[category])]
+
+        n_days = int((self.last_day - self.first_day).astype(int)) + 1
+        offsets = (days - self.first_day).astype(int)
+        columns = pd.Categorical(df[category].astype(str), categories=self.categories).codes
+
+        daily = np.zeros((n_days, len(self.categories)), dtype=np.int64)
+        np.add.at(daily, (offsets, columns), df[count].to_numpy(dtype=np.int64)) # days without rows stay 0
+
+        self.cumsum = np.zeros((n_days + 1, len(self.categories)), dtype=np.int64)
+        np.cumsum(daily, axis=0, out=self.cumsum[1:])
+
+    def day_offset(self, day) -> int:
+        """
+        Days from the first day of the data to a date, negative before it.
+
+        Args:
+            day (str | date): Date ('YYYY-MM-DD', later characters ignored).
+        """
+        day = np.datetime64(str(day)[:10], 'D')
+        return int((day - self.first_day).astype(int))
+
+    def offset(self, day) -> int:
+        """
+        Day offset of a date, clipped to the data.
+
+        Args:
+            day (str | date): Date ('YYYY-MM-DD', later characters ignored).
+        """
+        return int(np.clip(self.day_offset(day), 0, len(self.cumsum) - 2))
+
+    def totals(self, start, end) -> dict:
+        """
+        Total counts per category from ``start`` to ``end`` inclusive. An ``end`` after the data is
+        clipped to the last day, as in ``rangeTotal`` (``assets/clientside.js``).
+
+        Args:
+            start (str | date): First date.
+            end (str | date): Last date.
+
+        Returns:
+            dict | None: Category: total, or None if ``start`` is outside the data or after ``end``.
+        """
+        first = self.day_offset(start)
+        last = min(self.day_offset(end), len(self.cumsum) - 2)
+        if first < 0 or last < first:
+            return None
+        values = self.cumsum[last + 1] - self.cumsum[first]
+        return dict(zip(self.categories, values.tolist()))
+
+    def to_store(self) -> dict:
+        """
+        Cumulative sums for the clientside callbacks in ``assets/clientside.js``.
+
+        Returns:
+            dict: ``start`` and ``end`` dates ('YYYY-MM-DD') and ``cumsum``, category: list of cumulative sums.
+        """
+        return {
+            'start': str(self.first_day),
+            'end': str(self.last_day),
+            'cumsum': {category: self.cumsum[:, i].tolist() for i, category in enumerate(self.categories)}
+        }
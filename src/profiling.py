@@ -0,0 +1,283 @@
+"""
+src/profiling.py
+
+Opt-in sampling profiler for slow dashboard callbacks and ingest runs.
+
+A background thread samples the call stack of each profiled thread every ``PROFILE_INTERVAL_MS``
+(``sys._current_frames``), so the profiled code runs without tracing hooks. Each capture is written to
+``PROFILE_FOLDER`` as a speedscope file (open at https://www.speedscope.app) or as collapsed stacks
+for ``flamegraph.pl`` (``PROFILE_FORMAT``), named after the callback outputs or the source file.
+
+Callbacks (``PROFILING=true``, see ``register_profiling``):
+    - A request sent with an ``X-Profile`` header, or from a page opened with ``?profile=1``, is profiled from its start.
+    - Any other callback request still running after ``PROFILE_SLOW_MS`` is sampled from then on, so
+      slow requests are captured without profiling the fast ones.
+    The response of a profiled request carries the file name in an ``X-Profile-File`` header.
+
+Ingest runs (``PROFILE_INGEST=true`` or ``python -m setup.data_update --profile``): each file ingested by
+``ingest_folder`` is profiled.
+
+When profiling is disabled no hooks are installed and no sampler thread is started.
+
+created: 19/10/26
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from loguru import logger
+
+# profile callback requests (PROFILING in .env)
+PROFILING = os.getenv('PROFILING', 'false').lower() == 'true'
+
+# profile each file ingested by ingest_folder (PROFILE_INGEST in .env)
+PROFILE_INGEST = os.getenv('PROFILE_INGEST', 'false').lower() == 'true'
+
+# callback requests running longer than this are captured. 0 only captures requested profiles (PROFILE_SLOW_MS in .env)
+PROFILE_SLOW_MS = int(os.getenv('PROFILE_SLOW_MS', 1000))
+
+# milliseconds between stack samples (PROFILE_INTERVAL_MS in .env)
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+
+# 'speedscope' (json) or 'collapsed' (flamegraph.pl input) (PROFILE_FORMAT in .env)
+PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'speedscope')
+
+PROFILE_FOLDER = Path(os.getenv(
+    'PROFILE_FOLDER',
+    Path(__file__).resolve().parent.parent / 'setup' / 'data' / 'profiles'
+))
+
+class Capture():
+    """
+    Stack samples of one thread.
+
+    Args:
+        tag (str): Name of the capture, used in the file name.
+        thread_id (int): Identifier of the profiled thread.
+        delay_s (float): Seconds before sampling starts. 0 samples from the start.
+    """
+    def __init__(self, tag: str, thread_id: int, delay_s: float = 0):
+        self.tag = tag
+        self.thread_id = thread_id
+        self.start = time.perf_counter()
+        self.sample_from = self.start + delay_s
+        self.last_sample = self.sample_from
+        self.samples = 0
+        self.stacks = Counter() # stack (tuple of frames, outermost first): seconds
+
+class Sampler():
+    """
+    Samples the call stacks of the threads with an active capture from a daemon thread. The thread is
+    started with the first capture and waits without sampling while there are none.
+
+    Args:
+        interval_ms (float): Milliseconds between samples. Defaults to ``PROFILE_INTERVAL_MS``.
+    """
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval_s = interval_ms / 1000
+        self.captures = {}
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread = None
+
+    def add(self, capture: Capture):
+        with self.lock:
+            self.captures[capture.thread_id] = capture
+            self.active.set()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+                self.thread.start()
+
+    def remove(self, thread_id: int) -> Capture | None:
+        with self.lock:
+            capture = self.captures.pop(thread_id, None)
+            if not self.captures:
+                self.active.clear()
+        return capture
+
+    def run(self):
+        own_id = threading.get_ident()
+        while True:
+            self.active.wait()
+            time.sleep(self.interval_s)
+
+            now = time.perf_counter()
+            # sampled under the lock, so a capture isn't changed after remove() has returned it
+            with self.lock:
+                captures = [c for c in self.captures.values() if now >= c.sample_from]
+                if not captures:
+                    continue
+
+                frames = sys._current_frames()
+                for capture in captures:
+                    frame = frames.get(capture.thread_id)
+                    if frame is not None and capture.thread_id != own_id:
+                        # weighted by the time since the last sample, which is longer than the interval while the GIL is held
+                        capture.stacks[stack(frame)] += now - capture.last_sample
+                        capture.last_sample = now
+                        capture.samples += 1
+                del frames
+
+SAMPLER = Sampler()
+
+def stack(frame) -> tuple:
+    """
+    Frames of a call stack as (function, file, line of definition), outermost first.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+def to_speedscope(capture: Capture) -> dict:
+    """
+    Speedscope sampled profile of a capture. Each stack is weighted by its sampled seconds.
+    """
+    frame_index = {}
+    samples = []
+    for frames in capture.stacks:
+        samples.append([frame_index.setdefault(f, len(frame_index)) for f in frames])
+
+    weights = list(capture.stacks.values())
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': [{'name': name, 'file': file, 'line': line} for name, file, line in frame_index]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': capture.tag,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }],
+        'name': capture.tag,
+        'activeProfileIndex': 0,
+        'exporter': 'europe-flights-portfolio'
+    }
+
+def to_collapsed(capture: Capture) -> str:
+    """
+    Collapsed stacks of a capture (``outer;inner milliseconds`` per line), the input of ``flamegraph.pl``.
+    """
+    lines = []
+    for frames, seconds in capture.stacks.items():
+        names = [f"{name} ({Path(file).name}:{line})".replace(';', ',') for name, file, line in frames]
+        lines.append(f"{';'.join(names)} {max(round(seconds * 1000), 1)}")
+    return '\n'.join(lines) + '\n'
+
+def write_profile(capture: Capture, folder: Path = PROFILE_FOLDER, profile_format: str = PROFILE_FORMAT) -> Path | None:
+    """
+    Writes a capture to the profile folder.
+
+    Args:
+        capture (Capture): Finished capture.
+        folder (Path): Output folder. Defaults to ``PROFILE_FOLDER``.
+        profile_format (str): ``speedscope`` or ``collapsed``. Defaults to ``PROFILE_FORMAT``.
+
+    Returns:
+        Path | None: Profile file, or None if no samples were taken.
+    """
+    if not capture.stacks:
+        return None
+
+    folder.mkdir(parents=True, exist_ok=True)
+    tag = re.sub(r'[^\w.-]+', '_', capture.tag).strip('_.')[:100]
+    name = f"{tag}_{datetime.now():%Y%m%d_%H%M%S_%f}"
+
+    if profile_format == 'collapsed':
+        path = folder / f'{name}.folded'
+        path.write_text(to_collapsed(capture))
+    else:
+        path = folder / f'{name}.speedscope.json'
+        path.write_text(json.dumps(to_speedscope(capture)))
+
+    logger.info(f"Profile of {capture.tag}: {capture.samples} samples over {time.perf_counter() - capture.start:.2f}s, written to {path}")
+    return path
+
+@contextmanager
+def profiled(tag: str, enabled: bool = True):
+    """
+    Profiles the code in a ``with`` block on the current thread. Does nothing if not enabled.
+
+    Args:
+        tag (str): Name of the capture, used in the file name.
+        enabled (bool): If False, the block runs without profiling.
+    """
+    if not enabled:
+        yield
+        return
+
+    capture = Capture(tag, threading.get_ident())
+    SAMPLER.add(capture)
+    try:
+        yield
+    finally:
+        SAMPLER.remove(capture.thread_id)
+        write_profile(capture)
+
+def profile_requested(request) -> bool:
+    """
+    Whether a request asked to be profiled: an ``X-Profile`` header, or a ``profile`` query flag on the
+    request or on the page that sent it (callback requests carry the page URL in ``Referer``).
+    """
+    if request.headers.get('X-Profile', '').lower() in ('1', 'true', 'yes'):
+        return True
+    flags = request.args.getlist('profile') + parse_qs(urlparse(request.referrer or '').query).get('profile', [])
+    return any(flag.lower() in ('1', 'true', 'yes') for flag in flags)
+
+def register_profiling(app, slow_ms: int = PROFILE_SLOW_MS):
+    """
+    Adds request hooks that profile callback requests (``_dash-update-component``) to the app's Flask server.
+    Only called when ``PROFILING`` is enabled, so other runs have no hooks.
+
+    Args:
+        app (dash.Dash): Dash app.
+        slow_ms (int): Requests running longer than this are captured. 0 only captures requested profiles.
+            Defaults to ``PROFILE_SLOW_MS``.
+    """
+    from flask import request, g
+
+    server = app.server
+
+    @server.before_request
+    def start_capture():
+        if not request.path.endswith('_dash-update-component'):
+            return
+
+        requested = profile_requested(request)
+        if not requested and not slow_ms:
+            return
+
+        body = request.get_json(silent=True) or {}
+        g.capture = Capture(f"callback_{body.get('output', 'unknown')}", threading.get_ident(), 0 if requested else slow_ms / 1000)
+        SAMPLER.add(g.capture)
+
+    @server.after_request
+    def finish_capture(response):
+        capture = g.pop('capture', None)
+        if capture is not None:
+            SAMPLER.remove(capture.thread_id)
+            path = write_profile(capture)
+            if path:
+                response.headers['X-Profile-File'] = path.name
+        return response
+
+    @server.teardown_request
+    def finish_failed_capture(exception):
+        capture = g.pop('capture', None) # request failed before after_request
+        if capture is not None:
+            SAMPLER.remove(capture.thread_id)
+            write_profile(capture)
+
+    logger.info(f"Profiling callbacks: requested with X-Profile or ?profile=1, automatically above {slow_ms} ms, written to {PROFILE_FOLDER}")
@@ -3,15 +3,29 @@ src/queries.py
 
 PostgreSQL queries used in callbacks.py
 
+Queries over ``flight_list`` run on the query backend chosen with ``QUERY_BACKEND`` (see ``src/backends.py``).
+Frames cached in ``STARTUP_QUERIES`` are cast to the column types in ``src/schemas.py``. They are
+reloaded when ``CACHE_STAMP`` is touched or ``data_catalog`` changes (``reload_startup_queries``), so they
+cover the months listed in the dropdowns.
+
 created: 19/5/25
-modified: 21/8/25
+modified: 19/10/26
 """
 
+import time
+import threading
 from sqlalchemy import text
 from src.db import engine
+from src.catalog import CACHE_STAMP, get_catalog
+from src.backends import get_backend
+from src import schemas
+from src.schemas import apply_schema, memory_report
+from loguru import logger
 import pandas as pd
 from datetime import datetime
 
+BACKEND = get_backend()
+
 def get_flight_counts_by_day():
     query = text("""
         SELECT *
@@ -20,7 +34,7 @@ def get_flight_counts_by_day():
     """)
     df = pd.read_sql(query, engine, dtype_backend="pyarrow")
     df['month_year'] = df['dof'].apply(lambda x: datetime.strptime(x, '%Y-%m-%d').strftime('%B %Y'))
-    return df
+    return apply_schema(df, schemas.FL_COUNT_BY_DAY)
 
 def get_months_unique():
     query = text("""
@@ -33,7 +47,13 @@ def get_months_unique():
     return df['month_year'].unique()
 
 def get_country_emissions():
+    # state names are unique in icao_iso, ICAO state codes aren't (LS is Switzerland and Liechtenstein)
     query = text("""
+        WITH states AS (
+            SELECT DISTINCT ON (emissions_state_name) emissions_state_name, iso_alpha3
+            FROM icao_iso
+            ORDER BY emissions_state_name, id
+        )
         SELECT 
             e.id, 
             e.year, 
@@ -41,14 +61,121 @@ def get_country_emissions():
             e.state_name, 
             e.state_code, 
             e.co2_qty_tonnes, 
-            i.iso_alpha3
+            s.iso_alpha3
         FROM emissions e
-        JOIN icao_iso i ON e.state_name = i.emissions_state_name;
+        JOIN states s ON e.state_name = s.emissions_state_name;
     """)
     df = pd.read_sql(query, engine, dtype_backend="pyarrow")
     df['month_string'] = df['month'].apply(lambda x: datetime.strptime(str(x), '%m').strftime('%B'))
+    return apply_schema(df, schemas.COUNTRY_EMISSIONS)
+
+def get_emissions_cube():
+    """
+    Precomputes mean and total CO2 emissions per country for every year/month dropdown selection.
+
+    Aggregates every (year | all) x (month | all) combination with grouping sets, keyed on 
+    an integer id for each ISO alpha-3 country. Emissions are joined to countries on the state name, as
+    ICAO state codes are shared by some countries (LS: Switzerland and Liechtenstein, LY: Serbia and Montenegro).
+
+    Returns:
+        dict: Keys are (year, month_string) tuples matching the choropleth dropdown values, 
+            with 'all' for all years or months. Values are dataframes with columns ``country_id``, 
+            ``iso_alpha3``, ``state_name``, ``co2_qty_tonnes`` (mean), ``co2_total_tonnes`` 
+            sorted by mean emissions, largest first.
+    """
+    query = text("""
+        WITH states AS (
+            SELECT DISTINCT ON (emissions_state_name) emissions_state_name, iso_alpha3
+            FROM icao_iso
+            ORDER BY emissions_state_name, id
+        ),
+        countries AS (
+            SELECT 
+                DENSE_RANK() OVER (ORDER BY iso_alpha3) AS country_id,
+                iso_alpha3,
+                MIN(emissions_state_name) AS state_name
+            FROM states
+            GROUP BY iso_alpha3
+        ),
+        country_emissions AS (
+            SELECT 
+                c.country_id,
+                e.year,
+                e.month,
+                e.co2_qty_tonnes
+            FROM emissions e
+            JOIN states s ON e.state_name = s.emissions_state_name
+            JOIN countries c ON s.iso_alpha3 = c.iso_alpha3
+        ),
+        cube AS (
+            SELECT 
+                country_id,
+                year,
+                month,
+                GROUPING(year) = 1 AS all_years,
+                GROUPING(month) = 1 AS all_months,
+                AVG(co2_qty_tonnes) AS co2_qty_tonnes,
+                SUM(co2_qty_tonnes) AS co2_total_tonnes
+            FROM country_emissions
+            GROUP BY GROUPING SETS (
+                (country_id, year, month), 
+                (country_id, year), 
+                (country_id, month), 
+                (country_id)
+            )
+        )
+        SELECT cube.*, c.iso_alpha3, c.state_name
+        FROM cube
+        JOIN countries c ON cube.country_id = c.country_id;
+    """)
+    df = pd.read_sql(query, engine)
+
+    # keys match dropdown values: year as int, month as month name, 'all' for rolled up rows
+    month_names = {m: datetime.strptime(str(m), '%m').strftime('%B') for m in range(1, 13)}
+    df['year_key'] = ['all' if all_years else int(year) for year, all_years in zip(df['year'], df['all_years'])]
+    df['month_key'] = ['all' if all_months else month_names[int(month)] for month, all_months in zip(df['month'], df['all_months'])]
+
+    columns = ['country_id', 'iso_alpha3', 'state_name', 'co2_qty_tonnes', 'co2_total_tonnes']
+    return {
+        (year, month): apply_schema(
+            group[columns].sort_values('co2_qty_tonnes', ascending=False).reset_index(drop=True),
+            schemas.EMISSIONS_CUBE
+        )
+        for (year, month), group in df.groupby(['year_key', 'month_key'], sort=False) # keys mix 'all' and ints so can't be sorted
+    }
+
+def get_emissions_slice(cube: dict, year='all', month='all'):
+    """
+    Mean and total emissions per country for a choropleth selection.
+
+    Args:
+        cube (dict): Emissions cube from ``get_emissions_cube``.
+        year (int | str): Year or 'all'. Defaults to 'all'.
+        month (str): Month name or 'all'. Defaults to 'all'.
+
+    Returns:
+        pd.DataFrame: Cube slice sorted by mean emissions. Empty if the selection has no data.
+    """
+    df = cube.get((year, month))
+    if df is None:
+        return pd.DataFrame(columns=['country_id', 'iso_alpha3', 'state_name', 'co2_qty_tonnes', 'co2_total_tonnes'])
     return df
 
+def get_top_emitters(cube: dict, year='all', month='all', n: int = 5):
+    """
+    Top emitting countries for a choropleth selection.
+
+    Args:
+        cube (dict): Emissions cube from ``get_emissions_cube``.
+        year (int | str): Year or 'all'. Defaults to 'all'.
+        month (str): Month name or 'all'. Defaults to 'all'.
+        n (int): Number of countries. Defaults to 5.
+
+    Returns:
+        pd.DataFrame: Top ``n`` countries by mean emissions.
+    """
+    return get_emissions_slice(cube, year, month).head(n) # cube slices are already sorted by emissions
+
 def get_year_emissions():
     query = text("""
         SELECT 
@@ -70,18 +197,8 @@ def get_month_emissions():
     df['month'] = df['month'].apply(lambda x: datetime.strptime(str(x), '%m').strftime('%B'))
     return df['month'].to_list()
    
-def get_counts_cards():
-    query = text("""
-        SELECT * 
-        FROM card_count_summary 
-        ORDER BY month;
-    """)
-    df = pd.read_sql(query, engine)
-    df['month_string'] = df['month'].apply(lambda x: datetime.strptime(str(x), "%Y-%m-%d %H:%M:%S%z").strftime('%B %Y')) # convert month column into string
-    return df 
-
-def get_top_airlines():
-    query = text("""
+def get_top_airlines(backend=None):
+    query = """
         SELECT 
             COUNT(fl.icao_operator) AS count, 
             a.airline as airline, 
@@ -89,23 +206,23 @@ def get_top_airlines():
         FROM flight_list fl
         LEFT JOIN airlines a ON fl.icao_operator = a.icao_operator_code
         GROUP BY airline, year;
-    """)
-    df = pd.read_sql(query, engine)
-    return df
+    """
+    df = (backend or BACKEND).query(query).to_pandas()
+    return apply_schema(df, schemas.TOP_AIRLINES)
 
-def get_top_models():
+def get_top_models(backend=None):
     # get most popular aircrafts
-    query = text("""
+    query = """
         SELECT 
-            COUNT(*), 
+            COUNT(*) AS count, 
             am.normalized_model, 
             date_part('year', fl.dof) as year
         FROM aircraft_model am
         LEFT JOIN flight_list fl on fl.model = am.raw_model 
         GROUP BY 2, 3;
-    """)
-    df = pd.read_sql(query, engine)
-    return df
+    """
+    df = (backend or BACKEND).query(query).to_pandas()
+    return apply_schema(df, schemas.TOP_MODELS)
 
 def get_manufacturer_percent():
     query = text("""
@@ -119,7 +236,7 @@ def get_manufacturer_percent():
         df['month'].astype(int).astype(str).str.zfill(2),
         format='%Y%m'
     )   
-    return df
+    return apply_schema(df, schemas.MANUFACTURER_PERCENT)
 
 def get_manufacturer_counts():
     query = text("""
@@ -135,10 +252,10 @@ def get_manufacturer_counts():
         df['month'].astype(int).astype(str).str.zfill(2),
         format='%Y%m'
     ).dt.strftime('%B %Y')    
-    return df
+    return apply_schema(df, schemas.MANUFACTURER_COUNTS)
 
-def get_top_departures():
-    query = text("""
+def get_top_departures(backend=None):
+    query = """
         WITH monthly_counts AS (
             SELECT 
                 f.adep,
@@ -168,13 +285,13 @@ def get_top_departures():
         JOIN top_airports ta ON mc.adep = ta.adep
         LEFT JOIN icao_list i ON mc.adep = i.icao
         ORDER BY mc.month, mc.departures DESC;
-    """)
-    df = pd.read_sql(query, engine)
+    """
+    df = (backend or BACKEND).query(query).to_pandas()
     return df
     
 
-def get_top_destinations():
-    query = text("""
+def get_top_destinations(backend=None):
+    query = """
         WITH monthly_counts AS (
             SELECT 
                 f.ades,
@@ -204,16 +321,299 @@ def get_top_destinations():
         JOIN top_airports ta ON mc.ades = ta.ades
         LEFT JOIN icao_list i ON mc.ades = i.icao
         ORDER BY mc.month, mc.destinations DESC;
+    """
+    df = (backend or BACKEND).query(query).to_pandas()
+    return df
+
+def get_top_routes(month: str = None, operator: str = None, n: int = 10):
+    """
+    Most flown origin-destination airport pairs from ``route_count_summary``.
+
+    Args:
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+        operator (str, optional): ICAO operator code. Uses ``route_operator_count_summary``. Defaults to all operators.
+        n (int): Number of routes. Defaults to 10.
+    """
+    source = "route_count_summary r"
+    conditions = ["(CAST(:month AS date) IS NULL OR r.month = CAST(:month AS date))"]
+
+    if operator:
+        source = "route_operator_count_summary r JOIN operator_key o ON r.operator_key = o.id"
+        conditions.append("o.icao_operator = :operator")
+
+    query = text(f"""
+        WITH top_routes AS (
+            SELECT 
+                r.adep_key,
+                r.ades_key,
+                SUM(r.count) AS count
+            FROM {source}
+            WHERE {" AND ".join(conditions)}
+            GROUP BY r.adep_key, r.ades_key
+            ORDER BY count DESC
+            LIMIT :n
+        )
+        SELECT 
+            adep.icao AS adep,
+            ades.icao AS ades,
+            t.count
+        FROM top_routes t
+        JOIN airport_key adep ON t.adep_key = adep.id
+        JOIN airport_key ades ON t.ades_key = ades.id
+        ORDER BY t.count DESC;
     """)
-    df = pd.read_sql(query, engine)
+    df = pd.read_sql(query, engine, params={'month': month, 'operator': operator, 'n': n}, dtype_backend="pyarrow")
     return df
 
+def get_route_fanout(airport: str, month: str = None):
+    """
+    Destinations flown to from an airport with number of flights, from ``route_count_summary``.
+
+    Args:
+        airport (str): ICAO code of the departure airport.
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+    """
+    query = text("""
+        SELECT 
+            ades.icao AS ades,
+            SUM(r.count) AS count
+        FROM route_count_summary r
+        JOIN airport_key adep ON r.adep_key = adep.id
+        JOIN airport_key ades ON r.ades_key = ades.id
+        WHERE adep.icao = :airport
+        AND (CAST(:month AS date) IS NULL OR r.month = CAST(:month AS date))
+        GROUP BY ades.icao
+        ORDER BY count DESC;
+    """)
+    df = pd.read_sql(query, engine, params={'airport': airport, 'month': month}, dtype_backend="pyarrow")
+    return df
+
+def get_airport_traffic(airports: list, month: str = None):
+    """
+    Departures and arrivals at each of a list of airports, from ``route_count_summary``.
+
+    Args:
+        airports (list): ICAO codes.
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+    """
+    query = text("""
+        SELECT 
+            a.icao,
+            SUM(r.count) FILTER (WHERE r.adep_key = a.id) AS departures,
+            SUM(r.count) FILTER (WHERE r.ades_key = a.id) AS arrivals
+        FROM airport_key a
+        JOIN route_count_summary r ON r.adep_key = a.id OR r.ades_key = a.id
+        WHERE a.icao = ANY(:airports)
+        AND (CAST(:month AS date) IS NULL OR r.month = CAST(:month AS date))
+        GROUP BY a.icao;
+    """)
+    df = pd.read_sql(query, engine, params={'airports': list(airports), 'month': month})
+    return df
+
+def get_fleet_utilization(month: str = None, operator: str = None, n: int = 10):
+    """
+    Average daily utilization from ``fleet_utilization_summary``: per operator (busiest ``n`` by cycles),
+    or per aircraft of one operator.
+
+    Args:
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+        operator (str, optional): ICAO operator code. Groups by aircraft of this operator. Defaults to grouping by operator.
+        n (int): Number of operators or aircraft. Defaults to 10.
+
+    Returns:
+        pd.DataFrame: ``name``, ``aircraft``, ``cycles``, ``block_hours_per_day`` (per aircraft day flown), 
+            ``cycles_per_day`` and ``turnaround_min`` (mean), busiest first.
+
+    The busiest operators over all months scan the whole table, so they are cached in ``STARTUP_QUERIES``
+    (``get_fleet_utilization_all``). Month and operator selections use the (``dof``, ``operator_key``) index.
+    """
+    group = "u.icao24" if operator else "COALESCE(a.airline, o.icao_operator)"
+
+    query = text(f"""
+        WITH airline AS (
+            SELECT DISTINCT ON (icao_operator_code) icao_operator_code, airline
+            FROM airlines
+        )
+        SELECT 
+            {group} AS name,
+            COUNT(DISTINCT u.icao24) AS aircraft,
+            SUM(u.cycles) AS cycles,
+            SUM(u.block_time_s) / 3600.0 / COUNT(*) AS block_hours_per_day,
+            SUM(u.cycles)::float / COUNT(*) AS cycles_per_day,
+            SUM(u.turnaround_s) / 60.0 / NULLIF(SUM(u.turnarounds), 0) AS turnaround_min
+        FROM fleet_utilization_summary u
+        JOIN operator_key o ON u.operator_key = o.id
+        LEFT JOIN airline a ON o.icao_operator = a.icao_operator_code
+        WHERE (CAST(:month AS date) IS NULL OR (u.dof >= CAST(:month AS date) AND u.dof < CAST(:month AS date) + INTERVAL '1 month'))
+        AND (CAST(:operator AS text) IS NULL OR o.icao_operator = :operator)
+        GROUP BY 1
+        ORDER BY cycles DESC
+        LIMIT :n;
+    """)
+    df = pd.read_sql(query, engine, params={'month': month, 'operator': operator, 'n': n})
+    return df
+
+def get_fleet_utilization_all():
+    """
+    Average daily utilization of the busiest operators over all months, cached in ``STARTUP_QUERIES``.
+    """
+    return apply_schema(get_fleet_utilization(), schemas.FLEET_UTILIZATION)
+
+def get_traffic_heatmap(month: str = None, airport: str = None):
+    """
+    Mean flights per hour of day (UTC) for each weekday, from ``hourly_traffic_summary`` 
+    or, for one airport, departures plus arrivals from ``airport_hourly_traffic_summary``.
+
+    Args:
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+        airport (str, optional): ICAO code of an airport. Defaults to all flights.
+
+    Returns:
+        pd.DataFrame: 7 x 24 frame, index weekday (1 = Monday), columns hour, values mean flights per day.
+    """
+    if airport:
+        source = """
+            SELECT t.dof, t.hour, t.count
+            FROM airport_hourly_traffic_summary t
+            JOIN airport_key a ON t.airport_key = a.id
+            WHERE a.icao = :airport
+        """
+    else:
+        source = "SELECT dof, hour, count FROM hourly_traffic_summary WHERE TRUE"
+
+    query = text(f"""
+        WITH traffic AS (
+            {source}
+            AND (CAST(:month AS date) IS NULL OR (dof >= CAST(:month AS date) AND dof < CAST(:month AS date) + INTERVAL '1 month'))
+        ),
+        days AS (
+            SELECT EXTRACT(ISODOW FROM dof)::int AS weekday, COUNT(DISTINCT dof) AS n_days
+            FROM hourly_traffic_summary
+            WHERE (CAST(:month AS date) IS NULL OR (dof >= CAST(:month AS date) AND dof < CAST(:month AS date) + INTERVAL '1 month'))
+            GROUP BY 1
+        )
+        SELECT 
+            EXTRACT(ISODOW FROM t.dof)::int AS weekday,
+            t.hour,
+            SUM(t.count)::float / MAX(d.n_days) AS flights
+        FROM traffic t
+        JOIN days d ON EXTRACT(ISODOW FROM t.dof)::int = d.weekday
+        GROUP BY 1, 2;
+    """)
+    df = pd.read_sql(query, engine, params={'month': month, 'airport': airport})
+
+    # days with data but no flights in an hour are 0, not missing
+    return df.pivot(index='weekday', columns='hour', values='flights').reindex(index=range(1, 8), columns=range(24)).fillna(0)
+
+def get_country_flows(month: str = None):
+    """
+    Number of flights between each pair of countries (``icao_list.country_code``), from ``route_count_summary``.
+
+    Args:
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+    """
+    query = text("""
+        WITH airport_country AS (
+            SELECT DISTINCT ON (icao) icao, country_code
+            FROM icao_list
+            WHERE icao IS NOT NULL
+        )
+        SELECT 
+            dep.country_code AS adep_country,
+            des.country_code AS ades_country,
+            SUM(r.count) AS count
+        FROM route_count_summary r
+        JOIN airport_key adep ON r.adep_key = adep.id
+        JOIN airport_key ades ON r.ades_key = ades.id
+        JOIN airport_country dep ON adep.icao = dep.icao
+        JOIN airport_country des ON ades.icao = des.icao
+        WHERE (CAST(:month AS date) IS NULL OR r.month = CAST(:month AS date))
+        GROUP BY 1, 2
+        ORDER BY count DESC;
+    """)
+    df = pd.read_sql(query, engine, params={'month': month}, dtype_backend="pyarrow")
+    return df
+
+def get_distance_band_share():
+    query = text("""
+        SELECT *,
+            (count::numeric / SUM(count) OVER (PARTITION BY month)) * 100 AS percentage,
+            distance_km / count AS avg_distance_km,
+            block_time_s::numeric / count / 60 AS avg_block_time_min
+        FROM distance_band_summary
+        WHERE band != 'unknown'
+        ORDER BY month, band;
+    """)
+    df = pd.read_sql(query, engine, dtype_backend="pyarrow")
+    return df
+
+# STARTUP_QUERIES frame: query function
+STARTUP_QUERY_FUNCTIONS = {
+    'FL_COUNT_BY_DAY_DF': get_flight_counts_by_day,
+    'COUNTRY_EMISSIONS_DF': get_country_emissions,
+    'EMISSIONS_CUBE': get_emissions_cube,
+    'TOP_AIRLINES_DF': get_top_airlines,
+    'TOP_MODEL_DF': get_top_models,
+    'MANUFACTURER_COUNTS_DF': get_manufacturer_counts,
+    'MANUFACTURER_PERCENT_DF': get_manufacturer_percent,
+    'FLEET_UTILIZATION_DF': get_fleet_utilization_all
+}
+
 class STARTUP_QUERIES():
-    FL_COUNT_BY_DAY_DF = get_flight_counts_by_day()
-    COUNTRY_EMISSIONS_DF = get_country_emissions()
-    TOP_AIRLINES_DF = get_top_airlines()
-    TOP_MODEL_DF = get_top_models()
-    MANUFACTURER_COUNTS_DF = get_manufacturer_counts()
-    MANUFACTURER_PERCENT_DF = get_manufacturer_percent()
-    CARD_COUNTS_DF = get_counts_cards()
+    """
+    Frames queried once and shared by the callbacks, one attribute per ``STARTUP_QUERY_FUNCTIONS`` entry.
+    """
+
+_startup = {'loaded_at': 0.0, 'catalog': None, 'lock': threading.Lock()}
+
+def load_startup_queries():
+    """
+    Runs the startup queries and replaces the ``STARTUP_QUERIES`` frames once all of them have finished,
+    so callbacks running meanwhile keep reading the previous frames.
+    """
+    loaded_at = time.time()
+    catalog = get_catalog()
+    frames = {name: query() for name, query in STARTUP_QUERY_FUNCTIONS.items()}
+    for name, df in frames.items():
+        setattr(STARTUP_QUERIES, name, df)
+    _startup.update(loaded_at=loaded_at, catalog=catalog)
+
+def reload_startup_queries() -> bool:
+    """
+    Reloads the ``STARTUP_QUERIES`` frames if ``CACHE_STAMP`` is newer than them (touched by ``setup/data_update.py``)
+    or ``data_catalog`` lists different months than when they were loaded. If another thread is already
+    reloading, returns without waiting for it.
+
+    Returns:
+        bool: True if the frames were reloaded.
+    """
+    def stale() -> bool:
+        stamp = CACHE_STAMP.stat().st_mtime if CACHE_STAMP.exists() else 0.0
+        return stamp > _startup['loaded_at'] or not get_catalog().equals(_startup['catalog'])
+
+    if not stale() or not _startup['lock'].acquire(blocking=False):
+        return False
+    try:
+        if not stale(): # reloaded by another thread since the check
+            return False
+        start = time.perf_counter()
+        load_startup_queries()
+        logger.info(f"Reloaded the startup query cache in {time.perf_counter() - start:.2f}s")
+        return True
+    finally:
+        _startup['lock'].release()
+
+load_startup_queries()
+
+def cache_memory_report() -> pd.DataFrame:
+    """
+    Resident memory of the frames cached in ``STARTUP_QUERIES``.
+
+    Returns:
+        pd.DataFrame: ``name``, ``rows`` and ``mb`` for each frame, with a total row.
+    """
+    frames = {name: value for name, value in vars(STARTUP_QUERIES).items() if name.isupper()}
+    return memory_report(frames)
+
+logger.info("Startup query cache\n" + cache_memory_report().to_string(index=False))
 
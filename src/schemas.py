@@ -0,0 +1,111 @@
+"""
+src/schemas.py
+
+Column types for the dataframes cached in ``STARTUP_QUERIES`` (``src/queries.py``).
+
+Without a schema, strings come back as Python objects, ``DATE_PART`` years as float64 and dates
+as strings or datetime64[ns], depending on the driver and backend. Each cached frame is cast to:
+    - Arrow-backed strings for text with many distinct values (airline, model).
+    - Categoricals for text with few distinct values (manufacturer, category, state, month names).
+    - Small integers for years, months and counts.
+    - Arrow date32 for dates.
+
+Compare memory and filter times with ``python -m benchmarks.dtype_benchmark``.
+
+created: 19/10/26
+"""
+
+import pandas as pd
+import pyarrow as pa
+
+STRING = pd.ArrowDtype(pa.string())
+DATE = pd.ArrowDtype(pa.date32())
+CATEGORY = 'category'
+
+FL_COUNT_BY_DAY = {'dof': DATE, 'category': CATEGORY, 'count': 'int32', 'month_year': CATEGORY}
+
+FLEET_UTILIZATION = {
+    'name': STRING,
+    'aircraft': 'int32',
+    'cycles': 'int32',
+    'block_hours_per_day': 'float64',
+    'cycles_per_day': 'float64',
+    'turnaround_min': 'float64'
+}
+
+COUNTRY_EMISSIONS = {
+    'id': 'int32',
+    'year': 'int16',
+    'month': 'int8',
+    'state_name': CATEGORY,
+    'state_code': CATEGORY,
+    'co2_qty_tonnes': 'float64',
+    'iso_alpha3': CATEGORY,
+    'month_string': CATEGORY
+}
+
+EMISSIONS_CUBE = {
+    'country_id': 'int16',
+    'iso_alpha3': STRING,
+    'state_name': STRING,
+    'co2_qty_tonnes': 'float64',
+    'co2_total_tonnes': 'float64'
+}
+
+# years are nullable: LEFT JOINs keep airlines and models without flights
+TOP_AIRLINES = {'count': 'int32', 'airline': STRING, 'year': 'Int16'}
+TOP_MODELS = {'count': 'int32', 'normalized_model': STRING, 'year': 'Int16'}
+
+MANUFACTURER_COUNTS = {'count': 'int32', 'year': 'int16', 'month': 'int8', 'manufacturer': CATEGORY, 'date': CATEGORY}
+MANUFACTURER_PERCENT = {
+    'count': 'int32',
+    'year': 'int16',
+    'month': 'int8',
+    'manufacturer': CATEGORY,
+    'percentage': 'float64',
+    'date': DATE
+}
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Casts dataframe columns to the types in a schema. Columns not in the schema are left unchanged.
+
+    Args:
+        df (pd.DataFrame): Query result.
+        schema (dict): Column name: dtype.
+
+    Returns:
+        pd.DataFrame: Typed dataframe.
+    """
+    types = {}
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == DATE:
+            df[col] = pd.to_datetime(df[col]).dt.tz_localize(None).dt.date # drops time and timezone
+        elif dtype in ('int8', 'int16', 'int32', 'Int16'):
+            df[col] = pd.to_numeric(df[col]) # numeric Arrow and Decimal columns
+        types[col] = dtype
+    return df.astype(types)
+
+def memory_report(frames: dict) -> pd.DataFrame:
+    """
+    Resident memory of cached dataframes.
+
+    Args:
+        frames (dict): Name: dataframe, or name: dict of dataframes (the emissions cube).
+
+    Returns:
+        pd.DataFrame: ``name``, ``rows`` and ``mb`` for each frame, with a total row.
+    """
+    rows = []
+    for name, frame in frames.items():
+        parts = frame.values() if isinstance(frame, dict) else [frame]
+        rows.append({
+            'name': name,
+            'rows': sum(len(df) for df in parts),
+            'mb': sum(df.memory_usage(deep=True).sum() for df in parts) / 1024 ** 2
+        })
+    report = pd.DataFrame(rows)
+    total = pd.DataFrame([{'name': 'total', 'rows': report['rows'].sum(), 'mb': report['mb'].sum()}])
+    return pd.concat([report, total], ignore_index=True).round({'mb': 2})
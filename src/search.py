@@ -0,0 +1,237 @@
+"""
+src/search.py
+
+Type-ahead search over airports (``icao_list``) and airlines (``airlines``), answered from an
+in-process index instead of an ``ILIKE`` query per keystroke.
+
+The index has three tiers, searched in order until there are enough matches:
+    1. Exact codes: ICAO and IATA airport codes, 3-letter airline codes.
+    2. Prefixes of codes and of each word in names, regions and telephony, with each list
+       pre-sorted so the first matches are the best ones.
+    3. Trigrams, for text in the middle of a word (queries of 3 or more characters).
+
+The index is built on first use and rebuilt when ``CACHE_STAMP`` is newer than it, so it follows
+reference table reloads by the update orchestrator (``setup/data_update.py``).
+Measure query times with ``python -m benchmarks.search_benchmark``.
+
+created: 19/10/26
+"""
+
+import re
+import time
+import unicodedata
+from collections import defaultdict
+import pandas as pd
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+from src.catalog import CACHE_STAMP
+
+# longest indexed prefix; longer query words are checked against the words of each match
+MAX_PREFIX = 8
+
+KIND_LABELS = {'airport': 'Airport', 'airline': 'Airline'}
+
+def normalize(value) -> str:
+    """
+    Upper case ASCII text for matching ('Zürich' -> 'ZURICH'). Missing values become ''.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    value = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode()
+    return value.upper()
+
+def tokenize(value) -> list:
+    """
+    Words of normalized text.
+    """
+    return re.findall(r'[A-Z0-9]+', normalize(value))
+
+def trigrams(value: str) -> set:
+    """
+    3-character substrings of normalized text, spaces included.
+    """
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+class SearchIndex():
+    """
+    Prefix and trigram index over search entries.
+
+    Args:
+        entries (pd.DataFrame): One row per entry with ``kind`` ('airport' or 'airline'), ``value``
+            (unique id, e.g. 'airport:EGLL'), ``label`` (shown in the dropdown), ``codes`` (list of
+            codes matched exactly) and ``text`` (list of searchable names).
+    """
+    def __init__(self, entries: pd.DataFrame):
+        entries = entries.sort_values(['kind', 'label'], ignore_index=True) # ties in every list sort by kind, label
+        self.kinds = entries['kind'].to_list()
+        self.values = entries['value'].to_list()
+        self.labels = entries['label'].to_list()
+        self._positions = {value: i for i, value in enumerate(self.values)}
+        self.codes = []
+        self.words = []
+        self.texts = []
+
+        self._codes = defaultdict(list)
+        self._code_prefixes = defaultdict(list)
+        self._word_prefixes = defaultdict(list)
+        self._trigrams = defaultdict(set)
+
+        for i, (codes, names) in enumerate(zip(entries['codes'], entries['text'])):
+            codes = [normalize(c) for c in codes if normalize(c)]
+            words = sorted({w for name in names for w in tokenize(name)} | set(codes))
+            joined = ' '.join(normalize(name) for name in [*codes, *names])
+
+            self.codes.append(codes)
+            self.words.append(words)
+            self.texts.append(joined)
+
+            for code in codes:
+                self._codes[code].append(i)
+            for prefix in {code[:n] for code in codes for n in range(1, min(len(code), MAX_PREFIX) + 1)}:
+                self._code_prefixes[prefix].append(i)
+            for prefix in {w[:n] for w in words for n in range(1, min(len(w), MAX_PREFIX) + 1)}:
+                self._word_prefixes[prefix].append(i)
+            for gram in trigrams(joined):
+                self._trigrams[gram].add(i)
+
+        # shorter codes first, so 'EG' lists EGLL before the longer codes it prefixes
+        for ids in self._code_prefixes.values():
+            ids.sort(key=lambda i: (min(len(c) for c in self.codes[i]), i))
+
+        self._codes = dict(self._codes)
+        self._code_prefixes = dict(self._code_prefixes)
+        self._word_prefixes = dict(self._word_prefixes)
+        self._trigrams = dict(self._trigrams)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _matches_words(self, i: int, tokens: list) -> bool:
+        # every query word is a prefix of a word of the entry
+        return all(any(w.startswith(t) for w in self.words[i]) for t in tokens)
+
+    def search(self, query: str, limit: int = 10, kind: str = None) -> list:
+        """
+        Entries matching a query, best first: exact codes, then code prefixes, then word prefixes,
+        then text containing the query.
+
+        Args:
+            query (str): Search text, e.g. 'egl', 'lhr', 'easy', 'heathrow london'.
+            limit (int): Maximum results. Defaults to 10.
+            kind (str, optional): Only return 'airport' or 'airline' entries.
+
+        Returns:
+            list: Entry positions.
+        """
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+
+        def take(ids, check=None) -> bool:
+            # append matching ids in order, True once there are enough
+            for i in ids:
+                if i in seen or (kind and self.kinds[i] != kind) or (check and not check(i)):
+                    continue
+                seen.add(i)
+                results.append(i)
+                if len(results) >= limit:
+                    return True
+            return False
+
+        if len(tokens) == 1:
+            token = tokens[0]
+            if take(self._codes.get(token, ())):
+                return results
+            if take(self._code_prefixes.get(token[:MAX_PREFIX], ()), lambda i: any(w.startswith(token) for w in self.words[i])):
+                return results
+
+        # word prefixes: walk the shortest list, check the other words against each entry
+        lists = [self._word_prefixes.get(t[:MAX_PREFIX], ()) for t in tokens]
+        if take(min(lists, key=len), lambda i: self._matches_words(i, tokens)):
+            return results
+
+        # text in the middle of a word
+        phrase = ' '.join(tokens)
+        grams = trigrams(phrase)
+        if grams:
+            sets = sorted((self._trigrams.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*sets) if sets[0] else set()
+            take(sorted(candidates), lambda i: phrase in self.texts[i])
+
+        return results
+
+    def options(self, query: str, limit: int = 10, kind: str = None) -> list:
+        """
+        Search results as ``dcc.Dropdown`` options.
+
+        Returns:
+            list: ``{'label': ..., 'value': ...}`` dictionaries, best first.
+        """
+        return [
+            {'label': f"{self.labels[i]} ({KIND_LABELS[self.kinds[i]]})", 'value': self.values[i]}
+            for i in self.search(query, limit, kind)
+        ]
+
+    def label(self, value: str) -> str:
+        """
+        Dropdown label of an entry value, or the value if it isn't indexed.
+        """
+        i = self._positions.get(value)
+        return value if i is None else f"{self.labels[i]} ({KIND_LABELS[self.kinds[i]]})"
+
+def get_search_entries() -> pd.DataFrame:
+    """
+    Search entries for every airport in ``icao_list`` and airline in ``airlines``.
+
+    Returns:
+        pd.DataFrame: ``kind``, ``value``, ``label``, ``codes`` and ``text`` columns (see ``SearchIndex``).
+    """
+    airports = pd.read_sql(text("""
+        SELECT icao, iata, airport, region_name, country_code
+        FROM icao_list
+        WHERE icao IS NOT NULL;
+    """), engine)
+    airlines = pd.read_sql(text("""
+        SELECT icao_operator_code, airline, telephony, country
+        FROM airlines
+        WHERE icao_operator_code IS NOT NULL;
+    """), engine)
+
+    airports = airports.drop_duplicates('icao')
+    airlines = airlines.drop_duplicates('icao_operator_code')
+
+    airport_entries = pd.DataFrame({
+        'kind': 'airport',
+        'value': 'airport:' + airports['icao'],
+        'label': airports['icao'] + ' ' + airports['airport'].fillna(''),
+        'codes': [[c for c in codes if isinstance(c, str)] for codes in zip(airports['icao'], airports['iata'])],
+        'text': [[n for n in names if isinstance(n, str)] for names in zip(airports['airport'], airports['region_name'], airports['country_code'])]
+    })
+    airline_entries = pd.DataFrame({
+        'kind': 'airline',
+        'value': 'airline:' + airlines['icao_operator_code'],
+        'label': airlines['icao_operator_code'] + ' ' + airlines['airline'].fillna(''),
+        'codes': [[c] for c in airlines['icao_operator_code']],
+        'text': [[n for n in names if isinstance(n, str)] for names in zip(airlines['airline'], airlines['telephony'], airlines['country'])]
+    })
+    return pd.concat([airport_entries, airline_entries], ignore_index=True)
+
+_cache = {'index': None, 'built_at': 0.0}
+
+def get_search_index() -> SearchIndex:
+    """
+    Returns the search index, rebuilding it if ``CACHE_STAMP`` is newer (reference tables reloaded).
+    """
+    stamp = CACHE_STAMP.stat().st_mtime if CACHE_STAMP.exists() else 0.0
+
+    if _cache['index'] is None or stamp > _cache['built_at']:
+        start = time.perf_counter()
+        index = SearchIndex(get_search_entries())
+        logger.info(f"Search index: {len(index)} entries built in {time.perf_counter() - start:.2f}s")
+        _cache.update(index=index, built_at=time.time())
+
+    return _cache['index']
@@ -0,0 +1,230 @@
+"""
+src/spatial.py
+
+Spatial index over the airports in ``icao_list`` for radius and nearest-airport queries, held in
+NumPy arrays in the app process.
+
+Radius queries binary search a latitude band of the airports (sorted by latitude) and measure
+great-circle distances within it. Nearest-airport lookups group points by grid cell
+(``CELL_DEG`` degrees). Each cell keeps the short list of airports that can be nearest to any point
+inside it, so each group is one (points x candidates) distance matrix. This maps millions of
+trajectory points to airports without a loop per point.
+
+A cell's candidates are the airports within ``D + 2h`` of its centre. ``D`` is the distance from the
+centre to its nearest airport and ``h`` is the distance from the centre to the cell's farthest corner.
+A point in the cell is within ``D + h`` of that airport, so its nearest airport can't be more than
+``D + 2h`` from the centre.
+
+Compare with a brute force search with ``python -m benchmarks.spatial_benchmark``.
+
+created: 19/10/26
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from loguru import logger
+from src.db import engine
+from src.catalog import CACHE_STAMP
+from src.queries import get_airport_traffic
+
+EARTH_RADIUS_KM = 6371.0088
+
+# grid cell size for nearest-airport lookups, in degrees
+CELL_DEG = 1.0
+
+# largest distance matrix computed at once (points x candidates)
+MAX_MATRIX = 4_000_000
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km between points in degrees. Arrays broadcast.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class AirportIndex():
+    """
+    Airports sorted by latitude, with radius and nearest-airport queries.
+
+    Args:
+        airports (pd.DataFrame): ``icao``, ``airport``, ``latitude`` and ``longitude`` columns.
+        cell_deg (float): Grid cell size for nearest-airport lookups. Defaults to ``CELL_DEG``.
+    """
+    def __init__(self, airports: pd.DataFrame, cell_deg: float = CELL_DEG):
+        airports = airports.dropna(subset=['latitude', 'longitude']).drop_duplicates('icao')
+        airports = airports.sort_values('latitude', ignore_index=True)
+
+        self.icao = airports['icao'].to_numpy(dtype=object)
+        self.names = airports['airport'].to_numpy(dtype=object)
+        self.lat = airports['latitude'].to_numpy(dtype=np.float64)
+        self.lon = airports['longitude'].to_numpy(dtype=np.float64)
+
+        self.cell_deg = cell_deg
+        self._n_cols = int(np.ceil(360 / cell_deg))
+        self._cells = {} # cell key: candidate airport positions, filled as cells are queried
+
+    def __len__(self) -> int:
+        return len(self.icao)
+
+    def _cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        rows = np.floor((np.clip(lats, -90, 90 - 1e-9) + 90) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.mod(lons + 180, 360)) / self.cell_deg).astype(np.int64) % self._n_cols
+        return rows * self._n_cols + cols
+
+    def _cell_candidates(self, key: int) -> np.ndarray:
+        if key not in self._cells:
+            row, col = divmod(int(key), self._n_cols)
+            south, west = row * self.cell_deg - 90, col * self.cell_deg - 180
+            north, east = min(south + self.cell_deg, 90), west + self.cell_deg
+            centre_lat, centre_lon = (south + north) / 2, (west + east) / 2
+
+            corners = haversine_km(centre_lat, centre_lon, [south, south, north, north], [west, east, west, east])
+            distances = haversine_km(centre_lat, centre_lon, self.lat, self.lon)
+            self._cells[key] = np.flatnonzero(distances <= distances.min() + 2 * corners.max() + 1e-6)
+        return self._cells[key]
+
+    def nearest(self, lats, lons, max_km: float = None) -> tuple:
+        """
+        Nearest airport to each point.
+
+        Args:
+            lats (array-like): Point latitudes in degrees.
+            lons (array-like): Point longitudes in degrees.
+            max_km (float, optional): Points farther than this from every airport get position -1.
+
+        Returns:
+            tuple: Airport positions (index into ``icao``, ``names``, ...) and distances in km, one per point.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        positions = np.full(len(lats), -1, dtype=np.int64)
+        distances = np.full(len(lats), np.nan)
+
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        if len(valid) == 0 or len(self) == 0:
+            return positions, distances
+
+        # group points by cell: one sort, then a distance matrix per occupied cell
+        keys = self._cell_keys(lats[valid], lons[valid])
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+
+        for start, end in zip(starts, ends):
+            candidates = self._cell_candidates(keys[start])
+            step = max(MAX_MATRIX // len(candidates), 1)
+            for chunk in range(start, end, step):
+                points = valid[order[chunk:min(chunk + step, end)]]
+                matrix = haversine_km(lats[points, None], lons[points, None], self.lat[candidates], self.lon[candidates])
+                best = matrix.argmin(axis=1)
+                positions[points] = candidates[best]
+                distances[points] = matrix[np.arange(len(points)), best]
+
+        if max_km is not None:
+            positions[distances > max_km] = -1
+        return positions, distances
+
+    def nearest_icao(self, lats, lons, max_km: float = None) -> np.ndarray:
+        """
+        ICAO code of the nearest airport to each point (None where there isn't one within ``max_km``).
+        """
+        positions, _ = self.nearest(lats, lons, max_km)
+        return np.where(positions >= 0, self.icao[positions], None)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """
+        Airports within a radius of a point.
+
+        Args:
+            lat (float): Latitude in degrees.
+            lon (float): Longitude in degrees.
+            radius_km (float): Radius in km.
+
+        Returns:
+            pd.DataFrame: ``icao``, ``airport``, ``latitude``, ``longitude`` and ``distance_km``, nearest first.
+        """
+        band = np.radians(1) * EARTH_RADIUS_KM # km per degree of latitude
+        first = np.searchsorted(self.lat, lat - radius_km / band, side='left')
+        last = np.searchsorted(self.lat, lat + radius_km / band, side='right')
+
+        distances = haversine_km(lat, lon, self.lat[first:last], self.lon[first:last])
+        inside = np.flatnonzero(distances <= radius_km)
+        positions = first + inside
+
+        df = pd.DataFrame({
+            'icao': self.icao[positions],
+            'airport': self.names[positions],
+            'latitude': self.lat[positions],
+            'longitude': self.lon[positions],
+            'distance_km': distances[inside]
+        })
+        return df.sort_values('distance_km', ignore_index=True)
+
+    def within_many(self, lats, lons, radius_km: float) -> pd.DataFrame:
+        """
+        Airports within a radius of each of several points.
+
+        Args:
+            lats (array-like): Point latitudes in degrees.
+            lons (array-like): Point longitudes in degrees.
+            radius_km (float): Radius in km.
+
+        Returns:
+            pd.DataFrame: ``within`` columns with a ``point`` column (position of the point in ``lats``).
+        """
+        frames = [self.within(lat, lon, radius_km).assign(point=i) for i, (lat, lon) in enumerate(zip(lats, lons))]
+        if not frames:
+            return pd.DataFrame(columns=['point', 'icao', 'airport', 'latitude', 'longitude', 'distance_km'])
+        return pd.concat(frames, ignore_index=True)[['point', 'icao', 'airport', 'latitude', 'longitude', 'distance_km']]
+
+def get_airports() -> pd.DataFrame:
+    """
+    Airports with coordinates from ``icao_list``.
+    """
+    query = text("""
+        SELECT icao, airport, latitude, longitude
+        FROM icao_list
+        WHERE icao IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+    """)
+    return pd.read_sql(query, engine)
+
+_cache = {'index': None, 'built_at': 0.0}
+
+def get_airport_index() -> AirportIndex:
+    """
+    Returns the airport index, rebuilding it if ``CACHE_STAMP`` is newer (reference tables reloaded).
+    """
+    stamp = CACHE_STAMP.stat().st_mtime if CACHE_STAMP.exists() else 0.0
+
+    if _cache['index'] is None or stamp > _cache['built_at']:
+        start = time.perf_counter()
+        index = AirportIndex(get_airports())
+        logger.info(f"Airport index: {len(index)} airports built in {time.perf_counter() - start:.2f}s")
+        _cache.update(index=index, built_at=time.time())
+
+    return _cache['index']
+
+def traffic_within(lat: float, lon: float, radius_km: float, month: str = None) -> pd.DataFrame:
+    """
+    Departures and arrivals at each airport within a radius of a point, from ``route_count_summary``.
+
+    Args:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        radius_km (float): Radius in km.
+        month (str, optional): First day of month 'YYYY-MM-DD'. Defaults to all months.
+
+    Returns:
+        pd.DataFrame: ``within`` columns with ``departures``, ``arrivals`` and ``total``, busiest first.
+    """
+    airports = get_airport_index().within(lat, lon, radius_km)
+    traffic = get_airport_traffic(airports['icao'].to_list(), month)
+
+    df = airports.merge(traffic, on='icao', how='left')
+    df[['departures', 'arrivals']] = df[['departures', 'arrivals']].fillna(0).astype('int64')
+    df['total'] = df['departures'] + df['arrivals']
+    return df.sort_values(['total', 'distance_km'], ascending=[False, True], ignore_index=True)
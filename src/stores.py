@@ -0,0 +1,128 @@
+"""
+src/stores.py
+
+Compact datasets sent to the browser once in ``dcc.Store`` components, for the clientside callbacks
+in ``assets/clientside.js``.
+
+Datasets are columnar: a list of values per column. Columns with few distinct values are
+dictionary encoded as ``{'codes': [...], 'values': [...]}``.
+
+Daily flight counts are downsampled (``src/downsampling.py``) so the payload stays the same size
+as history grows. Date ranges and zoomed windows are fetched at full resolution by
+``flight_counts_window``. The indicator cards total any date range from cumulative daily counts
+(``src/prefix_sums.py``). Stores that need computing beyond a column copy are cached, as the home page
+layout is rebuilt on each page load. The cached stores are cleared when ``STARTUP_QUERIES`` is reloaded
+(``refresh_startup_cache``).
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+from functools import cache
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from src.queries import STARTUP_QUERIES, reload_startup_queries
+from src.downsampling import downsample_series, LINE_POINT_BUDGET
+from src.schemas import DATE
+from src.prefix_sums import DailyCounts
+
+def to_columnar(df: pd.DataFrame, columns: list, encoded: list = ()) -> dict:
+    """
+    Converts dataframe columns to a columnar dictionary.
+
+    Args:
+        df (pd.DataFrame): Source dataframe.
+        columns (list): Columns to include.
+        encoded (list): Columns to dictionary encode. Defaults to none.
+
+    Returns:
+        dict: Column name: list of values (or codes and values for encoded columns). Dates are sent as 'YYYY-MM-DD' strings.
+    """
+    data = {}
+    for col in columns:
+        if df[col].dtype == DATE:
+            data[col] = df[col].astype(str).tolist()
+        elif col in encoded:
+            codes, values = pd.factorize(df[col])
+            data[col] = {'codes': codes.tolist(), 'values': values.tolist()}
+        else:
+            data[col] = df[col].tolist()
+    return data
+
+@cache
+def get_daily_counts() -> DailyCounts:
+    """
+    Cumulative daily flight counts per category (``src/prefix_sums.py``).
+    """
+    return DailyCounts(STARTUP_QUERIES.FL_COUNT_BY_DAY_DF)
+
+@cache
+def flight_count_sums_store() -> dict:
+    """
+    Cumulative daily flight counts per category, for date range totals in the indicator cards.
+    """
+    return get_daily_counts().to_store()
+
+@cache
+def flight_counts_store() -> dict:
+    """
+    Daily flight counts per category for the flight count line graph, downsampled to
+    ``LINE_POINT_BUDGET`` points per category.
+    """
+    df = downsample_series(STARTUP_QUERIES.FL_COUNT_BY_DAY_DF, 'dof', 'count', by='category')
+    return to_columnar(df, ['dof', 'category', 'count'], encoded=['category'])
+
+@cache
+def flight_count_days() -> np.ndarray:
+    """
+    ``dof`` of the daily flight counts as a datetime64[D] array, for binary searches.
+    """
+    return STARTUP_QUERIES.FL_COUNT_BY_DAY_DF['dof'].to_numpy().astype('datetime64[D]')
+
+def flight_counts_window(start: str, end: str, n_out: int = LINE_POINT_BUDGET) -> dict:
+    """
+    Daily flight counts per category between two dates. Full resolution unless the window holds
+    more than ``n_out`` days, in which case it is downsampled.
+
+    Args:
+        start (str): First date ('YYYY-MM-DD', later characters ignored).
+        end (str): Last date ('YYYY-MM-DD', later characters ignored).
+        n_out (int): Maximum points per category. Defaults to ``LINE_POINT_BUDGET``.
+
+    Returns:
+        dict: Columnar flight counts.
+    """
+    df = STARTUP_QUERIES.FL_COUNT_BY_DAY_DF
+
+    # rows are ordered by dof, so the window is a contiguous slice
+    dof = flight_count_days()
+    first = np.searchsorted(dof, np.datetime64(start[:10]), side='left')
+    last = np.searchsorted(dof, np.datetime64(end[:10]), side='right')
+
+    df = downsample_series(df.iloc[first:last], 'dof', 'count', by='category', n_out=n_out)
+    return to_columnar(df, ['dof', 'category', 'count'], encoded=['category'])
+
+def manufacturer_percent_store() -> dict:
+    """
+    Monthly manufacturer share for the manufacturer percentage line graph.
+    """
+    df = STARTUP_QUERIES.MANUFACTURER_PERCENT_DF
+    return to_columnar(df, ['year', 'manufacturer', 'percentage', 'date'], encoded=['manufacturer'])
+
+def refresh_startup_cache():
+    """
+    Reloads ``STARTUP_QUERIES`` after a data update and clears the stores computed from its frames.
+    Runs before each request of the app (``src/app.py``); checking for an update is a file stat.
+    """
+    if reload_startup_queries():
+        for store in (get_daily_counts, flight_count_sums_store, flight_counts_store, flight_count_days):
+            store.cache_clear()
+
+@cache
+def figure_templates_store() -> dict:
+    """
+    Plotly templates used by the clientside figures. Template names only resolve in Python,
+    so the template definitions are sent once.
+    """
+    return {name: pio.templates[name].to_plotly_json() for name in ['plotly', 'plotly_white']}
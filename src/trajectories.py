@@ -0,0 +1,162 @@
+"""
+src/trajectories.py
+
+Memory-mapped trajectory store for flight positions.
+
+Each 10-day ``flight_events`` file is written to its own partition folder of columnar NumPy arrays
+(``time``, ``lat``, ``lon``, ``alt``) sorted by flight, plus an index of flight ids (``flight_list.ec_id``)
+and offsets. Arrays are opened with ``mmap_mode='r'`` so fetching a flight's track is a binary search
+and a slice: the returned arrays are views onto the files and only the pages of that track are read.
+
+created: 19/10/26
+modified: 19/10/26
+"""
+
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from functools import cache
+from pathlib import Path
+from loguru import logger
+
+TRAJECTORY_FOLDER = Path(os.getenv(
+    'TRAJECTORY_FOLDER',
+    Path(__file__).resolve().parent.parent / 'setup' / 'data' / 'trajectories'
+))
+
+TRACK_COLUMNS = ['time', 'lat', 'lon', 'alt']
+
+# array types of the flight id index and track columns
+TRACK_DTYPES = {'flight': 'S1', 'time': np.int64, 'lat': np.float32, 'lon': np.float32, 'alt': np.float32}
+
+def write_partition(filename: str, folder: Path = TRAJECTORY_FOLDER) -> Path:
+    """
+    Writes the positions of a ``flight_events`` file to a trajectory store partition.
+
+    The file is read one row group at a time and only the track columns are kept, as compact NumPy arrays,
+    so the whole parquet table is never held in memory. Rows are sorted by the byte string flight id used
+    for lookups (``get_track``), then by time.
+
+    Args:
+        filename (str): Path to the ``flight_events`` parquet file.
+        folder (Path): Trajectory store folder. Defaults to ``TRAJECTORY_FOLDER``.
+
+    Returns:
+        Path: Partition folder (named after the source file).
+    """
+    partition = folder / Path(filename).stem
+    if (partition / 'offsets.npy').exists(): # offsets are written last, so the partition is complete
+        logger.info(f"SKIPPING: {partition} already exists.")
+        return partition
+
+    parquet = pq.ParquetFile(filename)
+    chunks = {name: [np.array([], dtype=dtype)] for name, dtype in TRACK_DTYPES.items()} # empty arrays, so a file without rows concatenates
+    for i in range(parquet.num_row_groups):
+        group = parquet.read_row_group(i, columns=['flight_id', 'event_time', 'latitude', 'longitude', 'altitude'])
+        group = group.filter(pc.is_valid(group['latitude'])) # events without a position aren't part of the track
+
+        chunks['flight'].append(group['flight_id'].cast('string').to_numpy(zero_copy_only=False).astype('S'))
+        chunks['time'].append(group['event_time'].cast(pa.timestamp('s'), safe=False).cast(pa.int64()).to_numpy(zero_copy_only=False))
+        chunks['lat'].append(group['latitude'].to_numpy(zero_copy_only=False).astype(np.float32))
+        chunks['lon'].append(group['longitude'].fill_null(np.nan).to_numpy(zero_copy_only=False).astype(np.float32))
+        chunks['alt'].append(group['altitude'].fill_null(np.nan).to_numpy(zero_copy_only=False).astype(np.float32))
+        del group
+
+    flight_ids = np.concatenate(chunks.pop('flight'))
+    times = np.concatenate(chunks.pop('time'))
+    order = np.lexsort((times, flight_ids)) # by flight id bytes, then time
+    flight_ids = flight_ids[order]
+    starts = np.flatnonzero(np.r_[len(flight_ids) > 0, flight_ids[1:] != flight_ids[:-1]]) # first row of each flight
+
+    partition.mkdir(parents=True, exist_ok=True)
+    np.save(partition / 'time.npy', times[order])
+    del times
+    for name, parts in chunks.items():
+        np.save(partition / f'{name}.npy', np.concatenate(parts)[order])
+
+    np.save(partition / 'flights.npy', flight_ids[starts])
+    np.save(partition / 'offsets.npy', np.append(starts, len(flight_ids)).astype(np.int64))
+
+    logger.info(f"Wrote {len(starts)} tracks ({len(flight_ids)} points) to {partition}")
+    return partition
+
+class TrajectoryPartition():
+    """
+    Read-only view of one trajectory store partition.
+
+    Args:
+        partition (Path): Partition folder.
+    """
+
+    def __init__(self, partition: Path):
+        self.path = partition
+        self.flights = np.load(partition / 'flights.npy', mmap_mode='r')
+        self.offsets = np.load(partition / 'offsets.npy', mmap_mode='r')
+        self.arrays = {name: np.load(partition / f'{name}.npy', mmap_mode='r') for name in TRACK_COLUMNS}
+
+    def get_track(self, ec_id: str) -> dict | None:
+        """
+        Gets a flight's track as views onto the memory-mapped arrays.
+
+        Args:
+            ec_id (str): Eurocontrol hash identifier of the flight.
+
+        Returns:
+            dict | None: ``time`` (epoch seconds), ``lat``, ``lon``, ``alt`` arrays, or None if the flight isn't in this partition.
+        """
+        key = ec_id.encode()
+        i = np.searchsorted(self.flights, key)
+        if i == len(self.flights) or self.flights[i] != key:
+            return None
+
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {name: array[start:end] for name, array in self.arrays.items()}
+
+class TrajectoryStore():
+    """
+    All partitions in the trajectory store folder.
+
+    Args:
+        folder (Path): Trajectory store folder. Defaults to ``TRAJECTORY_FOLDER``.
+    """
+
+    def __init__(self, folder: Path = TRAJECTORY_FOLDER):
+        self.folder = folder
+
+    def partitions(self) -> list:
+        """
+        Returns the complete partitions in the store, oldest first. New partitions are picked up on each call.
+        """
+        if not self.folder.exists():
+            return []
+        return [open_partition(p) for p in sorted(self.folder.iterdir()) if (p / 'offsets.npy').exists()]
+
+    def get_track(self, ec_id: str) -> dict | None:
+        """
+        Gets a flight's full track.
+
+        A flight crossing a 10-day file boundary is split over two partitions; its parts are
+        concatenated (a copy). Otherwise the arrays are zero-copy views.
+
+        Args:
+            ec_id (str): Eurocontrol hash identifier of the flight.
+
+        Returns:
+            dict | None: ``time`` (epoch seconds), ``lat``, ``lon``, ``alt`` arrays, or None if the flight isn't in the store.
+        """
+        parts = [track for p in self.partitions() if (track := p.get_track(ec_id)) is not None]
+
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([part[name] for part in parts]) for name in TRACK_COLUMNS}
+
+@cache
+def open_partition(partition: Path) -> TrajectoryPartition:
+    """
+    Opens a partition once and reuses its memory maps.
+    """
+    return TrajectoryPartition(partition)